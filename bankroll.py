@@ -0,0 +1,101 @@
+# Bankroll analysis of the net results of rounds, for example those in outcome logs. The rounds are resampled into
+# thousands of bankroll paths at once (bootstrapping), and each path's bankroll is a NumPy cumulative sum of its rounds.
+# This gives the risk of ruin for a starting bankroll, and the distribution of the maximum drawdown of a path. Paths
+# are made a chunk at a time, so the memory used doesn't depend on the number of paths, and there are no Python loops
+# over rounds, so tens of millions of rounds can be analysed.
+#
+# N0 is the number of rounds it takes for the expected win to be as big as one standard deviation of the total result,
+# (standard deviation / mean) squared, of the net result per round.
+#
+# this_analysis = Bankroll_Analysis(load_net(["logs/Hi-Lo_Card_Count_0"]), 2000, rounds=100000)
+# this_analysis.print()
+
+import math
+import outcome_log
+
+PERCENTILES = [50, 90, 95, 99]          # Percentiles of the maximum drawdown that are printed.
+
+
+# Return a NumPy array of the net result of every round in the outcome logs in the parm list of directories, in order.
+# If strategy_name is set, then only the rounds of that strategy are included.
+def load_net(paths, strategy_name=None):
+    import numpy as np
+
+    parts = []
+    for path in paths:
+        log = outcome_log.Outcome_Log(path)
+        net = log["net"]
+        if strategy_name is not None:
+            if strategy_name not in log.strategy_names:
+                continue
+            net = net[log["strategy"] == log.strategy_names.index(strategy_name)]
+        parts.append(np.asarray(net, dtype=np.float64))
+
+    if len(parts) == 0:
+        return np.zeros(0)
+    return np.concatenate(parts)
+
+
+class Bankroll_Analysis:
+
+    # net is an array of the net result of each round, in the order they were played. Each of the parm number of paths
+    # is rounds long (by default, as many rounds as there are in net), and starts with the parm bankroll. A path is
+    # ruined once its bankroll is 0 or less. Paths are made of blocks of block_rounds consecutive rounds, picked at
+    # random, so that a block keeps the runs of big bets while the count is high; 1 picks every round independently.
+    # chunk_elements is the most rounds that are held in memory at once.
+    def __init__(self, net, bankroll, rounds=None, paths=10000, block_rounds=1, seed=None, chunk_elements=2000000):
+        import numpy as np
+
+        net = np.asarray(net, dtype=np.float64)
+        if len(net) < max(block_rounds, 2):
+            raise ValueError("Need at least %d rounds, not %d." % (max(block_rounds, 2), len(net)))
+        if rounds is None:
+            rounds = len(net)
+
+        self.bankroll = bankroll
+        self.rounds = rounds
+        self.paths = paths
+        self.block_rounds = block_rounds
+
+        self.mean = float(net.mean())                   # Mean net result per round.
+        self.stdev = float(net.std(ddof=1))             # Standard deviation of the net result per round.
+        self.n0 = math.inf if self.mean == 0 else (self.stdev / self.mean) ** 2
+
+        self.ruined = np.zeros(paths, dtype=bool)       # Was each path ruined?
+        self.max_drawdowns = np.zeros(paths)            # Biggest fall of each path's bankroll from an earlier peak.
+        self.final_bankrolls = np.zeros(paths)          # Bankroll at the end of each path.
+
+        rng = np.random.default_rng(seed)
+        blocks = -(-rounds // block_rounds)             # Blocks per path, rounded up.
+        chunk_paths = max(1, chunk_elements // (blocks * block_rounds))
+        offsets = np.arange(block_rounds)
+
+        for first in range(0, paths, chunk_paths):
+            n = min(chunk_paths, paths - first)
+
+            # Index of each round of each path in net, made from random starts of blocks.
+            starts = rng.integers(0, len(net) - block_rounds + 1, size=(n, blocks))
+            indices = (starts[:, :, np.newaxis] + offsets).reshape(n, blocks * block_rounds)[:, 0:rounds]
+
+            bankrolls = bankroll + np.cumsum(net[indices], axis=1)
+            peaks = np.maximum(np.maximum.accumulate(bankrolls, axis=1), bankroll)
+
+            self.ruined[first:first + n] = bankrolls.min(axis=1) <= 0
+            self.max_drawdowns[first:first + n] = (peaks - bankrolls).max(axis=1)
+            self.final_bankrolls[first:first + n] = bankrolls[:, -1]
+
+        self.risk_of_ruin = float(self.ruined.mean())   # Fraction of the paths that were ruined.
+
+    # Return a dictionary of the parm percentiles of the maximum drawdown, {percentile: drawdown}.
+    def drawdown_percentiles(self, percentiles=PERCENTILES):
+        import numpy as np
+
+        return dict(zip(percentiles, np.percentile(self.max_drawdowns, percentiles).tolist()))
+
+    def print(self):
+        print("Mean net result per round: %.4f, Standard deviation: %.4f, N0: %.0f rounds"
+              % (self.mean, self.stdev, self.n0))
+        print("Bankroll: £%d, Paths: %d of %d rounds, Block: %d rounds"
+              % (self.bankroll, self.paths, self.rounds, self.block_rounds))
+        print("Risk of ruin: %.2f%%" % (100 * self.risk_of_ruin))
+        print("Max drawdown: " + ", ".join("%d%%=£%.0f" % (p, d) for (p, d) in self.drawdown_percentiles().items()))
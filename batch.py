@@ -0,0 +1,454 @@
+# Batch simulation engine. Plays a round at each of many independent tables at once, using NumPy arrays. Each table
+# has its own shoe, card count and hands, and follows the same rules and strategy charts as blackjack.Table.
+
+import blackjack
+import counting
+import numpy as np
+import running_stats
+import strategy
+
+MAX_HANDS = 4                       # 1st hand can only be split twice. Ie. no more than 4 hands for 1 player.
+
+# Most tables that a session is shared between. Each round costs several milliseconds of NumPy overhead whatever the
+# number of tables, so the engine is only faster than blackjack.Table with thousands of tables at once.
+TABLES = 10000
+
+# Fewest rounds that each table of a session plays. The warm start plays about one shoe at every table before the
+# session starts, so a short session is shared between fewer tables, to keep the warm start's share of the time small.
+ROUNDS_PER_TABLE = 50
+
+# Shoes played by the warm start, per table. There must be more shoes than tables, so that the shoes with the most
+# rounds can be chosen more often than the others.
+WARM_START_SHOES = 1.5
+
+# Phases that a player's hand goes through while a strategy chart is played, in the same order as Table.play_chart.
+PAIRS = 0
+SOFT = 1
+DOUBLE_DOWN = 2
+HIT_UNTIL_STAND = 3
+DONE = 4
+WAITING = 5                         # Child hand of a split, that gets its 2nd card when its turn comes.
+
+
+# Return the tags of the parm counting system as a NumPy array, indexed by card value 0 to 11. Shoes in the batch
+# engine only hold card values, so systems whose tags depend on suit can't be used.
+def count_tags(system):
+    if system.value_tags is None:
+        raise ValueError("The batch engine can't count by %s, as its tags depend on suit." % system.name)
+    return np.array([0, 0] + system.value_tags)
+
+
+# Convert a list of strategy chart actions to a NumPy array of the parm shape. Missing actions become -1.
+def chart_array(actions, shape):
+    if actions is None:
+        return None
+    return np.array([-1 if a is None else a for a in actions]).reshape(shape)
+
+
+# A strategy chart converted to NumPy arrays, indexed by [row, dealer card value - 2].
+class Compiled_Chart:
+
+    def __init__(self, chart):
+        self.hard = chart_array(chart.hard, (22, strategy.COLUMNS))
+        self.soft = chart_array(chart.soft, (10, strategy.COLUMNS))
+        self.pairs = chart_array(chart.pairs, (10, strategy.COLUMNS))
+
+
+class Batch_Table:
+
+    def __init__(self, tables, decks, penetration, seed=None, charts=None, system=counting.HI_LO, betting_unit=4,
+                 blackjack_value=3 / 2):
+        self.rng = np.random.default_rng(seed)
+
+        # Card counting system that each table counts cards by.
+        self.system = system
+        self.count_tags = count_tags(system)
+        self.initial_running_count = system.initial_running_count(decks)
+        self.bet_ramp = None                            # Optional counting.Bet_Ramp, instead of the system's own.
+
+        # Each table has its own shoe of card values. Suits don't matter to the engine.
+        self.template = np.array([blackjack.CARD_VALUES[c] for c in blackjack.shoe_template(decks)], dtype=np.int8)
+        self.shoe_length = len(self.template)
+        self.cut_card = self.shoe_length - (1 - penetration) * self.shoe_length
+
+        self.betting_unit = betting_unit
+        self.blackjack_value = blackjack_value
+
+        if charts is None:
+            charts = strategy.CHARTS
+        self.charts = charts
+        self.compiled_charts = {}                       # Charts converted to NumPy arrays, keyed by strategy name.
+
+        self.rounds_played = 0
+        self.round_stats = running_stats.Running_Stats()    # Statistics of the net result of each round.
+
+        self.allocate(tables)
+        self.refill(np.arange(tables))
+
+    # Make the arrays of the parm number of tables, with empty shoes and nothing staked.
+    def allocate(self, tables):
+        self.tables = tables                            # Number of independent tables played at once.
+        self.shoes = np.empty((tables, self.shoe_length), dtype=np.int8)
+        self.next_card = np.zeros(tables, dtype=np.int64)
+        self.running_count = np.zeros(tables, dtype=np.int64)
+        self.shoes_started = np.zeros(tables, dtype=np.int64)       # Number of times each shoe has been refilled.
+
+        self.hands_played_by_player = np.zeros(tables, dtype=np.int64)
+        self.total_staked = np.zeros(tables)
+        self.amount_won_or_lost = np.zeros(tables)
+
+        # Player's hands, one row per table and one column per hand.
+        self.hard = np.zeros((tables, MAX_HANDS), dtype=np.int64)       # Value of hand, counting aces as 1.
+        self.has_ace = np.zeros((tables, MAX_HANDS), dtype=bool)
+        self.card_count = np.zeros((tables, MAX_HANDS), dtype=np.int64)
+        self.first_card = np.zeros((tables, MAX_HANDS), dtype=np.int64)  # Card values of the first 2 cards.
+        self.second_card = np.zeros((tables, MAX_HANDS), dtype=np.int64)
+        self.stake = np.zeros((tables, MAX_HANDS))
+        self.ancestors = np.zeros((tables, MAX_HANDS), dtype=np.int64)
+        self.phase = np.full((tables, MAX_HANDS), DONE)
+        self.hands = np.zeros(tables, dtype=np.int64)                    # Number of hands in use at each table.
+        self.current = np.zeros(tables, dtype=np.int64)                  # Hand being played at each table.
+
+        # Dealer's hands, one per table.
+        self.dealer_hard = np.zeros(tables, dtype=np.int64)
+        self.dealer_has_ace = np.zeros(tables, dtype=bool)
+        self.dealer_up_card = np.zeros(tables, dtype=np.int64)
+
+    # Discard the remaining cards in the shoes of the parm tables, and refill them with freshly shuffled cards.
+    def refill(self, rows):
+        self.shoes[rows] = self.rng.permuted(np.broadcast_to(self.template, (len(rows), self.shoe_length)), axis=1)
+        self.next_card[rows] = 0
+        self.running_count[rows] = self.initial_running_count
+        self.shoes_started[rows] += 1
+
+    # Start each table part way through a shoe, as if it had been playing the parm strategy for a long time, so that
+    # even a few rounds per table bet by the long-run mix of counts. Must be called before any rounds are played.
+    #
+    # A table that has been playing for a long time is at any round of the shoes that it plays with the same chance,
+    # so shoes with more rounds are more likely. So a pool of WARM_START_SHOES fresh shoes per table is played, without
+    # keeping the rounds, and the card and count at the start of each round are remembered. Then shoes are chosen
+    # for the tables with chances in proportion to their numbers of rounds, and each table goes back to a random round
+    # of its shoe. Counting burnt cards instead wouldn't do, as the dealer's hole card isn't counted when the dealer
+    # doesn't play, and those hole cards are more often tens and aces.
+    def warm_start(self, strategy_name):
+        tables = self.tables
+        pool = int(np.ceil(WARM_START_SHOES * tables))
+        self.allocate(pool)
+        self.refill(np.arange(pool))
+        shoes = self.shoes.copy()
+
+        rounds = np.zeros(pool, dtype=np.int64)                     # Rounds played from each shoe.
+        next_cards = []
+        running_counts = []
+        while (self.shoes_started == 1).any():
+            rounds += self.shoes_started == 1
+            next_cards.append(self.next_card.copy())
+            running_counts.append(self.running_count.copy())
+            self.play_one_round(strategy_name, 0)
+
+        # Systematic sampling, in a random order, so that each shoe is chosen at most once.
+        order = self.rng.permutation(pool)
+        ends = np.cumsum(rounds[order]) * tables / rounds.sum()
+        chosen = order[np.searchsorted(ends, self.rng.random() + np.arange(tables), side="right")]
+        start = self.rng.integers(0, rounds[chosen])
+
+        self.allocate(tables)
+        self.shoes[:] = shoes[chosen]
+        self.next_card[:] = np.array(next_cards)[start, chosen]
+        self.running_count[:] = np.array(running_counts)[start, chosen]
+        self.shoes_started[:] = 1
+        self.rounds_played = 0
+
+    # Deal one card to each of the parm tables. Returns an array of the card values. Cards dealt face up are counted.
+    def draw(self, rows, face_up=True):
+        if rows.size == 0:
+            return rows
+
+        # For safety, ensure that there is at least 1 card in each shoe at all times.
+        empty = rows[self.next_card[rows] >= self.shoe_length - 1]
+        if empty.size > 0:
+            self.refill(empty)
+
+        cards = self.shoes[rows, self.next_card[rows]].astype(np.int64)
+        self.next_card[rows] += 1
+
+        if face_up:
+            self.running_count[rows] += self.count_tags[cards]
+        return cards
+
+    # Add the parm cards to hand number k (a number, or an array of numbers) at each of the parm tables.
+    def receive(self, rows, k, cards):
+        if rows.size == 0:
+            return
+        self.hard[rows, k] += np.where(cards == 11, 1, cards)
+        self.has_ace[rows, k] |= cards == 11
+        self.card_count[rows, k] += 1
+        first = self.card_count[rows, k] == 1
+        self.first_card[rows, k] = np.where(first, cards, self.first_card[rows, k])
+        self.second_card[rows, k] = np.where(first, 0, np.where(self.card_count[rows, k] == 2, cards,
+                                                                self.second_card[rows, k]))
+
+    # Double the stake on hand k (a number, or an array of numbers) at each of the parm tables, and deal the one card
+    # allowed after Double Down.
+    def double_down(self, rows, k):
+        if rows.size == 0:
+            return
+        self.total_staked[rows] += self.stake[rows, k]
+        self.amount_won_or_lost[rows] -= self.stake[rows, k]
+        self.stake[rows, k] *= 2
+        self.receive(rows, k, self.draw(rows))
+        self.phase[rows, k] = DONE
+
+    # Split hand k (an array of numbers) at each of the parm tables. The 2nd card moves to a new child hand, and the
+    # parent gets a new card. As at blackjack.Table, the child waits for its own new card until the parent has been
+    # played, so that both engines deal the same cards to the same hands.
+    def split(self, rows, k):
+        if rows.size == 0:
+            return
+        child = self.hands[rows]
+        self.hands[rows] += 1
+        self.hands_played_by_player[rows] += 1
+
+        moved = self.second_card[rows, k]
+        self.stake[rows, k] /= 2                        # Stake is split between parent and child hands.
+        self.ancestors[rows, k] += 1
+
+        # Start the child hand with the parent's 2nd card.
+        self.hard[rows, child] = 0
+        self.has_ace[rows, child] = False
+        self.card_count[rows, child] = 0
+        self.stake[rows, child] = self.stake[rows, k]
+        self.ancestors[rows, child] = self.ancestors[rows, k]
+        self.receive(rows, child, moved)
+
+        # The parent keeps only its 1st card.
+        first = self.first_card[rows, k]
+        self.hard[rows, k] = np.where(first == 11, 1, first)
+        self.has_ace[rows, k] = first == 11
+        self.card_count[rows, k] = 1
+
+        # Deal a card to the parent, and go back to the start of the strategy chart.
+        self.receive(rows, k, self.draw(rows))
+        self.phase[rows, k] = PAIRS
+        self.phase[rows, child] = WAITING
+
+    # Move each of the parm tables on to its newest waiting hand, deal it its 2nd card, and start playing it. Hands are
+    # played in the same order as blackjack.Table plays them, where the child of a split is played after its parent.
+    def next_hand(self, rows):
+        if rows.size == 0:
+            return
+        waiting = self.phase[rows] == WAITING
+        k = MAX_HANDS - 1 - np.argmax(waiting[:, ::-1], axis=1)
+        self.current[rows] = k
+        self.receive(rows, k, self.draw(rows))
+        self.phase[rows, k] = PAIRS
+
+    # Take one step of the strategy chart for the hand being played at each of the parm tables.
+    def step(self, rows, chart):
+        k = self.current[rows]
+        phase = self.phase[rows, k]
+        hard = self.hard[rows, k]
+        soft = self.has_ace[rows, k] & (hard <= 11)
+        value = np.where(soft, hard + 10, hard)
+        busted = hard > 21
+        column = self.dealer_up_card[rows] - 2
+        row_value = np.minimum(value, 21)
+
+        # Pairs.
+        at_pairs = phase == PAIRS
+        self.phase[rows[at_pairs], k[at_pairs]] = SOFT
+        if chart.pairs is not None:
+            is_pair = at_pairs & (self.ancestors[rows, k] <= 1) & (self.card_count[rows, k] == 2) \
+                      & (self.first_card[rows, k] == self.second_card[rows, k])
+            decision = np.where(is_pair, chart.pairs[np.maximum(self.first_card[rows, k] - 2, 0), column], -1)
+
+            stand = decision == strategy.STAND
+            self.phase[rows[stand], k[stand]] = DONE
+            double = decision == strategy.DOUBLE
+            self.double_down(rows[double], k[double])
+            hit = decision == strategy.HIT
+            self.receive(rows[hit], k[hit], self.draw(rows[hit]))
+            split = decision == strategy.SPLIT
+            self.split(rows[split], k[split])
+
+        # Soft hands, first 2 cards only.
+        at_soft = phase == SOFT
+        self.phase[rows[at_soft], k[at_soft]] = DOUBLE_DOWN
+        if chart.soft is not None:
+            is_soft = at_soft & soft & (self.card_count[rows, k] == 2)
+            decision = np.where(is_soft, chart.soft[np.clip(value - 12, 0, 9), column], -1)
+
+            stand = decision == strategy.STAND
+            self.phase[rows[stand], k[stand]] = DONE
+            double = decision == strategy.DOUBLE
+            self.double_down(rows[double], k[double])
+            hit = decision == strategy.HIT
+            self.receive(rows[hit], k[hit], self.draw(rows[hit]))
+
+        # Double Down rules.
+        decision = chart.hard[row_value, column]
+        at_double = phase == DOUBLE_DOWN
+        self.phase[rows[at_double], k[at_double]] = HIT_UNTIL_STAND
+        done = at_double & busted
+        self.phase[rows[done], k[done]] = DONE
+        double = at_double & ~busted & (decision == strategy.DOUBLE)
+        self.double_down(rows[double], k[double])
+
+        # Hit until the chart says Stand.
+        at_hit = phase == HIT_UNTIL_STAND
+        done = at_hit & (busted | (decision == strategy.STAND))
+        self.phase[rows[done], k[done]] = DONE
+        hit = at_hit & ~busted & (decision != strategy.STAND)
+        self.receive(rows[hit], k[hit], self.draw(rows[hit]))
+
+    # Play one round at every table. If counted is set, then only the first counted tables' results are kept, and the
+    # other tables' totals are put back as they were before the round. If it is 0, then the round isn't kept at all.
+    def play_one_round(self, strategy_name, counted=None):
+        all_rows = np.arange(self.tables)
+        chart = self.compiled_charts.get(strategy_name)
+        if chart is None:
+            chart = Compiled_Chart(self.charts[strategy_name])
+            self.compiled_charts[strategy_name] = chart
+
+        self.rounds_played += 1
+        won_before = self.amount_won_or_lost.copy()
+        staked_before = self.total_staked.copy()
+        hands_before = self.hands_played_by_player.copy()
+
+        # If we're doing card counting, then bet according to the table's counting system.
+        if strategy_name in counting.SYSTEMS:
+            system = self.system
+            decks_in_shoe = (self.shoe_length - self.next_card) / 52
+            if system.balanced:
+                count = np.trunc(self.running_count / decks_in_shoe)
+            else:
+                count = np.trunc(-system.initial_per_deck + (self.running_count - system.pivot) / decks_in_shoe)
+
+            ramp = self.bet_ramp
+            if ramp is None:
+                ramp = self.system.ramp
+            units = np.clip((count - ramp.pivot) * ramp.units_per_count, ramp.min_units, ramp.max_units)
+            this_stake = units * self.betting_unit
+        else:
+            this_stake = np.full(self.tables, float(self.betting_unit))
+
+        self.total_staked += this_stake
+        self.amount_won_or_lost -= this_stake
+        self.hands_played_by_player += 1
+
+        # Start each table with one empty player hand, and an empty dealer hand.
+        self.hard[:] = 0
+        self.has_ace[:] = False
+        self.card_count[:] = 0
+        self.ancestors[:] = 0
+        self.stake[:] = 0
+        self.stake[:, 0] = this_stake
+        self.hands[:] = 1
+        self.current[:] = 0
+        self.dealer_hard[:] = 0
+        self.dealer_has_ace[:] = False
+
+        # Deal first 4 cards in classic order (Player, Dealer, Player, Dealer).
+        self.receive(all_rows, 0, self.draw(all_rows))
+        up_card = self.draw(all_rows)
+        self.receive(all_rows, 0, self.draw(all_rows))
+        hole_card = self.draw(all_rows, face_up=False)
+
+        self.dealer_up_card[:] = up_card
+        self.dealer_hard[:] = np.where(up_card == 11, 1, up_card) + np.where(hole_card == 11, 1, hole_card)
+        self.dealer_has_ace[:] = (up_card == 11) | (hole_card == 11)
+
+        # Check both Player and Dealer's hands for Blackjack on original 2 cards only.
+        dealer_blackjack = self.dealer_has_ace & (self.dealer_hard == 11)
+        player_blackjack = self.has_ace[:, 0] & (self.hard[:, 0] == 11)
+
+        self.amount_won_or_lost += np.where(player_blackjack & dealer_blackjack, this_stake, 0)
+        self.amount_won_or_lost += np.where(player_blackjack & ~dealer_blackjack,
+                                            this_stake + self.blackjack_value * this_stake, 0)
+
+        # No Blackjack for the player, so play the strategy chart until every hand is done. When a table's hand is
+        # done, it moves on to its next waiting hand. Only the tables that are still playing are stepped.
+        self.phase[:] = DONE
+        rows = np.nonzero(~player_blackjack)[0]
+        self.phase[rows, 0] = PAIRS
+        while rows.size > 0:
+            self.step(rows, chart)
+            playing = self.phase[rows, self.current[rows]] < DONE
+            done = rows[~playing]
+            waiting = (self.phase[done] == WAITING).any(axis=1)
+            self.next_hand(done[waiting])
+            playing[~playing] = waiting
+            rows = rows[playing]
+
+        # If player has any non-busted hands, and the dealer doesn't have a Blackjack, then the dealer plays.
+        in_use = np.arange(MAX_HANDS) < self.hands[:, np.newaxis]
+        player_hand_alive = in_use & (self.hard <= 21)
+        dealer_plays = ~player_blackjack & ~dealer_blackjack & player_hand_alive.any(axis=1)
+
+        # Turn over the dealer's second card, and adjust the card count.
+        self.running_count += np.where(dealer_plays, self.count_tags[hole_card], 0)
+
+        while True:
+            dealer_value = np.where(self.dealer_has_ace & (self.dealer_hard <= 11), self.dealer_hard + 10,
+                                    self.dealer_hard)
+            hit = np.nonzero(dealer_plays & (dealer_value < 17))[0]
+            if hit.size == 0:
+                break
+            cards = self.draw(hit)
+            self.dealer_hard[hit] += np.where(cards == 11, 1, cards)
+            self.dealer_has_ace[hit] |= cards == 11
+
+        # Compare each of the player's hands with the dealer's hand.
+        player_value = np.where(self.has_ace & (self.hard <= 11), self.hard + 10, self.hard)
+        dealer_busted = (self.dealer_hard > 21)[:, np.newaxis]
+        dealer_value = dealer_value[:, np.newaxis]
+        contest = dealer_plays[:, np.newaxis] & player_hand_alive
+        wins = contest & (dealer_busted | (player_value > dealer_value))
+        pushes = contest & ~dealer_busted & (player_value == dealer_value)
+        self.amount_won_or_lost += (np.where(wins, 2 * self.stake, 0) + np.where(pushes, self.stake, 0)).sum(axis=1)
+
+        if counted is not None:
+            self.amount_won_or_lost[counted:] = won_before[counted:]
+            self.total_staked[counted:] = staked_before[counted:]
+            self.hands_played_by_player[counted:] = hands_before[counted:]
+
+        net = (self.amount_won_or_lost - won_before)[0:counted]
+        if len(net) > 0:
+            mean = float(net.mean())
+            self.round_stats.add_summary(len(net), mean, float(((net - mean) ** 2).sum()), float(net.min()),
+                                         float(net.max()))
+
+        # Check if the shoes need to be replenished.
+        self.refill(np.nonzero(self.next_card >= self.cut_card)[0])
+
+    # Play the parm number of rounds in all, shared as evenly as possible between the tables.
+    def play_rounds(self, rounds, strategy_name):
+        (each, extra) = divmod(rounds, self.tables)
+        for games in range(each):
+            self.play_one_round(strategy_name)
+        if extra > 0:
+            self.play_one_round(strategy_name, extra)
+
+    # Return the player edge over all of the tables, as a percentage.
+    def player_edge(self):
+        return 100 * self.amount_won_or_lost.sum() / self.total_staked.sum()
+
+
+# Play one session with the batch engine. The session's rounds are shared between up to TABLES tables, so that each
+# table plays at least ROUNDS_PER_TABLE rounds, and each table is warm started part way through a shoe. Returns the same (amount_won_or_lost, total_staked, hands_played_by_player,
+# round_stats, profile) tuple as parallel.play_session. The batch engine can't be profiled, so profile is None.
+def play_session(job):
+    tables = job.get("tables")
+    if tables is None:
+        tables = min(TABLES, job["rounds"] // ROUNDS_PER_TABLE)
+    tables = max(1, min(tables, job["rounds"]))
+    system = counting.SYSTEMS.get(job["strategy_name"], counting.HI_LO)
+    batch = Batch_Table(tables, job["decks"], job["penetration"], job["seed"], job.get("charts"), system,
+                        job.get("betting_unit", 4), job.get("blackjack_value", 3 / 2))
+    if job.get("bet_ramp") is not None:
+        batch.bet_ramp = counting.Bet_Ramp(*job["bet_ramp"])
+    batch.warm_start(job["strategy_name"])
+    batch.play_rounds(job["rounds"], job["strategy_name"])
+
+    return (float(batch.amount_won_or_lost.sum()), float(batch.total_staked.sum()),
+            int(batch.hands_played_by_player.sum()), batch.round_stats, None)
@@ -0,0 +1,227 @@
+# Benchmarks of the speed of the simulator. Measures the rounds per second and memory allocated while playing each
+# strategy, for each of the shoe sizes and penetrations in shoe_study.py, and times the parts of the simulator that are
+# called most often. Results are written to a JSON file, and compared with a baseline file, so that a change that makes
+# the simulator slower is noticed before a long study is run.
+#
+# python bench.py                   Run the benchmarks, and compare the results with the baseline.
+# python bench.py --save-baseline   Run the benchmarks, and save the results as the new baseline.
+
+import argparse
+import blackjack
+import counting
+import json
+import os
+import platform
+import strategy
+import sys
+import time
+import tracemalloc
+
+RESULTS_FILE = "bench_results.json"
+BASELINE_FILE = "bench_baseline.json"
+
+DECKS = [1, 2, 4, 6, 8]                 # Shoe sizes and penetrations, the same as in shoe_study.py.
+PENETRATIONS = [0.50, 0.75, 0.85]
+
+
+# Return the name of the parm benchmark configuration, as used in the results file.
+def config_name(strategy_name, decks, penetration):
+    return "%s, %d decks, %.2f penetration" % (strategy_name, decks, penetration)
+
+
+# Return the best time, in seconds, of several calls of the parm function, which takes no parms.
+def best_time(function, repeats):
+    best = None
+    for r in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+# Return the time, in nanoseconds per loop, of a loop of plain Python that doesn't use the simulator. Results are
+# compared with the baseline relative to this, so that a machine that is busier, or slower, than when the baseline was
+# saved isn't reported as a regression.
+def reference_time(calls, repeats):
+
+    def loop():
+        total = 0
+        values = list(range(100))
+        for c in range(calls):
+            total += values[c % 100] * 2
+        return total
+
+    return 1e9 * best_time(loop, repeats) / calls
+
+
+# Return the number of rounds per second played by the parm strategy, at a table with the parm shoe.
+def rounds_per_second(strategy_name, decks, penetration, rounds, repeats):
+    this_table = blackjack.Table(decks, penetration, seed=1)
+    this_table.play_one_round(strategy_name)                # Warm up, so that caches are already filled.
+
+    def play():
+        for r in range(rounds):
+            this_table.play_one_round(strategy_name)
+
+    return rounds / best_time(play, repeats)
+
+
+# Return (peak, retained) memory allocated, in bytes per round, while the parm strategy plays the parm number of
+# rounds. Peak is the most memory that was in use at one time, above that in use before the rounds were played, and
+# retained is the memory that was still in use afterwards. Memory is measured with tracemalloc, which slows the
+# rounds down, so it is measured separately from rounds_per_second.
+def memory_per_round(strategy_name, decks, penetration, rounds):
+    this_table = blackjack.Table(decks, penetration, seed=1)
+    this_table.play_one_round(strategy_name)                # Warm up, so that caches are already filled.
+
+    tracemalloc.start()
+    (before, _) = tracemalloc.get_traced_memory()
+    for r in range(rounds):
+        this_table.play_one_round(strategy_name)
+    (after, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (peak - before) / rounds, (after - before) / rounds
+
+
+# Return the time, in nanoseconds per call, of each of the parts of the simulator that are called most often.
+def component_timings(calls, repeats):
+    timings = {}
+
+    for decks in DECKS:
+        shoe = blackjack.Shoe(seed=1)
+        shoe.decks = decks
+        shoe.refill()
+
+        def replenish():
+            for c in range(calls // 100):
+                shoe.next_card = len(shoe.cards)            # Make sure that the shoe really is replenished.
+                shoe.replenish()
+
+        timings["Shoe.replenish, %d decks" % decks] = 1e9 * best_time(replenish, repeats) / (calls // 100)
+
+    shoe = blackjack.Shoe(seed=1)
+    shoe.refill()
+
+    def draw_one_card():
+        for c in range(calls):
+            shoe.draw_one_card()
+
+    timings["Shoe.draw_one_card"] = 1e9 * best_time(draw_one_card, repeats) / calls
+
+    hand = blackjack.Hand("Player", 4, 0)
+    for name in ["A♠", "6♥", "3♣"]:
+        hand.receive_card(blackjack.parse_card(name))
+
+    def calculate_value():
+        for c in range(calls):
+            hand.calculate_value()
+
+    timings["Hand.calculate_value"] = 1e9 * best_time(calculate_value, repeats) / calls
+
+    card_count = counting.Card_Counting()
+    card_count.reset(4)
+    cards = shoe.cards[0:100]
+
+    def adjust_count():
+        for c in range(calls // 100):
+            for card in cards:
+                card_count.adjust_count(card)
+
+    timings["Card_Counting.adjust_count"] = 1e9 * best_time(adjust_count, repeats) / (calls // 100 * 100)
+
+    return timings
+
+
+# Run all of the benchmarks. Returns a dictionary of results, that can be written as JSON.
+def run(rounds, memory_rounds, calls, repeats):
+    results = {"python": platform.python_version(),
+               "machine": platform.machine(),
+               "reference_nanoseconds": reference_time(calls, repeats),
+               "rounds_per_second": {},         # Higher is better.
+               "peak_bytes_per_round": {},      # Not compared with the baseline, as it depends on the Python version.
+               "retained_bytes_per_round": {},
+               "nanoseconds_per_call": {}}      # Lower is better.
+
+    for strategy_name in strategy.CHARTS:
+        for decks in DECKS:
+            for penetration in PENETRATIONS:
+                name = config_name(strategy_name, decks, penetration)
+                results["rounds_per_second"][name] = rounds_per_second(strategy_name, decks, penetration, rounds,
+                                                                       repeats)
+                (peak, retained) = memory_per_round(strategy_name, decks, penetration, memory_rounds)
+                results["peak_bytes_per_round"][name] = peak
+                results["retained_bytes_per_round"][name] = retained
+                print("%s: %.0f rounds/sec, %.1f peak bytes/round" % (name, results["rounds_per_second"][name], peak))
+
+    results["nanoseconds_per_call"] = component_timings(calls, repeats)
+    results["reference_nanoseconds"] = min(results["reference_nanoseconds"], reference_time(calls, repeats))
+    for (name, nanoseconds) in results["nanoseconds_per_call"].items():
+        print("%s: %.0f ns/call" % (name, nanoseconds))
+
+    return results
+
+
+# Return a list of descriptions of the results that are worse than the baseline by more than the parm tolerance,
+# a fraction. The baseline is first scaled by the speed of this machine now, relative to when it was saved.
+def regressions(results, baseline, tolerance):
+    found = []
+    scale = results["reference_nanoseconds"] / baseline["reference_nanoseconds"]
+
+    for (name, speed) in results["rounds_per_second"].items():
+        base = baseline["rounds_per_second"].get(name)
+        if base is not None and speed < base / scale * (1 - tolerance):
+            found.append("%s: %.0f rounds/sec, baseline %.0f" % (name, speed, base / scale))
+
+    for (name, nanoseconds) in results["nanoseconds_per_call"].items():
+        base = baseline["nanoseconds_per_call"].get(name)
+        if base is not None and nanoseconds > base * scale * (1 + tolerance):
+            found.append("%s: %.0f ns/call, baseline %.0f" % (name, nanoseconds, base * scale))
+
+    return found
+
+
+def write_json(filename, results):
+    with open(filename, "w", encoding="utf-8") as results_file:
+        json.dump(results, results_file, indent=2)
+
+
+# Run the benchmarks, with the parm list of command line arguments (by default, sys.argv), and the parm program name
+# in the usage message. Returns the exit status, 1 if anything is slower than the baseline.
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Benchmark the speed of the Blackjack simulator.")
+    parser.add_argument("--rounds", type=int, default=5000, help="rounds timed per configuration")
+    parser.add_argument("--memory-rounds", type=int, default=500, help="rounds traced per configuration")
+    parser.add_argument("--calls", type=int, default=100000, help="calls timed per component")
+    parser.add_argument("--repeats", type=int, default=5, help="timings repeated, and the best one kept")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="fraction slower than baseline allowed")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.rounds, args.memory_rounds, args.calls, args.repeats)
+    write_json(RESULTS_FILE, results)
+
+    if args.save_baseline:
+        write_json(BASELINE_FILE, results)
+        print("Baseline saved to", BASELINE_FILE)
+
+    elif os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+        found = regressions(results, baseline, args.tolerance)
+        for description in found:
+            print("Slower than baseline -", description)
+        if len(found) > 0:
+            return 1
+        print("No regressions against", BASELINE_FILE)
+
+    else:
+        print("No baseline to compare with. Run with --save-baseline to make one.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,140 +1,244 @@
 # Blackjack simulator.
 
+from collections import namedtuple
+import counting
+import events
+import math
+import profiling
 import random
+import running_stats
+import strategy
 
 # See - https://en.wikipedia.org/wiki/Standard_52-card_deck
-class Deck:
+RANK_NAMES = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A"]
+SUITS = ["♣", "♦", "♥", "♠"]
 
-    # Create a new deck of cards.
-    def __init__(self):
+# Each card is a small integer, rank * 4 + suit. For example, 0 is "2♣", 27 is "8♠" and 51 is "A♠".
+# The following lists are indexed by card, so that the hot paths do integer lookups instead of string comparisons.
 
-        # [(name of the rank, [list of possible values], card_value)]
-        # For example, ("2", [2]), ("K", [10]), ("A", [1, 11])
-        ranks = []
+# card_value is used to lookup cards in the strategy tables. All cards worth 10 points have a card_value of 10.
+# Aces have a card_value of 11.
+CARD_VALUES = [min(r + 2, 10) if r < 12 else 11 for r in range(13) for s in range(4)]
 
-        # Add the pip ranks, 2 through 10.
-        for i in range(2, 11):
-            ranks.append((str(i), [i], str(i)))
+# Points value of each card, counting aces as 1. For example, 2 for a "2", 10 for a "K" and 1 for an "A".
+CARD_POINTS = [v if v < 11 else 1 for v in CARD_VALUES]
 
-        # Add the court ranks, Jack, Queen, King.
-        court = ["J", "Q", "K"]
-        for c in court:
-            ranks.append((c, [10], "10"))
 
-        # Add the Ace.
-        ranks.append(("A", [1, 11], "A"))
+# Return the human readable name of the parm card, for example "8♥".
+def card_name(card):
+    return RANK_NAMES[card // 4] + SUITS[card % 4]
 
-        # Make 1 deck of cards.
-        self.cards = []
-        suits = ["♣", "♦", "♥", "♠"]
 
-        for r in ranks:
-            (name, value_list, card_value) = r
+# Return the card that has the parm human readable name. For example, "8♥" returns 26.
+def parse_card(name):
+    return RANK_NAMES.index(name[:-1]) * 4 + SUITS.index(name[-1])
 
-            for s in suits:
-                card_name = name + s                        # For example "8" + "♥".
-                self.cards.append((card_name, value_list, card_value))
-
-    # Shuffle the deck.
-    def shuffle(self):
-        random.shuffle(self.cards)
 
-class Card_Counting:
+class Deck:
 
+    # Create a new deck of cards.
     def __init__(self):
-        self.running_count = 0
-        self.true_count = 0
-
-    def reset(self):
-        self.running_count = 0
-        self.true_count = 0
-        self.bet_size = 0
+        self.cards = list(range(52))                # Make 1 deck of cards.
 
-    def print(self):
-        print("Running count=%d, True count=%d, Bet size=%d" % (self.running_count, self.true_count, self.bet_size))
-
-    def adjust_count(self, card, shoe_size, betting_unit):
-        (_, _, card_value) = card
-
-        count_map = {"2": 1, "3": 1, "4": 1, "5": 1, "6": 1, "7": 0, "8": 0, "9": 0, "10": -1, "A": -1}
-
-        self.running_count += count_map.get(card_value)     # Adjust the running count based on value of this card.
+    # Shuffle the deck.
+    def shuffle(self):
+        random.shuffle(self.cards)
 
-        decks_in_shoe = shoe_size / 52
+# Full shoes of cards in new deck order, keyed by number of decks. Shoes are refilled by copying one of these
+# templates, instead of making new Deck objects.
+shoe_templates = {}
 
-        self.true_count = int(self.running_count / decks_in_shoe)
 
-        self.bet_size = (self.true_count - 1) * betting_unit
-        if self.bet_size < 0:                               # Can't bet a -ve stake :)
-            self.bet_size = 0
+# Return a full shoe of cards, in new deck order, for the parm number of decks.
+def shoe_template(decks):
+    template = shoe_templates.get(decks)
+    if template is None:
+        template = Deck().cards * decks
+        shoe_templates[decks] = template
+    return template
 
 
 # See - https://en.wikipedia.org/wiki/Shoe_(cards)
 class Shoe:
 
-    def __init__(self):
-        self.cards = []                                     # Cards currently in the shoe.
+    def __init__(self, seed=None):
+        self.cards = []                                     # Buffer of all cards in the shoe, including dealt ones.
+        self.next_card = 0                                  # Index in the buffer of the next card to be dealt.
+        self.cut_card = 0                                   # When next_card reaches this index, refill the shoe.
 
         # Default values for these two attributes.
         self.decks = 4                                      # Number of decks in the shoe when full.
         self.penetration = 75 / 100                         # Percentage of cards to be dealt before refilling shoe.
 
-        self.card_count = Card_Counting()                   # Create an object to do card counting.
+        # Card counters, one per counting system in use, keyed by system name. Each counter is made the first time
+        # that it is asked for, so shoes only count cards for the systems that are being played.
+        self.counters = {}
+        self.profile = None                                 # Optional profiling.Profile, to count reshuffles.
+
+        # Each shoe has its own random number generator, so that a seeded shoe is reproducible.
+        self.random = random.Random(seed)
 
-    # Print the first 10 cards in shoe, plus number of cards in shoe.
+    # Print the next 10 cards in shoe, plus number of cards in shoe.
     def print(self):
         print("Shoe: ", end="")
-        for c in self.cards[0:10]:
-            (card, value_list, card_value) = c
-            print(card, end=" ")
-        print("Number of cards", len(self.cards))
+        for c in self.cards[self.next_card:self.next_card + 10]:
+            print(card_name(c), end=" ")
+        print("Number of cards", self.shoe_size())
 
-    # Shuffle all of the cards in the shoe.
+    # Shuffle all of the cards in the shoe, in place.
     def shuffle(self):
-        random.shuffle(self.cards)
+        self.random.shuffle(self.cards)
 
-    # If the shoe of cards is getting small, then replenish it.
-    def replenish(self):
-        if len(self.cards) <= ((1 - self.penetration) * self.decks * 52):
-            self.cards = []                                 # Remove the remaining cards from the shoe.
-            for d in range(self.decks):
-                new_deck = Deck()
-                self.cards = self.cards + new_deck.cards
+    # Discard the remaining cards, and fill the shoe with a fresh set of shuffled cards.
+    def refill(self):
+        template = shoe_template(self.decks)
+        if len(self.cards) == len(template):
+            self.cards[:] = template                        # Reuse the existing buffer.
+        else:
+            self.cards = template.copy()
+
+        self.shuffle()
+        self.next_card = 0
+        self.cut_card = len(self.cards) - (1 - self.penetration) * len(self.cards)
+        for counter in self.counters.values():
+            counter.reset(self.decks)                       # Reset the card counts.
+
+        if self.profile is not None:
+            self.profile.events["reshuffles"] += 1
 
-            self.shuffle()                                  # If cards were added, then shuffle the cards in the shoe.
-            self.card_count.reset()                         # Reset the card count to zero.
+    # If the shoe of cards is getting small, then replenish it. Returns True if the shoe was replenished.
+    def replenish(self):
+        if self.next_card >= self.cut_card:
+            self.refill()
+            return True
+        return False
+
+    # Put the parm list of cards at the front of the shoe, so that they are the next cards to be dealt.
+    def stack(self, cards):
+        self.cards[self.next_card:self.next_card] = cards
+
+    # Return the card counter of the parm counting system. If there isn't one yet, it starts counting from now.
+    def counter(self, system=counting.HI_LO):
+        counter = self.counters.get(system.name)
+        if counter is None:
+            counter = counting.Card_Counting(system)
+            counter.reset(self.decks)
+            self.counters[system.name] = counter
+        return counter
+
+    # A card has been seen by the player, so adjust each of the card counts.
+    def count_card(self, card):
+        for counter in self.counters.values():
+            counter.adjust_count(card)
 
     # Return the number of cards left in the shoe.
     def shoe_size(self):
-        return len(self.cards)
+        return len(self.cards) - self.next_card
 
-    # Remove the card from the front of the shoe. Return it as value.
+    # Deal the card from the front of the shoe. Return it as value.
     def draw_one_card(self):
 
         # For safety, ensure that there is at least 1 card in the shoe at all times.
-        if self.shoe_size() <= 1:
-            self.replenish()
+        if self.next_card >= len(self.cards) - 1:
+            self.refill()
 
-        choice = self.cards.pop(0)                          # Take the first card off the front of the shoe.
+        choice = self.cards[self.next_card]                 # Take the first card off the front of the shoe.
+        self.next_card += 1
         return choice                                       # Return the chosen card.
 
 
+# Bytes below 208 (52 * 4) are made into cards by the infinite shoe, and higher bytes are thrown away, so that every
+# card is equally likely.
+CARD_BYTES = bytes(b % 52 for b in range(256))
+DISCARDED_BYTES = bytes(range(52 * 4, 256))
+BLOCK_BYTES = 4096                                      # Random bytes made at a time by the infinite shoe.
+
+
+# A shoe of an infinite number of decks. Each card is drawn with replacement, so every card is always equally likely,
+# and there is no penetration and nothing to replenish. Random cards are made in blocks, several thousand at a time.
+# Cards can't be counted, as the count would never change the odds.
+class Infinite_Shoe:
+
+    def __init__(self, seed=None):
+        self.cards = b""                                    # Block of random cards, as bytes.
+        self.next_card = 0                                  # Index in the block of the next card to be dealt.
+
+        # Set by Table, like a Shoe, but not used.
+        self.decks = math.inf
+        self.penetration = None
+
+        self.counters = None                                # Cards aren't counted.
+        self.profile = None                                 # Optional profiling.Profile.
+
+        # Each shoe has its own random number generator, so that a seeded shoe is reproducible.
+        self.random = random.Random(seed)
+
+    # Print the next 10 cards in shoe.
+    def print(self):
+        print("Shoe: ", end="")
+        for c in range(10):
+            if self.next_card + c >= len(self.cards):
+                break
+            print(card_name(self.cards[self.next_card + c]), end=" ")
+        print("Infinite shoe")
+
+    # Make a new block of random cards.
+    def refill(self):
+        self.cards = self.random.randbytes(BLOCK_BYTES).translate(CARD_BYTES, DISCARDED_BYTES)
+        self.next_card = 0
+
+    # An infinite shoe never needs to be replenished.
+    def replenish(self):
+        return False
+
+    def counter(self, system=counting.HI_LO):
+        raise ValueError("Cards can't be counted in an infinite shoe.")
+
+    # Cards aren't counted, so there is nothing to do.
+    def count_card(self, card):
+        pass
+
+    def shoe_size(self):
+        return math.inf
+
+    # Deal a random card. Return it as value.
+    def draw_one_card(self):
+        if self.next_card >= len(self.cards):
+            self.refill()
+
+        choice = self.cards[self.next_card]
+        self.next_card += 1
+        return choice
+
+
 class Hand:
+    # Slots, because a study creates millions of hands.
+    __slots__ = ["name", "stake", "ancestors", "cards", "hard_value", "has_ace", "value", "busted", "is_soft",
+                 "is_pair", "blackjack"]
+
     def __init__(self, name, stake, ancestors):
+        self.cards = []                         # The hand starts with an empty list of cards.
+        self.reset(name, stake, ancestors)
+
+    # Make this hand into a new, empty hand, so that a table can reuse it instead of creating a new one.
+    def reset(self, name, stake, ancestors):
         self.name = name                        # User friendly name for the hand of cards.
         self.stake = stake
         self.ancestors = ancestors              # How many ancestors does this hand have?
-        self.cards = []                         # The hand starts with an empty list of cards.
+        self.cards.clear()
+        self.hard_value = 0                     # Value of the hand, counting all aces as 1.
+        self.has_ace = False                    # Does the hand contain at least 1 ace?
         self.value = 0                          # Current value of the hand.
         self.busted = False                     # Is the hand busted?
+        self.is_soft = False                    # Is an ace being counted as 11 in the value of the hand?
+        self.is_pair = False                    # Does the hand have exactly 2 cards, of equal card value?
         self.blackjack = False
 
     # Print a summary of the hand.
     def print(self):
         print(self.name, end=":")
         for c in self.cards:
-            (card, _, _) = c
-            print("", card, end="")
+            print("", card_name(c), end="")
         print(", Value=%d" % self.value, end="")
         if self.busted:
             print(", Busted", end="")
@@ -147,31 +251,29 @@ class Hand:
         print(", Stake=£%d" % self.stake, end="")
         print()
 
-    # Calculate the points value of a hand. If the hand is busted, it sets the busted attribute to True.
-    # For hands containing 1 or more aces, there are multiple possible value. This method returns the highest
-    # non-busted value possible. If the hand is busted, it returns the lowest points value possible.
-    def calculate_value(self):
-        possible_values = [0]             # List of all possible values of this hand.
+    # Set the value, busted and is_soft attributes from the hard value of the hand. At most 1 ace can be counted
+    # as 11, so the value is the hard value plus 10 if that doesn't bust the hand. If the hand is busted, the value is
+    # the lowest points value possible.
+    def set_value(self):
+        if self.has_ace and self.hard_value <= 11:
+            self.value = self.hard_value + 10
+            self.is_soft = True
+        else:
+            self.value = self.hard_value
+            self.is_soft = False
+        self.busted = self.hard_value > 21
 
+    # Calculate the points value of a hand from scratch, from the list of its cards.
+    def calculate_value(self):
+        self.hard_value = 0
+        self.has_ace = False
         for c in self.cards:
-            (_, value_list, _) = c
-
-            new_possible_values = []
-            for p in possible_values:
-                for v in value_list:
-                    new_possible_values.append(p + v)
-            possible_values = new_possible_values
-
-        self.value = 0
-        self.busted = True
-        for p in possible_values:
-            if p > self.value and p <=21:
-                self.value = p         # We found a new higher, non-busted value.
-                self.busted = False
-
-        # If we busted, it is still nice to set the value to the lowest possible value the cards in the hand can make.
-        if self.busted:
-            self.value = min(possible_values)
+            self.hard_value += CARD_POINTS[c]
+            if CARD_POINTS[c] == 1:
+                self.has_ace = True
+
+        self.is_pair = len(self.cards) == 2 and CARD_VALUES[self.cards[0]] == CARD_VALUES[self.cards[1]]
+        self.set_value()
 
     # This method should only be called for the 1st hands (player or dealer) of each round. Hands created from
     # splits cannot be blackjacks.
@@ -179,48 +281,148 @@ class Hand:
         if self.value == 21 and self.ancestors == 0:    # Check no ancestors. Hands with ancestors are not 1st hands.
             self.blackjack = True
 
-    # Add the parm card to this hand.
+    # Add the parm card to this hand, and update the value of the hand.
     def receive_card(self, card):
         self.cards.append(card)         # Append the parm card to the list of cards in this hand.
-        self.calculate_value()          # Recalculate the value of this hand.
 
+        points = CARD_POINTS[card]
+        self.hard_value += points
+        if points == 1:
+            self.has_ace = True
 
-class Table:
+        self.is_pair = len(self.cards) == 2 and CARD_VALUES[self.cards[0]] == CARD_VALUES[card]
+        self.set_value()
 
-    def __init__(self, decks, penetration):
-        self.shoe = Shoe()                              # Create an empty card shoe.
+    # Remove the 2nd card from this hand, so that it can start a new hand after a split. Return the removed card.
+    def remove_second_card(self):
+        card = self.cards.pop(1)
+        self.calculate_value()
+        return card
 
-        # Overwrite the shoe's defaults for decks and penetration with the table's parms.
-        self.shoe.decks = decks
-        self.shoe.penetration = penetration
 
-        self.shoe.replenish()                           # ... fill the shoe with normal, randomised cards.
+MAX_SEATS = 7                                       # Most players that can sit at one table.
 
-        # Normal stake is £4. Chosen as it can be split into 4 hands while remaining an integer.
-        self.betting_unit = 4
-        self.blackjack_value = 3 / 2                    # Eg. £4 bet wins £6 for a blackjack (and stake returned too).
+# Summary of the rounds played by Table.play_rounds, for the table's own seat.
+Round_Summary = namedtuple("Round_Summary", ["rounds", "staked", "won_or_lost", "hands", "splits", "doubles",
+                                             "blackjacks"])
+
+
+# One player's seat at a table. Each seat plays by its own strategy, and keeps its own running totals.
+class Seat:
+
+    def __init__(self, strategy_name=None, bet_ramp=None):
+        self.strategy_name = strategy_name              # Name of the strategy that the seat plays by.
+        self.bet_ramp = bet_ramp                        # Optional counting.Bet_Ramp, instead of the system's own.
 
         self.rounds_played = 0
         self.hands_played_by_player = 0
         self.total_staked = 0
         self.amount_won_or_lost = 0                     # +ve number means the player is in profit, -ve means loss.
+        self.round_stats = running_stats.Running_Stats()    # Statistics of the net result of each round.
+        self.splits = 0                                 # Number of times the player has split a hand.
+        self.doubles = 0                                # Number of times the player has doubled down.
+        self.blackjacks = 0                             # Number of Blackjacks the player has been dealt.
 
-        self.dealer = None                              # The dealer's current hand on the table.
-        self.player_hands = []                          # List of player hands currently on the table.
+        self.chart = None                               # Strategy chart and counting.Counting_System (or None) of
+        self.system = None                              # ... the strategy, looked up once per call of the table.
+
+        self.player_hands = []                          # List of the seat's hands currently on the table.
 
     # Update running totals to reflect money staked by player.
     def invest(self, stake):
         self.total_staked += stake
         self.amount_won_or_lost -= stake
 
+    # Add parm winnings to player running total or money won (or lost).
+    def win(self, winnings):
+        self.amount_won_or_lost += winnings
+
+
+# A table is also its own first seat, so a table with one player works just as it always has. More seats can be added
+# with add_seat. All of the seats play against one dealer's hand each round, dealt from the same shoe.
+class Table(Seat):
+
+    def __init__(self, decks, penetration, seed=None, charts=None, betting_unit=4, blackjack_value=3 / 2,
+                 split_depth=2, infinite_shoe=False):
+        Seat.__init__(self)
+
+        # Create an empty card shoe. An infinite shoe is faster, but its cards can't be counted.
+        if infinite_shoe:
+            self.shoe = Infinite_Shoe(seed)
+        else:
+            self.shoe = Shoe(seed)
+
+        # Overwrite the shoe's defaults for decks and penetration with the table's parms.
+        self.shoe.decks = decks
+        self.shoe.penetration = penetration
+
+        self.shoe.replenish()                           # ... fill the shoe with normal, randomised cards.
+
+        # Normal stake is £4. Chosen as it can be split into 4 hands while remaining an integer.
+        self.betting_unit = betting_unit
+        self.blackjack_value = blackjack_value          # Eg. £4 bet wins £6 for a blackjack (and stake returned too).
+
+        # A hand can only be split if it has fewer than split_depth ancestors. The default of 2 means that the 1st hand
+        # can only be split twice, so no more than 4 hands for 1 player in a single game.
+        self.split_depth = split_depth
+
+        # Strategy charts that the player can play by, keyed by strategy name.
+        if charts is None:
+            charts = strategy.CHARTS
+        self.charts = charts
+
+        self.listeners = []                             # Functions that are called with each events.py event.
+        self.profile = None                             # Optional profiling.Profile, see start_profiling.
+
+        self.seats = [self]                             # Seats in the order they are dealt to. The table is the 1st.
+        self.seat = self                                # Seat whose hands are being played.
+        self.dealer = None                              # The dealer's current hand on the table.
+
+        # Hands from earlier rounds, which are reset and reused instead of creating new ones. So a listener mustn't
+        # keep a hand after its round has been settled.
+        self.spare_hands = []
+
+    # Add a seat that plays by the parm strategy, and optionally bets by the parm counting.Bet_Ramp. Returns the seat.
+    def add_seat(self, strategy_name, bet_ramp=None):
+        if len(self.seats) >= MAX_SEATS:
+            raise ValueError("A table has at most %d seats." % MAX_SEATS)
+        seat = Seat(strategy_name, bet_ramp)
+        self.seats.append(seat)
+        return seat
+
+    # Return an empty hand, reusing a spare one if there is one.
+    def new_hand(self, name, stake, ancestors):
+        if self.spare_hands:
+            hand = self.spare_hands.pop()
+            hand.reset(name, stake, ancestors)
+            return hand
+        return Hand(name, stake, ancestors)
+
+    # Start profiling the rounds played at this table, and the reshuffles of its shoe.
+    def start_profiling(self):
+        self.profile = profiling.Profile()
+        self.shoe.profile = self.profile
+
+    # Add a listener, a function that will be called with each event at the table. See events.py.
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    # Call each of the listeners with the parm event.
+    def emit(self, event):
+        for listener in self.listeners:
+            listener(event)
+
     # Double down the stake on this hand.
     def double_down(self, hand):
-        self.invest(hand.stake)
+        self.seat.invest(hand.stake)
+        self.seat.doubles += 1
         hand.stake += hand.stake
 
-    # Add parm winnings to player running total or money won (or lost).
-    def win(self, winnings):
-        self.amount_won_or_lost += winnings
+        if self.listeners:
+            self.emit(events.Double(self, hand))
+
+        if self.profile is not None:
+            self.profile.events["doubles"] += 1
 
     # Deal one card from the front of the shoe to one of the hands.
     def deal_one_card(self, hand):
@@ -231,10 +433,12 @@ class Table:
     # When a card is dealt face up, it's value is visible, so the card count can be adjusted.
     def deal_one_card_face_up(self, hand):
         card = self.deal_one_card(hand)
-        current_shoe_size = self.shoe.shoe_size()
 
         # This card has been dealt face up, so adjust the card count.
-        self.shoe.card_count.adjust_count(card, current_shoe_size, self.betting_unit)
+        self.shoe.count_card(card)
+
+        if self.listeners:
+            self.emit(events.Card_Dealt(self, hand, card, True))
 
     def print_table_status(self):
         print("Rounds played=%d, Total staked=£%d, Amount won or lost=£%d"
@@ -246,276 +450,296 @@ class Table:
         while hand.value < 17 and not hand.busted:
             self.deal_one_card_face_up(hand)
 
-    # This section of Basic Strategy looks at the dealer's up card to make a more nuanced decision about whether
-    # to Hit or Stand.
-    def basic_strategy_section_1(self, hand, dealer_up_card):
+    # Play the parm hand according to the parm strategy chart. Pairs are looked up first, then soft hands, then
+    # Double Down on hard hands, and finally the player Hits until the chart says Stand.
+    def play_chart(self, hand, dealer_up_card, chart):
+        dealer_card_value = CARD_VALUES[dealer_up_card]
 
-        (_, _, dealer_card_value) = dealer_up_card
-        finished = False
-
-        while not finished:
-            if hand.value == 12 and dealer_card_value in ["2", "3"] \
-               or (hand.value in [12, 13, 14, 15, 16] and dealer_card_value in ["7", "8", "9", "10", "A"]) \
-               or hand.value <= 11:
-                self.deal_one_card_face_up(hand)            # "Hit"
+        # A hand can only be split if it has fewer than split_depth ancestors, and both cards are equal value.
+        if chart.pairs is not None and hand.ancestors < self.split_depth and hand.is_pair:
 
+            # Work out the card value of the pair. A pair of aces is the only pair that makes a soft hand.
+            if hand.is_soft:
+                pair_value = 11
             else:
-                finished = True                             # "Stand"
+                pair_value = hand.value // 2
 
-    # The section of Basic Strategy introduces rules for when to Double Down.
-    def basic_strategy_section_2(self, hand, dealer_up_card):
-        (_, _, dealer_card_value) = dealer_up_card
-
-        # It is only possible to Double Down with first 2 cards of the hand on table.
-        double_down = False
-        if hand.value == 11:
-            if dealer_card_value != "A":
-                double_down = True
-        elif hand.value == 10:
-            if not dealer_card_value in ["10", "A"]:
-                double_down = True
-        elif hand.value == 9 and dealer_card_value in ["3", "4", "5", "6"]:
-            double_down = True
-
-        if double_down:                                         # "Double Down"
-            self.double_down(hand)
-            self.deal_one_card_face_up(hand)                    # One more card only, after Double Down.
+            decision = chart.pairs[strategy.cell(pair_value - 2, dealer_card_value)]
+            if self.listeners:
+                self.emit(events.Decision(self, hand, decision))
 
-        # If we are not doubling down, then play Basic Strategy Section 1.
-        else:
-            self.basic_strategy_section_1(hand, dealer_up_card)
+            if decision == strategy.SPLIT:
+                self.split_hand(hand, dealer_up_card, chart)
+                return
 
-    # This section of Basic Strategy introduces rules for player hands that include an ace.
-    def basic_strategy_section_3(self, hand, dealer_up_card):
+            elif decision == strategy.DOUBLE:
+                self.double_down(hand)                                  # Double stake.
+                self.deal_one_card_face_up(hand)                        # One more card only, after Double Down.
+                return
 
-        other_card = ""
-        decision = ""
-
-        # Work out the values of both of the player's cards.
-        (_, _, player_card_1_value) = hand.cards[0]
-        (_, _, player_card_2_value) = hand.cards[1]
-
-        if player_card_1_value == "A":
-            other_card = player_card_2_value
-        elif player_card_2_value == "A":
-            other_card = player_card_1_value
-
-        # Are either of the player's cards an ace?
-        if other_card != "":
-            (_, _, dealer_card_value) = dealer_up_card
-
-            if other_card in ["8", "9", "10"]:
-                decision = "Stand"
-            elif other_card == "7":
-                if dealer_card_value in ["2", "7", "8"]:
-                    decision = "Stand"
-                elif dealer_card_value in ["9", "10", "A"]:
-                    decision = "Hit"
-                else:
-                    decision = "Double Down"
-            elif other_card == "6":
-                if dealer_card_value in ["3", "4", "5", "6"]:
-                    decision = "Double Down"
-                else:
-                    decision = "Hit"
-            elif other_card in ["4", "5"]:
-                if dealer_card_value in ["4", "5", "6"]:
-                    decision = "Double Down"
-                else:
-                    decision = "Hit"
-            elif other_card in ["2", "3"]:
-                if dealer_card_value in ["5", "6"]:
-                    decision = "Double Down"
-                else:
-                    decision = "Hit"
-
-        if other_card == "":                                        # If neither card is an ace,
-            self.basic_strategy_section_2(hand, dealer_up_card)     # ... continue with Section 2 strategy.
-
-        elif decision == "Double Down":
-            self.double_down(hand)                                  # Double stake.
-            self.deal_one_card_face_up(hand)                                # One more card only, after Double Down.
-
-        elif decision == "Hit":
-            self.deal_one_card_face_up(hand)                        # "Hit",
-            self.basic_strategy_section_2(hand, dealer_up_card)     # ... and then continue with Section 2 strategy.
-
-        elif decision != "Stand":                                   # "Stand" means do nothing, but otherwise,
-            self.basic_strategy_section_2(hand, dealer_up_card)     # ... continue with Section 2 strategy.
+            elif decision == strategy.HIT:
+                self.deal_one_card_face_up(hand)                        # Deal one card to the hand.
 
-    # This section of Basic Strategy introduces rules for player hands which with matching card values, which may
-    # be Split.
-    def basic_strategy_section_4(self, hand, dealer_up_card):
+            elif decision == strategy.STAND:
+                return
 
-        # Work out the values of both of the player's cards.
-        (_, _, player_card_1_value) = hand.cards[0]
-        (_, _, player_card_2_value) = hand.cards[1]
+        # Special rules when one of the player's first 2 cards is an ace.
+        if chart.soft is not None and hand.is_soft and len(hand.cards) == 2:
+            decision = chart.soft[strategy.cell(hand.value - 12, dealer_card_value)]
+            if self.listeners:
+                self.emit(events.Decision(self, hand, decision))
 
-        # Rule is that 1st hand can only be split twice. Ie. no more than 4 hands for 1 player in a single game.
-        # And a hand can only be split if both cards are equal value.
-        if hand.ancestors <= 1 and player_card_1_value == player_card_2_value:
+            if decision == strategy.STAND:
+                return
 
-            (_, _, dealer_card_value) = dealer_up_card
+            elif decision == strategy.DOUBLE:
+                self.double_down(hand)                                  # Double stake.
+                self.deal_one_card_face_up(hand)                        # One more card only, after Double Down.
+                return
 
-            decision_map = \
-            {("A", "2"): "SP", ("A", "3"): "SP", ("A", "4"): "SP", ("A", "5"): "SP", ("A", "6"): "SP", ("A", "7"): "SP", ("A", "8"): "SP", ("A", "9"): "SP", ("A", "10"): "SP", ("A", "A"): "SP",
-            ("10", "2"): "S", ("10", "3"): "S", ("10", "4"): "S", ("10", "5"): "S", ("10", "6"): "S", ("10", "7"): "S", ("10", "8"): "S", ("10", "9"): "S", ("10", "10"): "S", ("10", "A"): "S",
-            ("9", "2"): "SP", ("9", "3"): "SP", ("9", "4"): "SP", ("9", "5"): "SP", ("9", "6"): "SP", ("9", "7"): "S", ("9", "8"): "SP", ("9", "9"): "SP", ("9", "10"): "S", ("9", "A"): "S",
-            ("8", "2"): "SP", ("8", "3"): "SP", ("8", "4"): "SP", ("8", "5"): "SP", ("8", "6"): "SP", ("8", "7"): "SP", ("8", "8"): "SP", ("8", "9"): "SP", ("8", "10"): "SP", ("8", "A"): "SP",
-            ("7", "2"): "SP", ("7", "3"): "SP", ("7", "4"): "SP", ("7", "5"): "SP", ("7", "6"): "SP", ("7", "7"): "SP", ("7", "8"): "H", ("7", "9"): "H", ("7", "10"): "H", ("7", "A"): "H",
-            ("6", "2"): "SP", ("6", "3"): "SP", ("6", "4"): "SP", ("6", "5"): "SP", ("6", "6"): "SP", ("6", "7"): "H", ("6", "8"): "H", ("6", "9"): "H", ("6", "10"): "H", ("6", "A"): "H",
-            ("5", "2"): "D", ("5", "3"): "D", ("5", "4"): "D", ("5", "5"): "D", ("5", "6"): "D", ("5", "7"): "D", ("5", "8"): "D", ("5", "9"): "D", ("5", "10"): "H", ("5", "A"): "H",
-            ("4", "2"): "H", ("4", "3"): "H", ("4", "4"): "H", ("4", "5"): "SP", ("4", "6"): "SP", ("4", "7"): "H", ("4", "8"): "H", ("4", "9"): "H", ("4", "10"): "H", ("4", "A"): "H",
-            ("3", "2"): "SP", ("3", "3"): "SP", ("3", "4"): "SP", ("3", "5"): "SP", ("3", "6"): "SP", ("3", "7"): "SP", ("3", "8"): "H", ("3", "9"): "H", ("3", "10"): "H", ("3", "A"): "H",
-            ("2", "2"): "SP", ("2", "3"): "SP", ("2", "4"): "SP", ("2", "5"): "SP", ("2", "6"): "SP", ("2", "7"): "SP", ("2", "8"): "H", ("2", "9"): "H", ("2", "10"): "H", ("2", "A"): "H"}
+            elif decision == strategy.HIT:
+                self.deal_one_card_face_up(hand)
 
-            decision = decision_map.get((player_card_1_value, dealer_card_value))
+        # Double Down rules.
+        if not hand.busted and chart.hard[strategy.cell(hand.value, dealer_card_value)] == strategy.DOUBLE:
+            if self.listeners:
+                self.emit(events.Decision(self, hand, strategy.DOUBLE))
+            self.double_down(hand)
+            self.deal_one_card_face_up(hand)                            # One more card only, after Double Down.
+            return
 
-            if decision == "SP":                                        # "Split"
-                hand.stake = hand.stake / 2                             # Stake is split between parent and child hands.
+        # Hit until the chart says Stand. A Double Down at this point means Hit.
+        while not hand.busted and chart.hard[strategy.cell(hand.value, dealer_card_value)] != strategy.STAND:
+            if self.listeners:
+                self.emit(events.Decision(self, hand, strategy.HIT))
+            self.deal_one_card_face_up(hand)
 
-                # Add the new child hand to the list of player's hands that are on the table.
-                self.player_hands.append(Hand("Child of " + hand.name,
-                                              hand.stake,               # New hand has same newly halved stake as parent.
-                                              hand.ancestors + 1))      # It has 1 more ancestor than its parent.
+        if self.listeners and not hand.busted:
+            self.emit(events.Decision(self, hand, strategy.STAND))
 
-                new_hand_index = len(self.player_hands) -1
-                self.hands_played_by_player += 1
+    # Split the parm hand into 2 hands, and play both of them according to the parm strategy chart.
+    def split_hand(self, hand, dealer_up_card, chart):
+        hand.stake = hand.stake / 2                             # Stake is split between parent and child hands.
 
-                # Move 2nd card from parent hand to child hand.
-                second_card = hand.cards.pop(1)
-                self.player_hands[new_hand_index].receive_card(second_card)
+        # Add the new child hand to the list of player's hands that are on the table.
+        child = self.new_hand("Child of " + hand.name,
+                              hand.stake,                       # New hand has same newly halved stake as parent.
+                              hand.ancestors + 1)               # It has 1 more ancestor than its parent.
+        self.seat.player_hands.append(child)
+        self.seat.hands_played_by_player += 1
+        self.seat.splits += 1
 
-                # Deal a card to parent, so that it has 2 cards again.
-                self.deal_one_card_face_up(hand)
+        # Move 2nd card from parent hand to child hand.
+        child.receive_card(hand.remove_second_card())
 
-                # The parent hand is now a child too.
-                hand.ancestors += 1
+        if self.listeners:
+            self.emit(events.Split(self, hand, child))
 
-                # Now apply this strategy to the new version of the parent hand.
-                self.basic_strategy_section_4(hand, dealer_up_card)
+        # Deal a card to parent, so that it has 2 cards again.
+        self.deal_one_card_face_up(hand)
 
-                # Now work on the child hand.
-                self.deal_one_card_face_up(self.player_hands[new_hand_index])
+        # The parent hand is now a child too.
+        hand.ancestors += 1
 
-                # Now apply this strategy to the child hand.
-                self.basic_strategy_section_4(self.player_hands[new_hand_index], dealer_up_card)
+        # Now apply this strategy to the new version of the parent hand.
+        self.play_chart(hand, dealer_up_card, chart)
 
-            elif decision == "D":                                       # "Double Down"
-                self.double_down(hand)                                  # Double stake.
-                self.deal_one_card_face_up(hand)                                # One more card only, after Double Down.
+        # Now work on the child hand.
+        self.deal_one_card_face_up(child)
+
+        # Now apply this strategy to the child hand.
+        self.play_chart(child, dealer_up_card, chart)
 
-            elif decision == "H":                                       # "Hit"
-                self.deal_one_card_face_up(hand)                                # Deal one card to the hand.
+    # This section of Basic Strategy looks at the dealer's up card to make a more nuanced decision about whether
+    # to Hit or Stand.
+    def basic_strategy_section_1(self, hand, dealer_up_card):
+        self.play_chart(hand, dealer_up_card, self.charts["Basic Strategy Section 1"])
 
-                self.basic_strategy_section_3(hand, dealer_up_card)     # ... and then continue with Section 3 strategy.
+    # The section of Basic Strategy introduces rules for when to Double Down.
+    def basic_strategy_section_2(self, hand, dealer_up_card):
+        self.play_chart(hand, dealer_up_card, self.charts["Basic Strategy Section 2"])
 
-            elif decision != "S":                                       # "Stand" means do nothing, but otherwise,
-                self.basic_strategy_section_3(hand, dealer_up_card)     # ... continue with Section 3 strategy.
+    # This section of Basic Strategy introduces rules for player hands that include an ace.
+    def basic_strategy_section_3(self, hand, dealer_up_card):
+        self.play_chart(hand, dealer_up_card, self.charts["Basic Strategy Section 3"])
 
-        else:
-            self.basic_strategy_section_3(hand, dealer_up_card)
+    # This section of Basic Strategy introduces rules for player hands which with matching card values, which may
+    # be Split.
+    def basic_strategy_section_4(self, hand, dealer_up_card):
+        self.play_chart(hand, dealer_up_card, self.charts["Basic Strategy Section 4"])
+
+    # Look up the strategy chart and counting system of each seat's strategy.
+    def look_up_strategies(self):
+        for seat in self.seats:
+            seat.chart = self.charts[seat.strategy_name]
+            seat.system = counting.SYSTEMS.get(seat.strategy_name)
 
+    # Play one round at every seat. The table's own seat plays by the parm strategy.
     def play_one_round(self, strategy_name):
+        self.strategy_name = strategy_name
+        self.look_up_strategies()
+        self.play_round()
+
+    # Play the parm number of rounds at every seat, in one loop. The table's own seat plays by the parm strategy.
+    # Returns a Round_Summary of the rounds for the table's own seat. Other seats keep their own running totals.
+    def play_rounds(self, n, strategy_name):
+        self.strategy_name = strategy_name
+        self.look_up_strategies()
+
+        before = (self.total_staked, self.amount_won_or_lost, self.hands_played_by_player, self.splits, self.doubles,
+                  self.blackjacks)
+
+        play_round = self.play_round
+        for r in range(n):
+            play_round()
 
+        return Round_Summary(n, self.total_staked - before[0], self.amount_won_or_lost - before[1],
+                             self.hands_played_by_player - before[2], self.splits - before[3],
+                             self.doubles - before[4], self.blackjacks - before[5])
+
+    # Play one round at every seat, by the strategies that have been looked up.
+    def play_round(self):
         self.rounds_played += 1                             # Increment number of rounds played on this table.
 
+        profile = self.profile
+        if profile is not None:
+            start = profiling.clock()
+
         # Create a hand of cards for the dealer. Dealer has no money staked.
-        self.dealer = Hand("Dealer Hand",
-                            0,                              # Dealer has no money staked.
-                            0)                              # This hand has no ancestors.
+        self.dealer = self.new_hand("Dealer Hand",
+                                    0,                      # Dealer has no money staked.
+                                    0)                      # This hand has no ancestors.
+
+        won_before = []
+        for seat in self.seats:
+            if seat is not self:
+                seat.rounds_played += 1
+            won_before.append(seat.amount_won_or_lost)
+
+            # If we're doing card counting, then bet according to the calculation of the card counting strategy.
+            if seat.system is not None:
+                this_stake = self.shoe.counter(seat.system).bet_size(self.shoe.shoe_size(), self.betting_unit,
+                                                                seat.bet_ramp)
+            else:
+                this_stake = self.betting_unit
+            seat.invest(this_stake)
 
-        if verbose:
-            self.shoe.card_count.print()  # Print the status of the card counting.
+            if self.listeners:
+                self.emit(events.Round_Start(self, seat.strategy_name, this_stake, seat))
 
-        # If we're doing card counting, then bet according to the calculation of the card counting strategy.
-        if strategy_name == "Hi-Lo Card Count":
-            this_stake = self.shoe.card_count.bet_size
-        else:
-            this_stake = self.betting_unit
-        self.invest(this_stake)
+            # Create a first hand of cards for the player.
+            seat.player_hands.append(self.new_hand("Player Hand",
+                                                   this_stake,
+                                                   0))      # The player's first hand has no ancestors.
+            seat.hands_played_by_player += 1
 
-        # Create a first hand of cards for the player.
-        self.player_hands.append(Hand("Player Hand",
-                                      this_stake,
-                                      0))                   # The player's first hand has no ancestors.
-        self.hands_played_by_player += 1
+        # Deal first cards in classic order (each Player, Dealer, each Player, Dealer).
+        for seat in self.seats:
+            self.deal_one_card_face_up(seat.player_hands[0])    # Face up.
+        self.deal_one_card_face_up(self.dealer)                 # Face up.
+        for seat in self.seats:
+            self.deal_one_card_face_up(seat.player_hands[0])    # Face up.
+        hole_card = self.deal_one_card(self.dealer)             # Not face up.
 
-        # Deal first 4 cards in classic order (Player, Dealer, Player, Dealer).
-        self.deal_one_card_face_up(self.player_hands[0])    # Face up.
-        self.deal_one_card_face_up(self.dealer)             # Face up.
-        self.deal_one_card_face_up(self.player_hands[0])    # Face up.
-        self.deal_one_card(self.dealer)                     # Not face up.
+        if self.listeners:
+            self.emit(events.Card_Dealt(self, self.dealer, hole_card, False))
 
         # Check both Player and Dealer's hands for Blackjack on original 2 cards only.
         self.dealer.check_blackjack()
-        self.player_hands[0].check_blackjack()
+        for seat in self.seats:
+            seat.player_hands[0].check_blackjack()
 
-        if self.player_hands[0].blackjack:                  # Player has a Blackjack.
-            if self.dealer.blackjack:                       # Dealer also has a Blackjack,
-                self.win(self.player_hands[0].stake)        # ... so player wins his stake back.
-            else:                                           # Player has Blackjack, and dealer doesn't have one,
-                # ... so he wins his stake back, plus his stake multiplied by Blackjack odds.
-                self.win(self.player_hands[0].stake + self.blackjack_value * self.player_hands[0].stake)
+        if profile is not None:
+            start = profile.add("deal", start)
 
-        # No Blackjack for the player, so proceed to a playing strategy.
-        else:
-            # The Dealer's up card, is the first card in his hand. Some strategies vary their decisions based upon it.
-            dealer_up_card = self.dealer.cards[0]
-
-            # Convert the parm strategy string into a strategy function.
-            # Note that card counting is based on Basic Strategy.
-            strategy_map = {"Dealer": self.dealer_stategy,
-                            "Basic Strategy Section 1": self.basic_strategy_section_1,
-                            "Basic Strategy Section 2": self.basic_strategy_section_2,
-                            "Basic Strategy Section 3": self.basic_strategy_section_3,
-                            "Basic Strategy Section 4": self.basic_strategy_section_4,
-                            "Hi-Lo Card Count": self.basic_strategy_section_4}
-            strategy = strategy_map.get(strategy_name)
-
-            strategy(self.player_hands[0], dealer_up_card)
-
-            # Does the player have any non-busted hands?
-            all_player_hands_busted = True
-            for ph in self.player_hands:
-                if ph.busted == False:
-                    all_player_hands_busted = False
-
-            # If player has executed his strategy without busting all of his hands,
-            # and the dealer doesn't have a Blackjack...
-            # ... then it is the dealer's turn to play.
-            if not all_player_hands_busted and not self.dealer.blackjack:
-
-                # First turn over the dealer's second card (index=1), and adjust the card count.
-                self.shoe.card_count.adjust_count(self.dealer.cards[1], self.shoe.shoe_size(), self.betting_unit)
-
-                self.dealer_stategy(self.dealer, dealer_up_card)
-
-                # Compare each of the player's hands with the dealer's hand.
-                for ph in self.player_hands:
+        # The Dealer's up card, is the first card in his hand. Some strategies vary their decisions based upon it.
+        dealer_up_card = self.dealer.cards[0]
+
+        all_player_hands_busted = True
+        for seat in self.seats:
+            first_hand = seat.player_hands[0]
+
+            if first_hand.blackjack:                        # Player has a Blackjack.
+                seat.blackjacks += 1
+                if self.dealer.blackjack:                   # Dealer also has a Blackjack,
+                    seat.win(first_hand.stake)              # ... so player wins his stake back.
+                else:                                       # Player has Blackjack, and dealer doesn't have one,
+                    # ... so he wins his stake back, plus his stake multiplied by Blackjack odds.
+                    seat.win(first_hand.stake + self.blackjack_value * first_hand.stake)
+
+            # No Blackjack for the player, so proceed to a playing strategy.
+            else:
+                # Look up the chart for the seat's strategy string, and play the player's hand by it.
+                self.seat = seat
+                self.play_chart(first_hand, dealer_up_card, seat.chart)
+
+                # Does the player have any non-busted hands?
+                for ph in seat.player_hands:
+                    if ph.busted == False:
+                        all_player_hands_busted = False
+
+        self.seat = self
+
+        # Every phase is timed in every round, even if nothing happens in it, so that no phase's time is counted in the
+        # next one.
+        if profile is not None:
+            start = profile.add("strategy", start)
+
+        # If the players have executed their strategies without busting all of their hands,
+        # and the dealer doesn't have a Blackjack...
+        # ... then it is the dealer's turn to play.
+        dealer_plays = not all_player_hands_busted and not self.dealer.blackjack
+        if dealer_plays:
+
+            # First turn over the dealer's second card (index=1), and adjust the card count.
+            self.shoe.count_card(self.dealer.cards[1])
+
+            self.dealer_stategy(self.dealer, dealer_up_card)
+
+        if profile is not None:
+            start = profile.add("dealer", start)
+
+        if dealer_plays:
+
+            # Compare each of the players' hands with the dealer's hand.
+            for seat in self.seats:
+                if seat.player_hands[0].blackjack:          # Blackjacks have already been settled.
+                    continue
+
+                for ph in seat.player_hands:
                     if not ph.busted:                       # Only interested in non-busted player hands.
 
                         # If Dealer has busted, or Player has higher score than Dealer, then pleyer wins.
                         if self.dealer.busted or ph.value > self.dealer.value:
-                            self.win(2 * ph.stake)          # Win 1*stake as winnings, plus get stake back.
+                            seat.win(2 * ph.stake)          # Win 1*stake as winnings, plus get stake back.
 
                         # Dealer and Player have matching scores, so no winner... but Player does get his stake back.
                         elif ph.value == self.dealer.value:
-                            self.win(ph.stake)
+                            seat.win(ph.stake)
+
+        for (seat, before) in zip(self.seats, won_before):
+            seat.round_stats.add(seat.amount_won_or_lost - before)
 
-        if verbose:
-            for ph in self.player_hands:
-                ph.print()                                  # Print all of the dealer's hands.
-            self.dealer.print()                             # Print the dealer's hand.
-            self.shoe.print()                               # Print status of the shoe.
-            self.print_table_status()                       # Print the status of the table.
-            print()
+            if self.listeners:
+                self.emit(events.Settle(self, seat.amount_won_or_lost - before, seat))
 
-        # Game is over, so Player & Dealer dispose of their hands of cards.
-        del self.dealer
-        self.player_hands = []
+        if profile is not None:
+            profile.events["rounds"] += 1
+            for seat in self.seats:
+                profile.events["splits"] += len(seat.player_hands) - 1
+            start = profile.add("settle", start)
+
+        # Game is over, so Player & Dealer dispose of their hands of cards. They are kept to be reused.
+        self.spare_hands.append(self.dealer)
+        self.dealer = None
+        for seat in self.seats:
+            self.spare_hands.extend(seat.player_hands)
+            seat.player_hands.clear()
 
         # Check if the shoe needs to be replenished.
-        self.shoe.replenish()
+        if self.shoe.replenish() and self.listeners:
+            self.emit(events.Shoe_Replenished(self))
+
+        if profile is not None:
+            profile.add("replenish", start)
 
-verbose = False
\ No newline at end of file
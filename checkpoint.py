@@ -0,0 +1,115 @@
+# Checkpoints of studies, so that a long study that is interrupted can be resumed. The checkpoint is a JSON file that
+# holds the study's seed, its settings, and the result of every session recorded so far. Each session's seed is
+# derived from the study's seed, so when the study is resumed, the recorded results are added to the experiments
+# again, in the same order, and the remaining sessions are played just as they would have been. The final numbers
+# are the same as those of a study that wasn't interrupted. The checkpoint file is deleted when the study finishes.
+
+import json
+import os
+import profiling
+import running_stats
+import shutil
+
+
+# Return a session result, (amount_won_or_lost, total_staked, hands_played_by_player, round_stats, profile), as a list
+# that can be written as JSON.
+def encode(result):
+    (amount_won_or_lost, total_staked, hands_played_by_player, round_stats, profile) = result
+    if profile is not None:
+        profile = vars(profile)
+    return [amount_won_or_lost, total_staked, hands_played_by_player, list(round_stats.summary()), profile]
+
+
+# Return the session result that was encoded as the parm list.
+def decode(saved):
+    (amount_won_or_lost, total_staked, hands_played_by_player, summary, profile_state) = saved
+    round_stats = running_stats.Running_Stats()
+    round_stats.restore(summary)
+
+    profile = None
+    if profile_state is not None:
+        profile = profiling.Profile()
+        vars(profile).update(profile_state)
+    return amount_won_or_lost, total_staked, hands_played_by_player, round_stats, profile
+
+
+class Checkpoint:
+
+    # Open the checkpoint file with the parm filename. If the file exists, then the study is resumed from it.
+    def __init__(self, filename):
+        self.filename = filename
+        self.state = None                       # {"seed": seed, "settings": {...}, "results": [[result, ...], ...]}
+        self.record_session = None              # Function that adds a session's result to the study.
+
+        if os.path.exists(filename):
+            with open(filename, encoding="utf-8") as checkpoint_file:
+                self.state = json.load(checkpoint_file)
+
+    # Return the seed of the study. If the study is being resumed, then this is the seed in the checkpoint.
+    def seed(self, seed):
+        if self.state is None:
+            return seed
+        if seed is not None and seed != self.state["seed"]:
+            raise ValueError("Checkpoint %s has seed %d, not %d." % (self.filename, self.state["seed"], seed))
+        return self.state["seed"]
+
+    # Add the results in the checkpoint to the study, by calling record_session(experiment number, result) in the same
+    # order as they were first recorded. Returns the lists of jobs that still need to be played. The settings are a
+    # dictionary of the study's parameters, which must match those of the checkpointed study.
+    def resume(self, seed, settings, job_lists, record_session, finished):
+        self.record_session = record_session
+
+        if self.state is None:
+            self.state = {"seed": seed, "settings": settings, "results": [[] for jobs in job_lists]}
+            self.save()
+            return job_lists
+
+        if self.state["settings"] != settings or len(self.state["results"]) != len(job_lists):
+            raise ValueError("Checkpoint %s is of a study with different settings." % self.filename)
+
+        for (e, results) in enumerate(self.state["results"]):
+            for saved in results:
+                record_session(e, decode(saved))
+
+        # Whether an experiment has finished can depend on other experiments, such as the other seats of its table, so
+        # it is only asked once all of the results have been added.
+        remaining = []
+        for (e, jobs) in enumerate(job_lists):
+            if finished(e):
+                remaining.append([])
+            else:
+                remaining.append(jobs[len(self.state["results"][e]):])
+
+            # Sessions that were being played when the study stopped may have written part of an outcome log.
+            for job in remaining[-1]:
+                if job.get("record") is not None and os.path.exists(job["record"]):
+                    shutil.rmtree(job["record"])
+
+        return remaining
+
+    # Add the result of one session to the study, and to the checkpoint.
+    def record(self, e, result):
+        self.record_results([(e, result)])
+
+    # Add the results of one session of several experiments to the study, and to the checkpoint, for example the seats
+    # of a table. results is a list of (experiment number, result). They are saved together, so that if the study is
+    # interrupted, either all of them or none of them are in the checkpoint.
+    def record_results(self, results):
+        for (e, result) in results:
+            self.record_session(e, result)
+            self.state["results"][e].append(encode(result))
+        self.save()
+
+    # The study has finished, so delete the checkpoint file. Otherwise the next study with the same checkpoint file would
+    # resume from it, and just replay the saved results, even if the simulator has changed since.
+    def finish(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    # Write the checkpoint file. It is written to a temporary file first, then renamed, so that if the study is
+    # interrupted while the file is being written, the previous checkpoint is still there.
+    def save(self):
+        temporary = self.filename + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(self.state, checkpoint_file)
+        os.replace(temporary, self.filename)
@@ -0,0 +1,110 @@
+# Command line interface of the simulator, run by "python cli.py". Each command imports the modules it needs
+# only when it is run, so that importing the simulator, or asking for help, doesn't load NumPy or start any workers.
+#
+# python cli.py study --sessions 10 --rounds 100000 --workers 8 --seed 42
+# python cli.py shoe-study --decks 1 2 --penetration 0.75 0.85
+# python cli.py sweep --strategy "Hi-Lo Card Count" "Zen Card Count" --decks 1 2 4 6 8
+# python cli.py bench --save-baseline
+
+import argparse
+import os
+import sys
+
+PROG = "python cli.py"
+
+
+# Add the arguments that every command that plays sessions has to the parm parser. If grid is True, then decks and
+# penetration take a list of values, one for each cell of a grid.
+def add_session_arguments(parser, grid=False):
+    parser.add_argument("--sessions", type=int, default=10, help="sessions played by each experiment")
+    parser.add_argument("--rounds", type=int, default=100000, help="rounds played in each session")
+    if grid:
+        parser.add_argument("--decks", type=int, nargs="+", help="numbers of decks in the shoe")
+        parser.add_argument("--penetration", type=float, nargs="+", help="penetrations that replenish the shoe")
+    else:
+        parser.add_argument("--decks", type=int, default=4, help="number of decks in the shoe")
+        parser.add_argument("--penetration", type=float, default=0.75, help="penetration that replenishes the shoe")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes that play sessions")
+    parser.add_argument("--seed", type=int, help="seed that every session's seed is derived from")
+
+
+def study_command(args):
+    import study
+
+    this_study = study.Study(args.sessions, args.rounds, seed=args.seed, workers=args.workers,
+                             checkpoint_file=args.checkpoint, decks=args.decks, penetration=args.penetration)
+    this_study.write_to_file()
+    return 0
+
+
+def shoe_study_command(args):
+    import shoe_study
+
+    this_study = shoe_study.Shoe_Study(args.sessions, args.rounds, seed=args.seed, workers=args.workers,
+                                       checkpoint_file=args.checkpoint, decks=args.decks,
+                                       penetrations=args.penetration)
+    this_study.write_to_file()
+    return 0
+
+
+def sweep_command(args):
+    import sweep
+
+    grid = {}
+    for (name, values) in [("strategy_name", args.strategy), ("decks", args.decks),
+                           ("penetration", args.penetration)]:
+        if values is not None:
+            grid[name] = values
+    sweep.Sweep(grid, args.sessions, args.rounds, seed=args.seed, workers=args.workers,
+                results_file=args.results_file)
+    return 0
+
+
+def bench_command(args):
+    import bench
+
+    return bench.main(args.bench_arguments, PROG + " bench")
+
+
+# Return the parser of the command line.
+def make_parser():
+    parser = argparse.ArgumentParser(prog=PROG, description="Simulate games of Blackjack.")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    study_parser = commands.add_parser("study", help="compare the player strategies")
+    add_session_arguments(study_parser)
+    study_parser.add_argument("--checkpoint", help="checkpoint file, to continue the study from where it stopped")
+    study_parser.set_defaults(function=study_command)
+
+    shoe_study_parser = commands.add_parser("shoe-study", help="compare shoe sizes and penetrations")
+    add_session_arguments(shoe_study_parser, grid=True)
+    shoe_study_parser.add_argument("--checkpoint", help="checkpoint file, to continue the study from where it stopped")
+    shoe_study_parser.set_defaults(function=shoe_study_command)
+
+    sweep_parser = commands.add_parser("sweep", help="sweep a grid of table parameters")
+    add_session_arguments(sweep_parser, grid=True)
+    sweep_parser.add_argument("--strategy", nargs="+", help="names of the strategies")
+    sweep_parser.add_argument("--results-file", default="sweep_results.csv", help="CSV file of the cells' results")
+    sweep_parser.set_defaults(function=sweep_command)
+
+    # The benchmark's own arguments are passed on to bench.main, see "python cli.py bench --help".
+    bench_parser = commands.add_parser("bench", help="benchmark the speed of the simulator", add_help=False)
+    bench_parser.set_defaults(function=bench_command)
+
+    return parser
+
+
+# Run the command in the parm list of command line arguments (by default, sys.argv). Returns the exit status.
+def main(argv=None):
+    parser = make_parser()
+    (args, unknown) = parser.parse_known_args(argv)
+    if args.command == "bench":
+        args.bench_arguments = unknown
+    elif len(unknown) > 0:
+        parser.error("unrecognized arguments: %s" % " ".join(unknown))
+    return args.function(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# Card counting systems. Each system gives every card a tag, which is added to the running count when the card is
+# seen. Tags are kept in a list indexed by card, so counting a card is one list lookup. The true count and the size of
+# the bet are only worked out when a bet is placed.
+# See - https://en.wikipedia.org/wiki/Card_counting
+#
+# Balanced systems have tags that add up to 0 over a deck, and bet by the true count (running count per deck left in
+# the shoe). Unbalanced systems start the running count at an initial running count, chosen so that the running count
+# passes through the system's pivot at the same true count whatever the number of decks left. Their true count is
+# worked out from how far the running count is from the pivot, per deck left.
+
+
+# Card value of the parm card (rank * 4 + suit), 2 to 11 (ace). The same as blackjack.CARD_VALUES.
+def card_value(card):
+    rank = card // 4
+    return 11 if rank == 12 else min(rank + 2, 10)
+
+
+class Bet_Ramp:
+
+    # The bet is (count - pivot) * units_per_count betting units, limited to between min_units and max_units. The
+    # default is the original Hi-Lo bet of (true count - 1) betting units, which is never -ve.
+    def __init__(self, pivot=1, units_per_count=1, min_units=0, max_units=None):
+        self.pivot = pivot
+        self.units_per_count = units_per_count
+        self.min_units = min_units
+        self.max_units = max_units                      # None means no limit.
+
+    # Return the number of betting units to bet at the parm count.
+    def units(self, count):
+        units = (count - self.pivot) * self.units_per_count
+        if units < self.min_units:                      # Can't bet a -ve stake :)
+            units = self.min_units
+        if self.max_units is not None and units > self.max_units:
+            units = self.max_units
+        return units
+
+
+# Bet ramps of level 1 and level 2 systems. Level 2 systems give some cards a tag of 2, so their true counts are about
+# twice those of level 1 systems, and their ramp has twice the pivot and half the units per count. So every system bets
+# about as much as Hi-Lo at the same advantage.
+LEVEL_1_RAMP = Bet_Ramp(pivot=1, units_per_count=1)
+LEVEL_2_RAMP = Bet_Ramp(pivot=2, units_per_count=0.5)
+
+
+class Counting_System:
+
+    # value_tags is a list of the tags of card values 2 to 11 (ace). For systems whose tags depend on the suit too,
+    # card_tags is a list of the tags of each of the 52 cards instead. Unbalanced systems start the running count at
+    # initial_per_deck * decks + initial_offset, and their pivot is the running count at which the true count is
+    # -initial_per_deck, the tags' total over a deck.
+    def __init__(self, name, value_tags=None, card_tags=None, balanced=True, initial_per_deck=0, initial_offset=0,
+                 pivot=0, ramp=None):
+        self.name = name
+        self.value_tags = value_tags                    # None if the tags depend on suit.
+        if card_tags is None:
+            card_tags = [value_tags[card_value(c) - 2] for c in range(52)]
+        self.tags = card_tags                           # Tag of each card, indexed by card.
+        self.balanced = balanced
+        self.initial_per_deck = initial_per_deck
+        self.initial_offset = initial_offset
+        self.pivot = pivot
+
+        if ramp is None:
+            ramp = Bet_Ramp()
+        self.ramp = ramp
+
+    # Return the running count at the start of a shoe of the parm number of decks.
+    def initial_running_count(self, decks):
+        return self.initial_per_deck * decks + self.initial_offset
+
+
+# Red 7s are counted as +1, and black 7s as 0.
+RED_SEVEN_TAGS = [1 if card_value(c) <= 6 or (card_value(c) == 7 and c % 4 in [1, 2]) else
+                  -1 if card_value(c) >= 10 else 0 for c in range(52)]
+
+#                                        2  3  4  5  6  7  8   9  10   A
+HI_LO = Counting_System("Hi-Lo",        [1, 1, 1, 1, 1, 0, 0,  0, -1, -1], ramp=LEVEL_1_RAMP)
+HI_OPT_I = Counting_System("Hi-Opt I",  [0, 1, 1, 1, 1, 0, 0,  0, -1,  0], ramp=LEVEL_1_RAMP)
+HI_OPT_II = Counting_System("Hi-Opt II", [1, 1, 2, 2, 1, 1, 0,  0, -2,  0], ramp=LEVEL_2_RAMP)
+OMEGA_II = Counting_System("Omega II",  [1, 1, 2, 2, 2, 1, 0, -1, -2,  0], ramp=LEVEL_2_RAMP)
+ZEN = Counting_System("Zen",            [1, 1, 2, 2, 2, 1, 0,  0, -2, -1], ramp=LEVEL_2_RAMP)
+KO = Counting_System("KO",              [1, 1, 1, 1, 1, 1, 0,  0, -1, -1], balanced=False, initial_per_deck=-4,
+                     initial_offset=4, pivot=4, ramp=LEVEL_1_RAMP)
+UBZ_II = Counting_System("UBZ II",      [1, 2, 2, 2, 2, 1, 0,  0, -2, -1], balanced=False, initial_per_deck=-4,
+                         pivot=0, ramp=LEVEL_2_RAMP)
+RED_SEVEN = Counting_System("Red Seven", card_tags=RED_SEVEN_TAGS, balanced=False, initial_per_deck=-2, pivot=0,
+                            ramp=LEVEL_1_RAMP)
+
+# Card counting strategies, keyed by strategy name. They all play their hands by Basic Strategy Section 4.
+SYSTEMS = {system.name + " Card Count": system
+           for system in [HI_LO, KO, HI_OPT_I, HI_OPT_II, OMEGA_II, ZEN, UBZ_II, RED_SEVEN]}
+
+
+# Card counter for one shoe. Counts the cards of the shoe that the player has seen, by one counting system.
+class Card_Counting:
+
+    def __init__(self, system=HI_LO):
+        self.system = system
+        self.tags = system.tags
+        self.running_count = 0
+
+    # Start counting a fresh shoe of the parm number of decks.
+    def reset(self, decks):
+        self.running_count = self.system.initial_running_count(decks)
+
+    # Adjust the running count for a card that has been seen.
+    def adjust_count(self, card):
+        self.running_count += self.tags[card]
+
+    # Return the true count that bets are based on, for a shoe with the parm number of cards left in it. For an
+    # unbalanced system, it is the true count at the pivot, plus the distance of the running count from the pivot per
+    # deck left.
+    def true_count(self, shoe_size):
+        system = self.system
+        if system.balanced:
+            return int(self.running_count / (shoe_size / 52))
+        return int(-system.initial_per_deck + (self.running_count - system.pivot) / (shoe_size / 52))
+
+    # Return the size of the bet to place, by the parm bet ramp, or the system's own ramp if it is None.
+    def bet_size(self, shoe_size, betting_unit, ramp=None):
+        if ramp is None:
+            ramp = self.system.ramp
+        return ramp.units(self.true_count(shoe_size)) * betting_unit
+
+    def print(self, shoe_size, betting_unit):
+        print("Running count=%d, True count=%d, Bet size=%d" % (self.running_count, self.true_count(shoe_size),
+                                                                  self.bet_size(shoe_size, betting_unit)))
@@ -0,0 +1,54 @@
+# Events that happen at a table while a round is played. A listener is any function that takes one event, and is added
+# to a table with Table.add_listener. Events are small named tuples. A table only makes events while it has at least
+# one listener, so they cost almost nothing when nobody is listening.
+
+from collections import namedtuple
+import counting
+
+# A new round has started, and the player at the parm seat has placed the parm stake. There is one for each seat of the
+# table. A table is its own first seat, see blackjack.Seat.
+Round_Start = namedtuple("Round_Start", ["table", "strategy_name", "stake", "seat"])
+
+# A card was dealt to a hand. Every card is dealt face up, except the dealer's second card.
+Card_Dealt = namedtuple("Card_Dealt", ["table", "hand", "card", "face_up"])
+
+# The player's strategy chose an action for a hand, one of strategy.STAND, HIT, DOUBLE or SPLIT.
+Decision = namedtuple("Decision", ["table", "hand", "action"])
+
+# A hand was split. The child hand has taken the second card of the parent hand.
+Split = namedtuple("Split", ["table", "hand", "child"])
+
+# The player doubled down on a hand.
+Double = namedtuple("Double", ["table", "hand"])
+
+# The round is over, and all of the hands have been settled. net is what the player at the parm seat won (+ve) or lost
+# (-ve) in it. There is one for each seat of the table, in the order that they are dealt to.
+Settle = namedtuple("Settle", ["table", "net", "seat"])
+
+# The shoe was refilled with a fresh set of shuffled cards, at the end of a round.
+Shoe_Replenished = namedtuple("Shoe_Replenished", ["table"])
+
+
+# Listener that prints each round, as a Table did when blackjack.verbose was True.
+class Verbose_Printer:
+
+    def notify(self, event):
+        if isinstance(event, Round_Start):
+            if event.table.shoe.counters is None:
+                return                                      # Cards aren't counted in an infinite shoe.
+
+            # Print the status of the card counting. Only print a count that the table keeps anyway, as making a new
+            # counter part way through a shoe would give it the wrong count.
+            counter = event.table.shoe.counters.get(counting.SYSTEMS.get(event.strategy_name, counting.HI_LO).name)
+            if counter is not None:
+                counter.print(event.table.shoe.shoe_size(), event.table.betting_unit)
+
+        elif isinstance(event, Settle):
+            for ph in event.seat.player_hands:
+                ph.print()                                  # Print all of the player's hands.
+            if event.seat is not event.table.seats[-1]:
+                return                                      # The rest is printed after the last seat.
+            event.table.dealer.print()                      # Print the dealer's hand.
+            event.table.shoe.print()                        # Print status of the shoe.
+            event.table.print_table_status()                # Print the status of the table.
+            print()
@@ -0,0 +1,279 @@
+# Exact calculation of the dealer's outcomes and the player's expected value (EV), by recursion over the composition
+# of the shoe. The results are expected values rather than Monte Carlo estimates, so they can be compared directly with
+# the player edges in study_results.csv.
+#
+# A shoe composition is a tuple of 10 counts, one for each card value 2 to 11 (ace), so index = card value - 2.
+# The dealer's probabilities for a hand are calculated once, from the shoe after the dealer's up card and the
+# player's first 2 cards have been removed. Cards that the player draws after that are removed from the shoe for the
+# player's own draws, but don't change the dealer's probabilities.
+
+from functools import lru_cache
+import strategy
+
+CACHE_SIZE = 500000                 # Maximum number of sub-compositions remembered by each of the caches.
+
+# Dealer's final outcomes, in the order they appear in the probability lists.
+OUTCOMES = ["17", "18", "19", "20", "21", "Bust", "Blackjack"]
+BUST = 5
+BLACKJACK = 6
+
+# Phases that a player's hand goes through while a strategy chart is played, in the same order as Table.play_chart.
+PAIRS = 0
+SOFT = 1
+DOUBLE_DOWN = 2
+HIT_UNTIL_STAND = 3
+
+
+# Return the composition of a full shoe of the parm number of decks.
+def shoe_composition(decks):
+    return (4 * decks,) * 8 + (16 * decks, 4 * decks)
+
+
+# Return a copy of the parm shoe composition, with one card of the parm card value removed.
+def remove(shoe, card_value):
+    i = card_value - 2
+    return shoe[:i] + (shoe[i] - 1,) + shoe[i + 1:]
+
+
+# Points value of a card value, counting aces as 1.
+def points(card_value):
+    return 1 if card_value == 11 else card_value
+
+
+# Return the probabilities of each of the dealer's OUTCOMES, for a dealer hand of the parm hard value (aces counted as
+# 1) that has drawn the parm number of cards, and which will draw the rest of its cards from the parm shoe.
+# The dealer Hits on anything less than 17, like Table.dealer_stategy.
+@lru_cache(maxsize=CACHE_SIZE)
+def dealer_outcomes(shoe, hard, has_ace, cards):
+    probabilities = [0.0] * len(OUTCOMES)
+
+    if hard > 21:
+        probabilities[BUST] = 1.0
+        return tuple(probabilities)
+
+    value = hard + 10 if has_ace and hard <= 11 else hard
+    if value >= 17:
+        if value == 21 and cards == 2:
+            probabilities[BLACKJACK] = 1.0
+        else:
+            probabilities[value - 17] = 1.0
+        return tuple(probabilities)
+
+    total = sum(shoe)
+    for (i, count) in enumerate(shoe):
+        if count > 0:
+            card_value = i + 2
+            sub = dealer_outcomes(remove(shoe, card_value), hard + points(card_value), has_ace or card_value == 11,
+                                  cards + 1)
+            for (j, p) in enumerate(sub):
+                probabilities[j] += p * count / total
+
+    return tuple(probabilities)
+
+
+# Return the probabilities of each of the dealer's OUTCOMES, for the parm dealer's up card value. The dealer's hole
+# card, and all of the cards the dealer draws, come from the parm shoe.
+def dealer_probabilities(shoe, dealer_card_value):
+    return dealer_outcomes(shoe, points(dealer_card_value), dealer_card_value == 11, 1)
+
+
+# Return a list of the expected value of standing, per unit staked, for each player's hand value 0 to 21, against
+# the parm dealer probabilities. A player's hand that isn't a blackjack loses to a dealer's blackjack.
+def stand_values(dealer):
+    values = []
+    for player_value in range(22):
+        ev = dealer[BUST] - dealer[BLACKJACK]
+        for (i, p) in enumerate(dealer[0:5]):
+            if player_value > 17 + i:
+                ev += p
+            elif player_value < 17 + i:
+                ev -= p
+        values.append(ev)
+    return values
+
+
+class Hand_Evaluator:
+
+    # Create an evaluator for player's hands against the parm dealer's up card, whose probabilities are calculated
+    # from the parm shoe.
+    def __init__(self, shoe, dealer_card_value):
+        self.dealer_card_value = dealer_card_value
+        self.dealer = dealer_probabilities(shoe, dealer_card_value)
+        self.stand = stand_values(self.dealer)
+
+        # Caches of sub-compositions, bounded like the dealer's cache.
+        self.best_ev = lru_cache(maxsize=CACHE_SIZE)(self.best_ev)
+        self.chart_ev = lru_cache(maxsize=CACHE_SIZE)(self.chart_ev)
+
+    # Expected value of standing on a hand of the parm hard value.
+    def stand_ev(self, hard, has_ace):
+        if hard > 21:
+            return -1.0
+        return self.stand[hard + 10 if has_ace and hard <= 11 else hard]
+
+    # Expected value of playing a hand on from here, choosing the better of Stand and Hit at every card.
+    def best_ev(self, shoe, hard, has_ace):
+        if hard > 21:
+            return -1.0
+        return max(self.stand_ev(hard, has_ace), self.hit_ev(shoe, hard, has_ace))
+
+    # Expected value of Hitting once, then playing on with best_ev.
+    def hit_ev(self, shoe, hard, has_ace):
+        total = sum(shoe)
+        ev = 0.0
+        for (i, count) in enumerate(shoe):
+            if count > 0:
+                card_value = i + 2
+                ev += count / total * self.best_ev(remove(shoe, card_value), hard + points(card_value),
+                                                   has_ace or card_value == 11)
+        return ev
+
+    # Expected value of Doubling Down, per unit of the original stake. The player gets exactly one more card.
+    def double_ev(self, shoe, hard, has_ace):
+        total = sum(shoe)
+        ev = 0.0
+        for (i, count) in enumerate(shoe):
+            if count > 0:
+                card_value = i + 2
+                ev += count / total * 2 * self.stand_ev(hard + points(card_value), has_ace or card_value == 11)
+        return ev
+
+    # Expected value of Splitting a pair, per unit of the original stake. At this table the stake is shared between
+    # the 2 hands, so it is the expected value of one hand that starts with one card of the pair. Each hand may then
+    # Stand, Hit or Double Down. Re-splits are not included.
+    def split_ev(self, shoe, card_value):
+        total = sum(shoe)
+        ev = 0.0
+        for (i, count) in enumerate(shoe):
+            if count > 0:
+                second = i + 2
+                rest = remove(shoe, second)
+                hard = points(card_value) + points(second)
+                has_ace = card_value == 11 or second == 11
+                ev += count / total * max(self.best_ev(rest, hard, has_ace), self.double_ev(rest, hard, has_ace))
+        return ev
+
+    # Return a dictionary of the expected value of each action for a player's hand of 2 cards, keyed by action name.
+    # The parm shoe should already have the player's cards and the dealer's up card removed.
+    def action_evs(self, shoe, card_1_value, card_2_value):
+        hard = points(card_1_value) + points(card_2_value)
+        has_ace = card_1_value == 11 or card_2_value == 11
+
+        evs = {"Stand": self.stand_ev(hard, has_ace),
+               "Hit": self.hit_ev(shoe, hard, has_ace),
+               "Double Down": self.double_ev(shoe, hard, has_ace)}
+        if card_1_value == card_2_value:
+            evs["Split"] = self.split_ev(shoe, card_1_value)
+        return evs
+
+    # Expected (net result, extra money staked) of playing a hand by the parm strategy chart, per unit of the hand's
+    # stake. Follows the same steps as Table.play_chart. pair_value is the card value of a pair of 2 cards, else 0.
+    def chart_ev(self, chart, shoe, hard, has_ace, cards, pair_value, ancestors, phase):
+        column = self.dealer_card_value
+        soft = has_ace and hard <= 11
+        value = hard + 10 if soft else hard
+
+        if phase == PAIRS:
+            if chart.pairs is not None and ancestors <= 1 and pair_value > 0:
+                decision = chart.pairs[strategy.cell(pair_value - 2, column)]
+
+                if decision == strategy.SPLIT:
+                    # Both hands start with one card of the pair and half of the stake, so are the same on average.
+                    (net, extra) = self.deal_ev(chart, shoe, points(pair_value), pair_value == 11, 1, pair_value,
+                                                ancestors + 1, PAIRS)
+                    return net, extra
+                elif decision == strategy.DOUBLE:
+                    return self.double_ev(shoe, hard, has_ace), 1.0
+                elif decision == strategy.HIT:
+                    return self.deal_ev(chart, shoe, hard, has_ace, cards, 0, ancestors, SOFT)
+                elif decision == strategy.STAND:
+                    return self.stand_ev(hard, has_ace), 0.0
+            phase = SOFT
+
+        if phase == SOFT:
+            if chart.soft is not None and soft and cards == 2:
+                decision = chart.soft[strategy.cell(value - 12, column)]
+
+                if decision == strategy.STAND:
+                    return self.stand_ev(hard, has_ace), 0.0
+                elif decision == strategy.DOUBLE:
+                    return self.double_ev(shoe, hard, has_ace), 1.0
+                elif decision == strategy.HIT:
+                    return self.deal_ev(chart, shoe, hard, has_ace, cards, 0, ancestors, DOUBLE_DOWN)
+            phase = DOUBLE_DOWN
+
+        if hard > 21:
+            return -1.0, 0.0
+
+        decision = chart.hard[strategy.cell(value, column)]
+
+        if phase == DOUBLE_DOWN and decision == strategy.DOUBLE:
+            return self.double_ev(shoe, hard, has_ace), 1.0
+
+        if decision == strategy.STAND:
+            return self.stand_ev(hard, has_ace), 0.0
+        return self.deal_ev(chart, shoe, hard, has_ace, cards, 0, ancestors, HIT_UNTIL_STAND)
+
+    # Expected (net result, extra money staked) of dealing one card to a hand, then carrying on with chart_ev.
+    def deal_ev(self, chart, shoe, hard, has_ace, cards, pair_value, ancestors, phase):
+        total = sum(shoe)
+        net = 0.0
+        extra = 0.0
+        for (i, count) in enumerate(shoe):
+            if count > 0:
+                card_value = i + 2
+                (sub_net, sub_extra) = self.chart_ev(chart, remove(shoe, card_value), hard + points(card_value),
+                                                     has_ace or card_value == 11, cards + 1,
+                                                     card_value if card_value == pair_value else 0, ancestors, phase)
+                net += count / total * sub_net
+                extra += count / total * sub_extra
+        return net, extra
+
+
+# Return the player edge, as a percentage of money staked, of playing the parm strategy chart at a table with a shoe
+# of the parm number of decks. This is the expected value of the average_player_edge in study_results.csv.
+def chart_edge(chart, decks):
+    full_shoe = shoe_composition(decks)
+    total = sum(full_shoe)
+    net = 0.0
+    staked = 0.0
+
+    for (i, up_count) in enumerate(full_shoe):
+        dealer_card_value = i + 2
+        after_up = remove(full_shoe, dealer_card_value)
+
+        for (j, count_1) in enumerate(after_up):
+            card_1 = j + 2
+            after_1 = remove(after_up, card_1)
+
+            for (k, count_2) in enumerate(after_1):
+                card_2 = k + 2
+                if k < j or count_1 == 0 or count_2 == 0:
+                    continue                            # Each pair of player's cards is counted once, below.
+
+                shoe = remove(after_1, card_2)
+                p = up_count / total * count_1 / (total - 1) * count_2 / (total - 2)
+                if j != k:
+                    p *= 2                              # The player's cards could have come in either order.
+
+                evaluator = Hand_Evaluator(shoe, dealer_card_value)
+                hard = points(card_1) + points(card_2)
+                has_ace = card_1 == 11 or card_2 == 11
+
+                if has_ace and hard == 11:              # Player has a Blackjack.
+                    hand_net = (1 - evaluator.dealer[BLACKJACK]) * 3 / 2
+                    hand_extra = 0.0
+                else:
+                    (hand_net, hand_extra) = evaluator.chart_ev(chart, shoe, hard, has_ace, 2,
+                                                                card_1 if card_1 == card_2 else 0, 0, PAIRS)
+                net += p * hand_net
+                staked += p * (1 + hand_extra)
+
+    return 100 * net / staked
+
+
+# Print the exact player edge of each strategy that doesn't count cards, for comparison with study_results.csv.
+if __name__ == "__main__":
+    for strategy_name in ["Dealer", "Basic Strategy Section 1", "Basic Strategy Section 2", "Basic Strategy Section 3",
+                          "Basic Strategy Section 4"]:
+        print("%s: %.3f%%" % (strategy_name, chart_edge(strategy.CHARTS[strategy_name], 4)))
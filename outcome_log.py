@@ -0,0 +1,169 @@
+# Columnar log of the outcome of every round played at a table. A log is a directory, holding one binary file of
+# fixed-width values per column, plus a list of strategy names. The recorder only needs the standard library, so it
+# is cheap to use in worker processes. The reader memory maps each column into a NumPy array, so a very large log can
+# be sliced and grouped without loading it into Python objects.
+
+from array import array
+import blackjack
+import counting
+import events
+import os
+
+# (Column name, array typecode, NumPy dtype) of each column in the log.
+COLUMNS = [("strategy", "B", "u1"),             # Index into the log's list of strategy names.
+           ("true_count", "h", "i2"),           # True count when the bet was placed.
+           ("stake", "f", "f4"),                # Player's initial bet.
+           ("staked", "f", "f4"),               # Total money staked in the round, including Double Downs.
+           ("dealer_up_card", "B", "u1"),       # Card value of the dealer's up card, 2 to 11 (ace).
+           ("player_card_1", "B", "u1"),        # Player's starting cards, as cards (rank * 4 + suit).
+           ("player_card_2", "B", "u1"),
+           ("splits", "B", "u1"),               # Number of times the player split in the round.
+           ("net", "f", "f4")]                  # Net result of the round. +ve means the player won.
+
+STRATEGIES_FILE = "strategies.txt"
+
+
+class Outcome_Recorder:
+
+    # Create a recorder that writes the log in the parm directory. Any log that is already there is replaced, so that
+    # playing a session again doesn't add its rounds to the log of the last time it was played. If append is True,
+    # then the rounds are added to the end of the log instead. Rows are buffered, and written to the column files
+    # every flush_rows rows.
+    def __init__(self, path, flush_rows=65536, append=False):
+        self.path = path
+        self.flush_rows = flush_rows
+        os.makedirs(path, exist_ok=True)
+
+        strategies_file = os.path.join(path, STRATEGIES_FILE)
+        if not append:
+            for name in [name + ".bin" for (name, _, _) in COLUMNS] + [STRATEGIES_FILE]:
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+
+        self.strategy_names = []
+        if os.path.exists(strategies_file):
+            with open(strategies_file, encoding="utf-8") as names:
+                self.strategy_names = names.read().splitlines()
+        self.strategy_index = {name: i for (i, name) in enumerate(self.strategy_names)}
+
+        self.buffers = [array(typecode) for (_, typecode, _) in COLUMNS]
+        self.rows = 0                                   # Number of rows in the buffers.
+
+        # State of play of each seat when the bet of the current round was placed, remembered by notify. Keyed by
+        # seat, as every seat of a table is logged. (strategy_name, true_count, stake, staked_before).
+        self.bets = {}
+        self.player_cards = {}                          # Each seat's starting cards in the current round.
+
+    # Add one round to the log.
+    def record(self, strategy_name, true_count, stake, staked, dealer_up_card, player_card_1, player_card_2, splits,
+               net):
+        index = self.strategy_index.get(strategy_name)
+        if index is None:
+            index = len(self.strategy_names)
+            self.strategy_names.append(strategy_name)
+            self.strategy_index[strategy_name] = index
+
+        row = (index, true_count, stake, staked, dealer_up_card, player_card_1, player_card_2, splits, net)
+        for (buffer, value) in zip(self.buffers, row):
+            buffer.append(value)
+
+        self.rows += 1
+        if self.rows >= self.flush_rows:
+            self.flush()
+
+    # Listener for the events of a table (see events.py), that adds each round to the log when it is settled.
+    # Use with this_table.add_listener(recorder.notify).
+    def notify(self, event):
+        if isinstance(event, events.Card_Dealt):
+            for seat in event.table.seats:
+                if event.hand is seat.player_hands[0]:
+                    if len(self.player_cards[seat]) < 2:
+                        self.player_cards[seat].append(event.card)
+                    break
+
+        elif isinstance(event, events.Round_Start):
+            # Only a count that the shoe already keeps is logged, as a counter started now would have missed the cards
+            # dealt earlier in the shoe. So the true count is 0 if no seat is counting by the system, or if the shoe is
+            # infinite.
+            true_count = 0
+            shoe = event.table.shoe
+            if shoe.counters is not None:
+                counter = shoe.counters.get(counting.SYSTEMS.get(event.strategy_name, counting.HI_LO).name)
+                if counter is not None:
+                    true_count = counter.true_count(shoe.shoe_size())
+            self.bets[event.seat] = (event.strategy_name, true_count, event.stake, event.seat.total_staked - event.stake)
+            self.player_cards[event.seat] = []
+
+        elif isinstance(event, events.Settle):
+            seat = event.seat
+            (strategy_name, true_count, stake, staked_before) = self.bets[seat]
+            cards = self.player_cards[seat]
+            self.record(strategy_name, true_count, stake, seat.total_staked - staked_before,
+                        blackjack.CARD_VALUES[event.table.dealer.cards[0]], cards[0], cards[1],
+                        len(seat.player_hands) - 1, event.net)
+
+    # Append the buffered rows to the column files.
+    def flush(self):
+        for ((name, _, _), buffer) in zip(COLUMNS, self.buffers):
+            with open(os.path.join(self.path, name + ".bin"), "ab") as column_file:
+                buffer.tofile(column_file)
+            del buffer[:]
+        self.rows = 0
+
+        with open(os.path.join(self.path, STRATEGIES_FILE), "w", encoding="utf-8") as names:
+            names.write("\n".join(self.strategy_names))
+
+    # Write any buffered rows. The recorder should be closed when the table has finished playing.
+    def close(self):
+        self.flush()
+
+
+class Outcome_Log:
+
+    # Open the log in the parm directory. Columns are memory mapped when they are first used.
+    def __init__(self, path):
+        self.path = path
+        self.columns = {}
+
+        with open(os.path.join(path, STRATEGIES_FILE), encoding="utf-8") as names:
+            self.strategy_names = names.read().splitlines()
+
+    # Return the memory mapped NumPy array of the parm column.
+    def __getitem__(self, name):
+        import numpy as np
+
+        column = self.columns.get(name)
+        if column is None:
+            dtype = [d for (n, _, d) in COLUMNS if n == name][0]
+            filename = os.path.join(self.path, name + ".bin")
+            if os.path.getsize(filename) == 0:
+                column = np.zeros(0, dtype=dtype)
+            else:
+                column = np.memmap(filename, dtype=dtype, mode="r")
+            self.columns[name] = column
+        return column
+
+    # Return the number of rounds in the log.
+    def __len__(self):
+        return len(self["net"])
+
+    # Return the player edge, as a percentage, for each value of the parm column. Returns a dictionary keyed by value.
+    # An optional boolean mask selects which rounds are included, for example log["strategy"] == 0.
+    def edge_by(self, name, mask=None):
+        import numpy as np
+
+        keys = self[name]
+        net = self["net"]
+        staked = self["staked"]
+        if mask is not None:
+            (keys, net, staked) = (keys[mask], net[mask], staked[mask])
+
+        (values, groups) = np.unique(keys, return_inverse=True)
+        net_totals = np.bincount(groups, weights=net, minlength=len(values))
+        staked_totals = np.bincount(groups, weights=staked, minlength=len(values))
+
+        edges = {}
+        for (value, net_total, staked_total) in zip(values.tolist(), net_totals, staked_totals):
+            if staked_total > 0:
+                edges[value] = float(100 * net_total / staked_total)
+        return edges
@@ -0,0 +1,188 @@
+# Run sessions of Blackjack across a pool of worker processes.
+
+import blackjack
+import counting
+import hashlib
+import os
+import outcome_log
+import shared_results
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+# Make a new random seed for a study, for when the user hasn't chosen one.
+def new_seed():
+    return int.from_bytes(os.urandom(8), "big")
+
+
+# Derive the seed for one session from the study's seed, plus some keys that identify the session (for example,
+# strategy name and session number). Seeds are derived by hashing, so they don't depend on the order in which sessions
+# are scheduled, or on the number of worker processes.
+def derive_seed(seed, *keys):
+    text = ":".join(str(k) for k in (seed,) + keys)
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[0:8], "big")
+
+
+# Play one session (visit to a table). The job is a dictionary describing the session. The result is a small tuple,
+# (amount_won_or_lost, total_staked, hands_played_by_player, round_stats, profile), which is cheap to send back to the
+# parent process. profile is a profiling.Profile if the job asked for one, else None.
+#
+# If the job has "seats", a list of the strategy names of more seats at the table, then the result is a list of
+# results, one per seat, starting with the table's own seat. The table's profile is in the result of its own seat.
+#
+# If the job has a "cache", a result_cache.Result_Cache, then a cached result of the same job is returned instead of
+# playing it again, and the result of a session that is played is added to the cache.
+def play_session(job):
+    cache = job.get("cache")
+    if cache is None:
+        return play_uncached_session(job)
+
+    result = cache.get(job)
+    if result is None:
+        result = play_uncached_session(job)
+        cache.put(job, result)
+    return result
+
+
+# Play one session, without looking in the cache.
+def play_uncached_session(job):
+
+    # The batch engine needs NumPy, so it is only imported when it is used.
+    if job.get("engine") == "batch":
+        if job.get("seats") or job.get("infinite_shoe"):
+            raise ValueError("The batch engine only plays tables with one seat and a real shoe.")
+        if job.get("shared") is not None:
+            raise ValueError("The batch engine doesn't collect the results of each round.")
+        import batch
+        return batch.play_session(job)
+
+    this_table = blackjack.Table(job["decks"], job["penetration"], job["seed"], job.get("charts"),
+                                 job.get("betting_unit", 4), job.get("blackjack_value", 3 / 2),
+                                 infinite_shoe=job.get("infinite_shoe", False))
+
+    # Optionally, bet by a different bet ramp, (pivot, units_per_count, min_units, max_units).
+    if job.get("bet_ramp") is not None:
+        this_table.bet_ramp = counting.Bet_Ramp(*job["bet_ramp"])
+
+    for strategy_name in job.get("seats", []):
+        this_table.add_seat(strategy_name, this_table.bet_ramp)
+
+    # Optionally, log the outcome of every round to the directory named by the job.
+    recorder = None
+    if job.get("record") is not None:
+        recorder = outcome_log.Outcome_Recorder(job["record"])
+        this_table.add_listener(recorder.notify)
+
+    # Optionally, write the result of every round into the job's slice of shared memory, see shared_results.py.
+    shared_recorder = None
+    if job.get("shared") is not None:
+        shared_recorder = shared_results.Shared_Recorder(job["shared"])
+        this_table.add_listener(shared_recorder.notify)
+
+    if job.get("profile"):
+        this_table.start_profiling()
+
+    this_table.play_rounds(job["rounds"], job["strategy_name"])
+
+    if recorder is not None:
+        recorder.close()
+    if shared_recorder is not None:
+        shared_recorder.close()
+
+    results = [(seat.amount_won_or_lost, seat.total_staked, seat.hands_played_by_player, seat.round_stats, None)
+               for seat in this_table.seats]
+    results[0] = results[0][0:4] + (this_table.profile,)
+
+    if job.get("seats") is None:
+        return results[0]
+    return results
+
+
+# Play the sessions of several experiments. job_lists has one list of jobs per experiment. Each result is passed
+# to record(experiment number, result), in session order within each experiment. After each result, finished(experiment
+# number) is called; once it returns True, no more of that experiment's sessions are started, and results of its
+# sessions that were already being played are thrown away. So the results don't depend on the number of workers.
+def run_experiments(job_lists, workers, record, finished):
+    for (e, result) in experiment_results(job_lists, workers, finished):
+        record(e, result)
+
+
+# Play the sessions of several experiments, like run_experiments, but yield (experiment number, result) of each session
+# instead of recording it. finished(experiment number) is called once the caller has asked for the next result, so it
+# can depend on the results that have been yielded. If the caller stops early, sessions that haven't started are
+# cancelled.
+def experiment_results(job_lists, workers, finished):
+
+    # If workers is 1, then the sessions are played in this process, one experiment after another.
+    if workers <= 1:
+        for (e, jobs) in enumerate(job_lists):
+            for job in jobs:
+                yield e, play_session(job)
+                if finished(e):
+                    break
+        return
+
+    submitted = [0] * len(job_lists)                # Number of sessions of each experiment started so far.
+    recorded = [0] * len(job_lists)                 # Number of sessions of each experiment yielded so far.
+    stopped = [len(jobs) == 0 for jobs in job_lists]
+    waiting = [{} for jobs in job_lists]            # Results that arrived before earlier sessions had finished.
+    pending = {}                                    # Sessions being played, {future: (experiment, session)}.
+
+    with ProcessPoolExecutor(workers) as pool:
+
+        # Keep the workers busy. Start the next session of the experiment that has had the fewest started so far.
+        def start_sessions():
+            while len(pending) < 2 * workers:
+                candidates = [e for e in range(len(job_lists)) if not stopped[e] and submitted[e] < len(job_lists[e])]
+                if len(candidates) == 0:
+                    return
+                e = min(candidates, key=lambda c: submitted[c])
+                pending[pool.submit(play_session, job_lists[e][submitted[e]])] = (e, submitted[e])
+                submitted[e] += 1
+
+        try:
+            start_sessions()
+            while len(pending) > 0:
+                (done, _) = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    (e, session) = pending.pop(future)
+                    if stopped[e]:
+                        continue
+                    waiting[e][session] = future.result()
+
+                    while recorded[e] in waiting[e] and not stopped[e]:
+                        yield e, waiting[e].pop(recorded[e])
+                        recorded[e] += 1
+                        stopped[e] = finished(e) or recorded[e] == len(job_lists[e])
+
+                start_sessions()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+# Play the parm list of jobs across a pool of worker processes. Jobs are started in the order of the list, so the
+# caller can put the most expensive ones first. Yields (job number, result) as each session finishes, so results
+# may arrive in any order.
+def run_jobs(jobs, workers):
+
+    # If workers is 1, then the sessions are played in this process, in order.
+    if workers <= 1:
+        for (j, job) in enumerate(jobs):
+            yield j, play_session(job)
+        return
+
+    started = 0                                     # Number of jobs started so far.
+    pending = {}                                    # Sessions being played, {future: job number}.
+
+    with ProcessPoolExecutor(workers) as pool:
+        while started < len(jobs) or len(pending) > 0:
+
+            # Keep the workers busy, without queueing up every job at once.
+            while started < len(jobs) and len(pending) < 2 * workers:
+                pending[pool.submit(play_session, jobs[started])] = started
+                started += 1
+
+            (done, _) = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
@@ -0,0 +1,51 @@
+# Opt-in profiling of the rounds played at a table. A profile counts the calls of each phase of a round, and adds up
+# the wall time spent in them, along with how often the player splits and doubles down, and how often the shoe is
+# reshuffled. Tables and shoes only profile when they have a profile, so it costs almost nothing when it is off.
+
+import time
+
+# Phases of a round, in the order that they are played.
+PHASES = ["deal", "strategy", "dealer", "settle", "replenish"]
+
+# Events that are counted.
+EVENTS = ["rounds", "splits", "doubles", "reshuffles"]
+
+clock = time.perf_counter
+
+
+class Profile:
+
+    def __init__(self):
+        self.calls = {phase: 0 for phase in PHASES}         # Number of times each phase was played.
+        self.seconds = {phase: 0.0 for phase in PHASES}     # Total wall time spent in each phase.
+        self.events = {event: 0 for event in EVENTS}        # Number of times each event happened.
+
+    # Add one call of the parm phase, which started at the parm clock time and has just finished. Returns the clock
+    # time now, which is when the next phase starts.
+    def add(self, phase, start):
+        now = clock()
+        self.calls[phase] += 1
+        self.seconds[phase] += now - start
+        return now
+
+    # Add the counts and times of the parm profile to this one, for example the profiles of several sessions.
+    def merge(self, other):
+        for phase in PHASES:
+            self.calls[phase] += other.calls[phase]
+            self.seconds[phase] += other.seconds[phase]
+        for event in EVENTS:
+            self.events[event] += other.events[event]
+
+    def print(self):
+        total = sum(self.seconds.values())
+        rounds = self.events["rounds"]
+
+        for phase in PHASES:
+            print("Phase %-10s calls=%d, time=%.3fs (%.1f%%)"
+                  % (phase + ":", self.calls[phase], self.seconds[phase],
+                     100 * self.seconds[phase] / total if total > 0 else 0))
+
+        if rounds > 0:
+            print("Per 1,000 rounds: splits=%.1f, doubles=%.1f, reshuffles=%.1f"
+                  % (1000 * self.events["splits"] / rounds, 1000 * self.events["doubles"] / rounds,
+                     1000 * self.events["reshuffles"] / rounds))
@@ -0,0 +1,66 @@
+# Progress of a long experiment, while its sessions are being played. Experiment.session_results() yields a
+# Session_Result as each session finishes, and a Progress_Reporter prints the rounds per second, the estimated time
+# left, and the player edge so far with its 95% confidence interval.
+#
+# reporter = Progress_Reporter(this_experiment)
+# for session_result in this_experiment.session_results():
+#     reporter.report(session_result)
+
+from collections import namedtuple
+import sys
+import time
+
+# Result of one finished session of an experiment. experiment is the Experiment (or Shoe_Experiment) that it was added
+# to, so its totals so far can be read, for example experiment.win_loss and experiment.confidence_interval(). edge is
+# the session's player edge as a percentage, and rounds is the number of rounds it played.
+Session_Result = namedtuple("Session_Result", ["experiment", "session", "edge", "rounds"])
+
+
+# Return the parm number of seconds, as hours:minutes:seconds.
+def format_seconds(seconds):
+    if seconds == float("inf"):
+        return "?"
+    (minutes, seconds) = divmod(int(seconds + 0.5), 60)
+    (hours, minutes) = divmod(minutes, 60)
+    return "%d:%02d:%02d" % (hours, minutes, seconds)
+
+
+class Progress_Reporter:
+
+    # Report the progress of the parm experiment. A line is printed at most once every interval seconds, and always for
+    # the last session. The time left is estimated for all of the experiment's sessions, so an experiment that reaches
+    # its precision finishes sooner.
+    def __init__(self, experiment, interval=1.0, file=None, label=None):
+        if file is None:
+            file = sys.stdout
+        if label is None:
+            label = experiment.strategy_name
+
+        self.experiment = experiment
+        self.interval = interval
+        self.file = file
+        self.label = label
+        self.total_rounds = experiment.sessions * experiment.rounds_per_session
+        self.start = time.perf_counter()
+        self.last_printed = None                    # Time that the last line was printed.
+
+    # Return the progress line of the experiment so far, after the parm number of seconds.
+    def line(self, elapsed):
+        ex = self.experiment
+        rounds = ex.round_stats.count
+        rate = rounds / elapsed if elapsed > 0 else 0
+        left = (self.total_rounds - rounds) / rate if rate > 0 else float("inf")
+
+        # Player edge of every round so far, the same edge that the confidence interval is for.
+        edge = 100 * ex.round_stats.mean * rounds / ex.grand_total_staked
+        return "%s: session %d of %d, %d rounds, %.0f rounds/sec, ETA %s, player edge %.2f%% +/-%.2f%%" \
+               % (self.label, ex.win_loss.count, ex.sessions, rounds, rate, format_seconds(left), edge,
+                  ex.confidence_interval())
+
+    # Report the parm Session_Result.
+    def report(self, session_result):
+        now = time.perf_counter()
+        last = session_result.session == self.experiment.sessions - 1 or self.experiment.converged()
+        if last or self.last_printed is None or now - self.last_printed >= self.interval:
+            print(self.line(now - self.start), file=self.file, flush=True)
+            self.last_printed = now
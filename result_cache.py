@@ -0,0 +1,144 @@
+# On-disk cache of session results. Each result is stored in a file named by a hash of everything that decides it:
+# the session's job (strategy, decks, penetration, rounds, seed, rule settings and engine), the contents of the
+# strategy's chart, and a fingerprint of the source code of the engine. So when a study is run again with the same
+# seed, the sessions that haven't changed come back from the cache instead of being played again, and changing the
+# engine's code means nothing old is used.
+#
+# The source of strategy.py is part of the fingerprint, as it decides how the charts are compiled and used, and so is
+# batch.py, for either engine. So changing a chart in strategy.py means that every session is played again.
+
+import checkpoint
+import hashlib
+import json
+import os
+import strategy
+from functools import lru_cache
+
+# Modules whose source code decides the result of a session. Their files are read, rather than the modules being
+# imported, so that working out the fingerprint doesn't load the batch engine, and NumPy.
+ENGINE_MODULES = ["batch", "blackjack", "counting", "parallel", "running_stats", "strategy"]
+
+# Job settings that don't change the result of a session, so aren't part of the key.
+IGNORED = ["cache", "record", "profile", "charts", "shared"]
+
+
+# Return a hash of the source code of the engine's modules. It is worked out once per process.
+@lru_cache(maxsize=None)
+def engine_fingerprint():
+    sha = hashlib.sha256()
+    for module in ENGINE_MODULES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module + ".py"), "rb") as source:
+            sha.update(source.read())
+    return sha.hexdigest()
+
+
+# Return a dictionary of everything that decides the result of the parm job.
+def job_description(job):
+    description = {name: value for (name, value) in job.items() if name not in IGNORED}
+    description.setdefault("engine", "table")
+
+    charts = job.get("charts")
+    if charts is None:
+        charts = strategy.CHARTS
+    description["chart"] = [[chart.hard, chart.soft, chart.pairs]
+                            for chart in [charts[name] for name in [job["strategy_name"]] + job.get("seats", [])]]
+
+    description["fingerprint"] = engine_fingerprint()
+    return description
+
+
+# Return the key of the parm job, a hash of its description.
+def job_key(job):
+    text = json.dumps(job_description(job), sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Result_Cache:
+
+    # Open the cache in the parm directory. When evict is called, the least recently used results are removed until
+    # the cache is no bigger than max_bytes.
+    def __init__(self, path, max_bytes=100 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    # Return the filename of the result of the job with the parm key.
+    def filename(self, key):
+        return os.path.join(self.path, key[0:2], key + ".json")
+
+    # Can the result of the parm job be cached?
+    def cacheable(self, job):
+        return job.get("record") is None and not job.get("profile") and job.get("shared") is None
+
+    # Return the cached result of the parm job, or None if it isn't in the cache. Results of jobs that record an
+    # outcome log, are profiled, or collect their rounds in shared memory, are never cached, as they have to be played
+    # to make their log, profile or rounds.
+    def get(self, job):
+        if not self.cacheable(job):
+            return None
+
+        filename = self.filename(job_key(job))
+        try:
+            with open(filename, encoding="utf-8") as entry:
+                saved = json.load(entry)
+        except (OSError, ValueError):
+            return None
+
+        os.utime(filename)                      # Mark the result as recently used.
+        if job.get("seats") is not None:
+            return [checkpoint.decode(result) for result in saved["result"]]
+        return checkpoint.decode(saved["result"])
+
+    # Add the result of the parm job to the cache.
+    def put(self, job, result):
+        if not self.cacheable(job):
+            return
+
+        key = job_key(job)
+        filename = self.filename(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        # Write to a temporary file first, so that another process never reads a half-written result.
+        temporary = "%s.%d.tmp" % (filename, os.getpid())
+        with open(temporary, "w", encoding="utf-8") as entry:
+            if job.get("seats") is not None:
+                encoded = [checkpoint.encode(seat_result) for seat_result in result]
+            else:
+                encoded = checkpoint.encode(result)
+            json.dump({"job": job_description(job), "result": encoded}, entry)
+        os.replace(temporary, filename)
+
+    # Return a list of (last used time, size in bytes, filename) of each result in the cache.
+    def entries(self):
+        found = []
+        if os.path.exists(self.path):
+            for (directory, _, filenames) in os.walk(self.path):
+                for name in filenames:
+                    if name.endswith(".json"):
+                        filename = os.path.join(directory, name)
+                        status = os.stat(filename)
+                        found.append((status.st_mtime, status.st_size, filename))
+        return found
+
+    # Remove the least recently used results, until the cache is no bigger than max_bytes.
+    def evict(self):
+        entries = sorted(self.entries())
+        size = sum(entry_size for (_, entry_size, _) in entries)
+        for (_, entry_size, filename) in entries:
+            if size <= self.max_bytes:
+                break
+            os.remove(filename)
+            size -= entry_size
+
+    # Remove the cached results whose job matches the parm filter, a dictionary of {setting: list of values}, for
+    # example {"strategy_name": ["Dealer"]}. With no filter, the whole cache is cleared. Returns the number removed.
+    def invalidate(self, only=None):
+        removed = 0
+        for (_, _, filename) in self.entries():
+            if only is not None:
+                with open(filename, encoding="utf-8") as entry:
+                    job = json.load(entry)["job"]
+                if not all(job.get(name) in values for (name, values) in only.items()):
+                    continue
+            os.remove(filename)
+            removed += 1
+        return removed
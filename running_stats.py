@@ -0,0 +1,91 @@
+# Streaming statistics. Values are added one at a time, in O(1) memory, using Welford's algorithm. Two sets of
+# statistics can be merged, for example the statistics of sessions played in different worker processes.
+# See - https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance
+
+import math
+
+
+class Running_Stats:
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0                           # Sum of squares of differences from the mean.
+        self.min = None
+        self.max = None
+
+    # Add one value to the statistics.
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    # Add a summary of several values: their count, mean, sum of squares of differences from their mean, min and max.
+    def add_summary(self, count, mean, m2, minimum, maximum):
+        if count == 0:
+            return
+
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+        if self.min is None or minimum < self.min:
+            self.min = minimum
+        if self.max is None or maximum > self.max:
+            self.max = maximum
+
+    # Add all of the values of the parm statistics to these statistics.
+    def merge(self, other):
+        self.add_summary(other.count, other.mean, other.m2, other.min, other.max)
+
+    # Return the statistics as a tuple, (count, mean, m2, min, max).
+    def summary(self):
+        return self.count, self.mean, self.m2, self.min, self.max
+
+    # Set the statistics from a tuple made by summary().
+    def restore(self, summary):
+        (self.count, self.mean, self.m2, self.min, self.max) = summary
+
+    # Sample variance, as calculated by statistics.variance.
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    def stdev(self):
+        return math.sqrt(self.variance())
+
+    # Standard error of the mean.
+    def standard_error(self):
+        if self.count < 2:
+            return math.inf
+        return self.stdev() / math.sqrt(self.count)
+
+
+class Paired_Stats:
+
+    # Statistics of the differences between pairs of values, for example the edges of 2 strategies that played the
+    # same shuffled shoes in the same session. Values can arrive in any order; each is held until its partner arrives.
+    def __init__(self):
+        self.waiting = [{}, {}]                 # Values waiting for their partners, {key: value}, for each side.
+        self.difference = Running_Stats()       # Stats of (second value - first value).
+
+    # Add a value to side 0 (first) or side 1 (second) of the pair with the parm key.
+    def add(self, side, key, value):
+        other = self.waiting[1 - side]
+        if key in other:
+            partner = other.pop(key)
+            if side == 0:
+                self.difference.add(partner - value)
+            else:
+                self.difference.add(value - partner)
+        else:
+            self.waiting[side][key] = value
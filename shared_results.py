@@ -0,0 +1,151 @@
+# Per-round results of an experiment, collected in shared memory. The parent process makes one block of shared memory,
+# big enough for every round of every session, and each session's job is given its own slice of it. The worker playing
+# a session writes the net result, money staked and true count of each of its rounds straight into its slice, so the
+# rounds are never pickled back through a pipe, and the parent never holds a second copy of them. The parent then
+# analyses the rounds with NumPy arrays that are views of the shared memory.
+#
+# Only the table's own seat is collected. The recorder only needs the standard library, so NumPy is only imported by
+# the parent, when the results are analysed.
+#
+# with Experiment("Hi-Lo Card Count", 10, 100000, workers=os.cpu_count(), shared=True) as this_experiment:
+#     print(this_experiment.shared_results.edge_by_true_count())
+
+from collections import namedtuple
+import counting
+import events
+import math
+from multiprocessing import shared_memory
+import weakref
+
+COLUMNS = ["net", "staked", "true_count"]      # Columns of float64s, one after another in the block.
+
+# Statistics of the net result of every round collected.
+Shared_Summary = namedtuple("Shared_Summary", ["rounds", "staked", "won_or_lost", "edge", "stdev",
+                                               "confidence_interval"])
+
+
+# Free the parm block of shared memory. Its name is removed even if arrays from columns() still use the memory, so
+# that it is gone from the system once they are deleted.
+def free(memory):
+    try:
+        memory.close()
+    except BufferError:
+        pass
+    memory.unlink()
+
+
+class Shared_Recorder:
+
+    # Create a recorder that writes to the parm slice of shared memory, as made by Shared_Results.job_slice.
+    def __init__(self, job_slice):
+        self.memory = shared_memory.SharedMemory(name=job_slice["name"])
+        self.values = self.memory.buf.cast("d")
+        self.length = job_slice["length"]                   # Rows in each column of the whole block.
+        self.offset = job_slice["offset"]                   # First row of this session's slice.
+        self.rounds = job_slice["rounds"]                   # Rows in this session's slice.
+        self.row = 0                                        # Rows written so far.
+        self.true_count = 0                                 # True count when the bet of the current round was placed.
+        self.staked_before = 0                              # Money staked by the seat before the current round.
+
+    # Listener for the events of a table (see events.py), that writes each round of the table's own seat when it is
+    # settled. Use with this_table.add_listener(recorder.notify).
+    def notify(self, event):
+        if isinstance(event, events.Round_Start):
+            if event.seat is event.table:
+
+                # Only a count that the shoe already keeps is collected, as a counter started now would have missed
+                # the cards dealt earlier in the shoe. So the true count is 0 if the table isn't counting by the system,
+                # or if the shoe is infinite.
+                self.true_count = 0
+                shoe = event.table.shoe
+                if shoe.counters is not None:
+                    counter = shoe.counters.get(counting.SYSTEMS.get(event.strategy_name, counting.HI_LO).name)
+                    if counter is not None:
+                        self.true_count = counter.true_count(shoe.shoe_size())
+                self.staked_before = event.seat.total_staked - event.stake
+
+        elif isinstance(event, events.Settle):
+            if event.seat is event.table:
+                if self.row == self.rounds:
+                    raise ValueError("The session has played more than its %d rounds." % self.rounds)
+                i = self.offset + self.row
+                self.values[i] = event.net
+                self.values[self.length + i] = event.seat.total_staked - self.staked_before
+                self.values[2 * self.length + i] = self.true_count
+                self.row += 1
+
+    # Detach from the shared memory. The recorder should be closed when the table has finished playing.
+    def close(self):
+        self.values.release()
+        self.memory.close()
+
+
+class Shared_Results:
+
+    # Make a block of shared memory, for the parm number of sessions of rounds_per_session rounds each.
+    def __init__(self, sessions, rounds_per_session):
+        self.sessions = sessions
+        self.rounds_per_session = rounds_per_session
+        self.length = sessions * rounds_per_session
+        self.memory = shared_memory.SharedMemory(create=True, size=max(1, 8 * len(COLUMNS) * self.length))
+
+        # Free the shared memory when the results are garbage collected, or at exit, if they weren't closed.
+        self.finalizer = weakref.finalize(self, free, self.memory)
+
+    # Return the slice of the parm session, to be put in its job. It is small, so it is cheap to send to a worker.
+    def job_slice(self, session):
+        return {"name": self.memory.name,
+                "length": self.length,
+                "offset": session * self.rounds_per_session,
+                "rounds": self.rounds_per_session}
+
+    # Return a dictionary of NumPy arrays, {column name: array}, of the rounds of the first parm number of sessions,
+    # by default all of them. The arrays are views of the shared memory, not copies, so they must be deleted before
+    # the results are closed.
+    def columns(self, sessions=None):
+        import numpy as np
+
+        if sessions is None:
+            sessions = self.sessions
+        rounds = sessions * self.rounds_per_session
+        block = np.ndarray((len(COLUMNS), self.length), dtype=np.float64, buffer=self.memory.buf)
+        return {name: block[c, 0:rounds] for (c, name) in enumerate(COLUMNS)}
+
+    # Return the Shared_Summary of the rounds of the first parm number of sessions. The edge and its 95% confidence
+    # interval are percentages.
+    def summary(self, sessions=None):
+        columns = self.columns(sessions)
+        net = columns["net"]
+        rounds = len(net)
+        staked = float(columns["staked"].sum())
+        won_or_lost = float(net.sum())
+        if rounds < 2 or staked == 0:
+            return Shared_Summary(rounds, staked, won_or_lost, 0.0, 0.0, math.inf)
+
+        stdev = float(net.std(ddof=1))
+        average_stake = staked / rounds
+        return Shared_Summary(rounds, staked, won_or_lost, 100 * won_or_lost / staked, stdev,
+                              1.96 * 100 * stdev / math.sqrt(rounds) / average_stake)
+
+    # Return a dictionary of the player edge at each true count, {true count: (rounds, edge as a percentage)}, of the
+    # rounds of the first parm number of sessions.
+    def edge_by_true_count(self, sessions=None):
+        import numpy as np
+
+        columns = self.columns(sessions)
+        (counts, groups) = np.unique(columns["true_count"], return_inverse=True)
+        rounds = np.bincount(groups, minlength=len(counts))
+        net = np.bincount(groups, weights=columns["net"], minlength=len(counts))
+        staked = np.bincount(groups, weights=columns["staked"], minlength=len(counts))
+        return {int(count): (int(rounds[g]), 100 * float(net[g]) / float(staked[g]) if staked[g] > 0 else 0.0)
+                for (g, count) in enumerate(counts)}
+
+    # Free the shared memory. Any arrays from columns() should have been deleted first.
+    def close(self):
+        self.finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
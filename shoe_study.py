@@ -1,17 +1,28 @@
 # Study the effect of different shoe sizes (number of decks of cards in the shoe when replenished) and different
-# penetration setting (percentage of cards in shoe left to trigger replenishment).
+# penetration setting (percentage of cards in shoe left to trigger replenishment), on card counting strategies.
 
-import blackjack
+import checkpoint
 import csv
-from statistics import mean
-from statistics import stdev
+import math
+import os
+import parallel
+import profiling
+import progress
+import running_stats
+import sweep
+
+DECKS = [1, 2, 4, 6, 8]                 # Numbers of decks in the shoe that are studied by default.
+PENETRATIONS = [0.50, 0.75, 0.85]       # Penetrations that are studied by default.
 
 class Shoe_Experiment:
 
-    def __init__(self, sessions, rounds_per_session, decks, penetration):
-        self.strategy_name = "Hi-Lo Card Count"
-        self.win_loss = []                              # List of percentage win(+ve) or loss(-ve) per session.
-        self.sessions = sessions                        # Number of sessions (visits to table) to do in this study.
+    def __init__(self, sessions, rounds_per_session, decks, penetration, seed=None, workers=1, run=True,
+                 engine="table", precision=None, common_random_numbers=False, profile=False,
+                 strategy_name="Hi-Lo Card Count", cache=None, progress=False):
+        self.strategy_name = strategy_name              # Name of the card counting strategy to be tested.
+        self.win_loss = running_stats.Running_Stats()   # Stats of percentage win(+ve) or loss(-ve) per session.
+        self.round_stats = running_stats.Running_Stats()    # Stats of net result of each round.
+        self.sessions = sessions                        # Max number of sessions (visits to table) to do in this study.
         self.rounds_per_session = rounds_per_session    # Number of rounds to be played in each session.
         self.decks = decks                              # Number of decks put in shoe when it is replenished.
         self.penetration = penetration                  # Penetration percentage that causes shoe to be replenished.
@@ -22,67 +33,255 @@ class Shoe_Experiment:
         self.average_player_edge = 0
         self.standard_deviation_edge = 0                # ...
 
-        self.run()                                      # Run the shoe study.
-        self.analyse()                                  # Analyse the shoe study.
+        # Value of each of sweep.PARAMETERS, so that the experiment can be a cell of a Shoe_Study's grid.
+        self.parameters = dict(sweep.DEFAULTS, strategy_name=strategy_name, decks=decks, penetration=penetration)
 
-    # Run the study.
-    def run(self):
-        for experiments in range(self.sessions):
-            this_table = blackjack.Table(self.decks, self.penetration)
+        if seed is None:
+            seed = parallel.new_seed()
+        self.seed = seed                                # Each session's seed is derived from this one.
+        self.engine = engine                            # "table", or "batch" for the NumPy batch engine.
+        self.workers = workers                          # Number of worker processes to play the sessions.
+
+        # If precision is set, then the experiment stops as soon as the 95% confidence interval of the player edge
+        # is narrower than +/- precision percent.
+        self.precision = precision
+
+        # With common random numbers, session seeds don't depend on the penetration, so each cell plays the same
+        # shuffled shoes as the other cells with the same number of decks.
+        self.common_random_numbers = common_random_numbers
+
+        # If profile_sessions is True, then each session is profiled, and the profiles are merged into profile.
+        self.profile_sessions = profile
+        self.profile = None
+
+        # Optional result_cache.Result_Cache. Sessions that have been played before, with the same seed and settings,
+        # come back from the cache instead of being played again.
+        self.cache = cache
+
+        # If progress is True, then run() prints the rounds per second, time left and player edge so far.
+        self.progress = progress
+
+        if run:
+            self.run()                                  # Run the shoe study.
+            self.analyse()                              # Analyse the shoe study.
+
+    # Make a list of jobs, one per session. Each session gets its own seed, so results are reproducible.
+    def jobs(self):
+        return [{"strategy_name": self.strategy_name,
+                 "decks": self.decks,
+                 "penetration": self.penetration,
+                 "rounds": self.rounds_per_session,
+                 "seed": self.session_seed(s),
+                 "engine": self.engine,
+                 "profile": self.profile_sessions,
+                 "cache": self.cache}
+                for s in range(self.sessions)]
 
-            for games in range(self.rounds_per_session):
-                this_table.play_one_round(self.strategy_name)
+    # Return the seed of the parm session.
+    def session_seed(self, session):
+        if self.common_random_numbers:
+            return parallel.derive_seed(self.seed, self.decks, session)
+        return parallel.derive_seed(self.seed, self.decks, self.penetration, session)
 
-            self.win_loss.append(this_table.amount_won_or_lost / this_table.total_staked)
+    # Add the results of one session to the experiment's totals. Returns the player edge of the session, as a
+    # percentage.
+    def record_session(self, result):
+        (amount_won_or_lost, total_staked, hands_played_by_player, round_stats, profile) = result
 
-            self.player_hands += this_table.hands_played_by_player
-            self.grand_total_staked += this_table.total_staked
+        edge = 100 * amount_won_or_lost / total_staked
+        self.win_loss.add(edge)
+        self.round_stats.merge(round_stats)
 
-            del this_table
+        self.player_hands += hands_played_by_player
+        self.grand_total_staked += total_staked
+
+        if profile is not None:
+            if self.profile is None:
+                self.profile = profiling.Profile()
+            self.profile.merge(profile)
+        return edge
+
+    # Return the half-width of the 95% confidence interval of the player edge, as a percentage. It is calculated from
+    # the net result of every round played so far.
+    def confidence_interval(self):
+        if self.grand_total_staked == 0:
+            return math.inf
+        average_stake = self.grand_total_staked / self.round_stats.count
+        return 1.96 * 100 * self.round_stats.standard_error() / average_stake
+
+    # Has the experiment played enough sessions to reach the requested precision?
+    def converged(self):
+        return self.precision is not None and self.win_loss.count >= 2 \
+            and self.confidence_interval() <= self.precision
+
+    # Run the study. If progress is set, then a line of progress is printed as the sessions finish.
+    def run(self):
+        reporter = None
+        if self.progress:
+            reporter = progress.Progress_Reporter(self, label=self.label())
+        for session_result in self.session_results():
+            if reporter is not None:
+                reporter.report(session_result)
+
+    # Play the sessions, and yield a progress.Session_Result as each one is added to the experiment's totals, in
+    # session order. The caller can stop early by breaking out of the loop, and the sessions added so far can still be
+    # analysed.
+    def session_results(self):
+        try:
+            for (_, result) in parallel.experiment_results([self.jobs()], self.workers, lambda e: self.converged()):
+                edge = self.record_session(result)
+                yield progress.Session_Result(self, self.win_loss.count - 1, edge, result[3].count)
+        finally:
+            if self.cache is not None:
+                self.cache.evict()
+
+    # Return the name of the experiment's cell of the grid, for progress reports.
+    def label(self):
+        return "%s, %d decks, %.2f penetration" % (self.strategy_name, self.decks, self.penetration)
 
     # Print out analysis of the results of the study.
     def analyse(self):
 
-        self.min_player_edge = min(self.win_loss)
-        self.max_player_edge = max(self.win_loss)
-        self.average_player_edge = mean(self.win_loss)
-        self.standard_deviation_edge = stdev(self.win_loss)
+        self.min_player_edge = self.win_loss.min
+        self.max_player_edge = self.win_loss.max
+        self.average_player_edge = self.win_loss.mean
+        self.standard_deviation_edge = self.win_loss.stdev()
 
         print("Player strategy:", self.strategy_name)
-        print("Number of sessions:", self.sessions)
+        print("Seed:", self.seed)
+        print("Number of sessions:", self.win_loss.count)
         print("Games per session:", self.rounds_per_session)
         print("Decks:", self.decks)
         print("Penetration: %.2f%%" % (100.0 * self.penetration))
         print("Total number of player hands:", self.player_hands)
         print("Total money staked=£%d" % self.grand_total_staked)
-        print("Min player edge: %.2f%%" % (100.0 * self.min_player_edge))
-        print("Max player edge: %.2f%%" % (100.0 * self.max_player_edge))
-        print("Average player edge: %.2f%%" % (100.0 * self.average_player_edge))
+        print("Min player edge: %.2f%%" % self.min_player_edge)
+        print("Max player edge: %.2f%%" % self.max_player_edge)
+        print("Average player edge: %.2f%%" % self.average_player_edge)
         print("(-ve means house is ahead, +ve means player is ahead)")
-        print("Standard deviation: %.2f" % (100 * self.standard_deviation_edge))
+        print("Standard deviation: %.2f" % self.standard_deviation_edge)
+        print("95%% confidence interval: +/-%.2f%%" % self.confidence_interval())
+        if self.profile is not None:
+            self.profile.print()
         print()
 
         return self
 
-class Shoe_Study:
+# A sweep of the grid of shoes, every number of decks with every penetration, for each card counting strategy. Each cell
+# of the grid is a Shoe_Experiment, so cells can stop early when they reach the precision, the study can be
+# checkpointed, and each penetration can be compared with the next one. write_to_file writes the cells in the same
+# format as a Sweep's results file.
+class Shoe_Study(sweep.Sweep):
+
+    def __init__(self, sessions, rounds_per_session, seed=None, workers=1, engine="table", precision=None,
+                 common_random_numbers=False, checkpoint_file=None, profile=False, strategy_names=None,
+                 cache=None, decks=None, penetrations=None, results_file="shoe_study_results.csv"):
+        if decks is None:
+            decks = DECKS
+        if penetrations is None:
+            penetrations = PENETRATIONS
 
-    def __init__(self, sessions, rounds_per_session):
-        self.experiments = []
+        # Card counting strategies to be tested, see counting.SYSTEMS. Session seeds don't depend on the strategy, so
+        # all of the strategies play the same shoes in each cell of the grid, and can be compared directly.
+        if strategy_names is None:
+            strategy_names = ["Hi-Lo Card Count"]
 
-        for d in [1, 2, 4, 6, 8]:
-            for p in [0.50, 0.75, 0.85]:
-                self.experiments.append(Shoe_Experiment(sessions, rounds_per_session, d, p))
+        self.precision = precision
+        self.common_random_numbers = common_random_numbers
+        self.profile_sessions = profile
 
+        # If there is a checkpoint file, then the study continues from where it was stopped.
+        self.checkpoint = None
+        if checkpoint_file is not None:
+            self.checkpoint = checkpoint.Checkpoint(checkpoint_file)
+            seed = self.checkpoint.seed(seed)
+
+        sweep.Sweep.__init__(self, {"strategy_name": strategy_names, "decks": decks, "penetration": penetrations},
+                             sessions, rounds_per_session, seed=seed, workers=workers, engine=engine,
+                             results_file=results_file, cache=cache)
+
+    # Each cell of the grid is a Shoe_Experiment, which is played by run.
+    def make_cell(self, parameters):
+        return Shoe_Experiment(self.sessions, self.rounds_per_session, parameters["decks"], parameters["penetration"],
+                               self.seed, self.workers, run=False, engine=self.engine, precision=self.precision,
+                               common_random_numbers=self.common_random_numbers, profile=self.profile_sessions,
+                               strategy_name=parameters["strategy_name"], cache=self.cache)
+
+    # Play the cells, then print the analysis of each of them.
+    def run(self):
+        self.experiments = self.cells
+
+        # Paired differences in edge between each penetration and the next one, for the same strategy and number of
+        # decks.
+        self.pairs = []
+        for (first, second) in zip(self.experiments, self.experiments[1:]):
+            if first.strategy_name == second.strategy_name and first.decks == second.decks:
+                self.pairs.append((first, second, running_stats.Paired_Stats()))
+
+        # Put the sessions of all of the experiments into one pool of workers. Cells of the grid that reach the
+        # requested precision stop early, and the workers move on to the noisier cells.
+        job_lists = [ex.jobs() for ex in self.experiments]
+        finished = lambda e: self.experiments[e].converged()
+        record_session = self.record_session
+
+        if self.checkpoint is not None:
+            settings = {"cells": [[ex.strategy_name, ex.decks, ex.penetration] for ex in self.experiments],
+                        "sessions": self.sessions, "rounds_per_session": self.rounds_per_session,
+                        "engine": self.engine, "precision": self.precision,
+                        "common_random_numbers": self.common_random_numbers}
+            job_lists = self.checkpoint.resume(self.seed, settings, job_lists, self.record_session, finished)
+            record_session = self.checkpoint.record
+
+        parallel.run_experiments(job_lists, self.workers, record_session, finished)
+        if self.checkpoint is not None:
+            self.checkpoint.finish()
+        if self.cache is not None:
+            self.cache.evict()
+
+        for ex in self.experiments:
+            ex.analyse()
+        self.analyse_pairs()
+
+    # Add the results of one session of the parm experiment number to its experiment, and to its pairs.
+    def record_session(self, e, result):
+        ex = self.experiments[e]
+        edge = ex.record_session(result)
+        session = ex.win_loss.count - 1
+
+        for (first, second, paired) in self.pairs:
+            if ex is first:
+                paired.add(0, session, edge)
+            elif ex is second:
+                paired.add(1, session, edge)
+
+    # Print out the paired differences in player edge.
+    def analyse_pairs(self):
+        for (first, second, paired) in self.pairs:
+            print("%s, Decks: %d, Penetration %.2f%% minus %.2f%%:" % (first.strategy_name, first.decks,
+                                                                      100.0 * second.penetration,
+                                                                      100.0 * first.penetration))
+            print("Paired difference in player edge: %+.2f%%, Standard error: %.2f, Sessions: %d"
+                  % (paired.difference.mean, paired.difference.standard_error(), paired.difference.count))
+        print()
+
+    # Write a row for each cell of the grid to the results file, in the same format as a Sweep's.
     def write_to_file(self):
-        with open('shoe_study_results.csv', newline='', mode='w') as results:
-            experiment_writer = csv.writer(results, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        self.start_results_file()
+        for ex in self.experiments:
+            self.write_cell(ex)
 
-            experiment_writer.writerow(["decks", "penetration", "average_player_edge"])
+    def write_pairs_to_file(self):
+        with open('shoe_study_paired_results.csv', newline='', mode='w') as results:
+            experiment_writer = csv.writer(results, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
 
-            for ex in self.experiments:
-                experiment_writer.writerow([ex.decks, ex.penetration, ex.average_player_edge])
+            experiment_writer.writerow(["decks", "first_penetration", "second_penetration", "sessions",
+                                        "paired_difference", "standard_error", "strategy_name"])
 
-blackjack.verbose = False
+            for (first, second, paired) in self.pairs:
+                experiment_writer.writerow([first.decks, first.penetration, second.penetration,
+                                            paired.difference.count, paired.difference.mean,
+                                            paired.difference.standard_error(), first.strategy_name])
 
-this_study = Shoe_Study(10, 100000)
-this_study.write_to_file()
+if __name__ == "__main__":
+    this_study = Shoe_Study(10, 100000, workers=os.cpu_count())
+    this_study.write_to_file()
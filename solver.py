@@ -0,0 +1,211 @@
+# Solve a basic strategy chart by simulation, for a table's rules: number of decks, blackjack payout and split depth.
+# For each cell of the chart (player's hand and dealer's up card), rounds that start with that hand are played with
+# each of the possible actions, and the action with the best expected value (EV) is chosen.
+#
+# Every action of a trial is played from the same cards (common random numbers), so most of the card-to-card noise
+# cancels out of the differences between actions. Trials are played in batches, and after each batch any action that
+# is clearly worse than another one is eliminated. A cell is solved as soon as only one action is left, so easy cells
+# take a few thousand trials, and only the close ones are played up to max_trials.
+#
+# Cells are solved in an order where each hand only draws into cells that are already solved: hard hands from 19 down
+# to 5, then soft hands, then pairs. The rounds are played by blackjack.Table, so they follow the table's rules exactly,
+# for example a double down is lost to a dealer's blackjack.
+#
+# this_solver = Solver(decks=4, seed=42)
+# print(this_solver.markdown())
+
+import blackjack
+import math
+import parallel
+import random
+import running_stats
+import strategy
+
+SOLVER = "Solver"                       # Strategy name that the trial charts are played under.
+DRAWN = 40                              # Cards put in the shoe for a trial, after the player's and dealer's cards.
+
+HARD_VALUES = list(range(19, 4, -1))    # Hard 2 card hands that are solved, 19 down to 5. 20 and 21 always Stand.
+SOFT_VALUES = list(range(9, 1, -1))     # Soft hands that are solved, by the card with the ace, 9 down to 2.
+PAIR_VALUES = list(range(11, 1, -1))    # Pairs that are solved, by card value, aces down to 2s.
+DEALER_VALUES = list(range(2, 12))      # Dealer's up card values, 2 to 11 (ace).
+
+ACTION_LABELS = {strategy.STAND: "S", strategy.HIT: "H", strategy.DOUBLE: "D", strategy.SPLIT: "SP"}
+
+
+class Solved_Cell:
+
+    def __init__(self, action, trials, resolved, evs):
+        self.action = action            # Best action.
+        self.trials = trials            # Number of trials played.
+        self.resolved = resolved        # False if more than one action was left after max_trials.
+        self.evs = evs                  # Estimated EV per unit staked of each action played, {action: EV}.
+
+
+class Solver:
+
+    # z is the number of standard errors by which an action must be worse than another to be eliminated.
+    def __init__(self, decks=4, blackjack_value=3 / 2, split_depth=2, seed=None, z=3.0, batch_trials=500,
+                 min_trials=2000, max_trials=50000, name="Solved Strategy", run=True):
+        if seed is None:
+            seed = parallel.new_seed()
+
+        self.decks = decks
+        self.seed = seed                # Each cell's trials are dealt from a seed derived from this one.
+        self.z = z
+        self.batch_trials = batch_trials
+        self.min_trials = min_trials
+        self.max_trials = max_trials
+        self.name = name
+
+        # Positions in a full shoe of the cards of each card value, so that trials are dealt from a full shoe.
+        self.template = blackjack.shoe_template(decks)
+        self.positions = {v: [i for (i, c) in enumerate(self.template) if blackjack.CARD_VALUES[c] == v]
+                          for v in DEALER_VALUES}
+
+        # The table that trials are played at. Stakes are 1 unit, so its net results are EVs per unit staked.
+        self.table = blackjack.Table(decks, 1.0, seed, {}, 1, blackjack_value, split_depth)
+
+        self.chart = strategy.Strategy_Chart(name)      # Starts as the Dealer Strategy, and is solved cell by cell.
+        self.cells = {}                                 # Solved_Cell of each cell, keyed by (kind, row, dealer value).
+
+        if run:
+            self.solve()
+
+    # Solve every cell of the chart.
+    def solve(self):
+        for value in HARD_VALUES:
+            for dealer_value in DEALER_VALUES:
+                self.solve_cell("hard", value, dealer_value, [strategy.STAND, strategy.HIT, strategy.DOUBLE])
+
+        # Soft hands that aren't solved. A, 10 is a blackjack, and A, A is only played like this once it can't split.
+        for dealer_value in DEALER_VALUES:
+            self.chart.set_soft(10, dealer_value, strategy.STAND)
+            self.chart.set_soft(1, dealer_value, strategy.HIT)
+
+        for value in SOFT_VALUES:
+            for dealer_value in DEALER_VALUES:
+                self.solve_cell("soft", value, dealer_value, [strategy.STAND, strategy.HIT, strategy.DOUBLE])
+
+        for value in PAIR_VALUES:
+            for dealer_value in DEALER_VALUES:
+                self.solve_cell("pair", value, dealer_value,
+                                [strategy.STAND, strategy.HIT, strategy.DOUBLE, strategy.SPLIT])
+
+    # Set the action of a cell in the parm chart.
+    def set_cell(self, chart, kind, value, dealer_value, action):
+        if kind == "hard":
+            chart.set_hard(value, dealer_value, action)
+        elif kind == "soft":
+            chart.set_soft(value, dealer_value, action)
+        else:
+            chart.set_pair(value, dealer_value, action)
+
+    # Return the card values of the player's first 2 cards, for a trial of the parm cell.
+    def player_values(self, rng, kind, value):
+        if kind == "soft":
+            return 11, value
+        if kind == "pair":
+            return value, value
+
+        # Hard hands are made of 2 different card values, weighted by how many ways there are to deal them.
+        combinations = [(a, value - a) for a in range(2, 11) if a < value - a <= 10]
+        weights = [len(self.positions[a]) * len(self.positions[b]) for (a, b) in combinations]
+        return rng.choices(combinations, weights)[0]
+
+    # Return the cards of one trial of the parm cell, in the order that they are dealt: player, dealer, player, then
+    # the dealer's hole card and the rest of the shoe.
+    def deal(self, rng, kind, value, dealer_value):
+        (first_value, second_value) = self.player_values(rng, kind, value)
+
+        # Pick a different position in the shoe for each of the 3 known cards.
+        chosen = []
+        for v in [first_value, dealer_value, second_value]:
+            position = rng.choice(self.positions[v])
+            while position in chosen:
+                position = rng.choice(self.positions[v])
+            chosen.append(position)
+
+        rest = [i for i in rng.sample(range(len(self.template)), DRAWN + 3) if i not in chosen][0:DRAWN]
+        return [self.template[i] for i in chosen + rest]
+
+    # Play one round from the parm cards by the parm chart. Return the net result of the round.
+    def play(self, cards, chart):
+        table = self.table
+        table.charts[SOLVER] = chart
+        table.shoe.cards = list(cards)
+        table.shoe.next_card = 0
+        table.shoe.cut_card = math.inf                  # Never replenish the shoe, as each trial has its own cards.
+
+        won_before = table.amount_won_or_lost
+        table.play_one_round(SOLVER)
+        return table.amount_won_or_lost - won_before
+
+    # Solve one cell, by playing each of the parm actions until only one is left, or max_trials is reached.
+    def solve_cell(self, kind, value, dealer_value, actions):
+        charts = {}
+        for action in actions:
+            charts[action] = strategy.Strategy_Chart(self.name, self.chart)
+            self.set_cell(charts[action], kind, value, dealer_value, action)
+
+        rng = random.Random(parallel.derive_seed(self.seed, kind, value, dealer_value))
+        evs = {a: running_stats.Running_Stats() for a in actions}
+        differences = {(a, b): running_stats.Running_Stats() for a in actions for b in actions if a != b}
+
+        remaining = list(actions)
+        trials = 0
+        while len(remaining) > 1 and trials < self.max_trials:
+            for t in range(self.batch_trials):
+                cards = self.deal(rng, kind, value, dealer_value)
+                nets = {a: self.play(cards, charts[a]) for a in remaining}
+                for a in remaining:
+                    evs[a].add(nets[a])
+                    for b in remaining:
+                        if a != b:
+                            differences[(a, b)].add(nets[a] - nets[b])
+            trials += self.batch_trials
+
+            # Eliminate each action that another action beats by more than z standard errors.
+            if trials >= self.min_trials:
+                remaining = [a for a in remaining
+                             if not any(differences[(b, a)].mean > self.z * differences[(b, a)].standard_error()
+                                        for b in remaining if b != a)]
+
+        best = max(remaining, key=lambda a: evs[a].mean)
+        self.set_cell(self.chart, kind, value, dealer_value, best)
+        self.cells[(kind, value, dealer_value)] = Solved_Cell(best, trials, len(remaining) == 1,
+                                                              {a: evs[a].mean for a in actions if evs[a].count > 0})
+
+    # Return the markdown table of the parm rows. Each row is (label, kind, value).
+    def markdown_table(self, rows):
+        lines = ["|     | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9 | 10 | A |",
+                 "|-----|---|---|---|---|---|---|---|---|----|---|"]
+        for (label, kind, value) in rows:
+            labels = []
+            for dealer_value in DEALER_VALUES:
+                solved = self.cells.get((kind, value, dealer_value))
+                labels.append("S" if solved is None else ACTION_LABELS[solved.action])
+            lines.append("| **%s** | %s |" % (label, " | ".join(labels)))
+        return "\n".join(lines)
+
+    # Return the solved chart, in the format of basic_strategy.md. Each section builds on the one before, so the
+    # complete chart is the last one, "<name> Pairs", when it is loaded by strategy.parse_charts.
+    def markdown(self):
+        names = {v: "A" if v == 11 else str(v) for v in DEALER_VALUES}
+        hard_rows = [("20+", "hard", 20)] + [(str(v), "hard", v) for v in HARD_VALUES]
+        soft_rows = [("A, 10", "soft", 10)] + [("A, %d" % v, "soft", v) for v in SOFT_VALUES]
+        pair_rows = [("%s, %s" % (names[v], names[v]), "pair", v) for v in PAIR_VALUES]
+
+        unresolved = [cell for cell in self.cells.values() if not cell.resolved]
+        return "\n".join(["#### %s Hard Hands" % self.name, "", self.markdown_table(hard_rows), "",
+                          "#### %s Soft Hands" % self.name, "", self.markdown_table(soft_rows), "",
+                          "#### %s Pairs" % self.name, "", self.markdown_table(pair_rows), "",
+                          "Decks: %d, Blackjack pays: %s, Split depth: %d, Seed: %d, Trials: %d, Unresolved cells: %d"
+                          % (self.decks, self.table.blackjack_value, self.table.split_depth, self.seed,
+                             sum(cell.trials for cell in self.cells.values()), len(unresolved)), ""])
+
+
+if __name__ == "__main__":
+    this_solver = Solver(decks=4)
+    with open("solved_strategy.md", mode="w", encoding="utf-8") as solved:
+        solved.write(this_solver.markdown())
+    print(this_solver.markdown())
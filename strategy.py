@@ -0,0 +1,185 @@
+# Strategy charts. Each chart is compiled once into flat lists of actions, indexed by the value of the player's hand
+# and the card value of the dealer's up card, so that each decision is a single list lookup.
+
+import counting
+
+# Actions that a chart can tell the player to take.
+STAND = 0
+HIT = 1
+DOUBLE = 2                  # Double Down if allowed, otherwise Hit.
+SPLIT = 3
+
+ACTION_CODES = {"S": STAND, "H": HIT, "D": DOUBLE, "SP": SPLIT}
+ACTION_NAMES = ["Stand", "Hit", "Double Down", "Split"]
+CARD_VALUE_NAMES = {"2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7, "8": 8, "9": 9, "10": 10, "A": 11}
+
+COLUMNS = 10                # One column for each card value of the dealer's up card, 2 to 11 (ace).
+
+
+# Return the index into a chart's lists for the parm row (for example, value of player's hand) and dealer's card value.
+def cell(row, dealer_card_value):
+    return row * COLUMNS + dealer_card_value - 2
+
+
+class Strategy_Chart:
+
+    # Create a new chart, which is a copy of the parm chart. If there is no parm chart, then the new chart is the
+    # Dealer Strategy: Stand on 17 to 21, and Hit on anything less than 17.
+    def __init__(self, name, based_on=None):
+        self.name = name
+
+        if based_on is None:
+            # Hard hands, indexed by cell(value of hand, dealer card value). Values 0 to 21.
+            self.hard = [HIT] * (17 * COLUMNS) + [STAND] * (5 * COLUMNS)
+            self.soft = None        # Soft 2 card hands, indexed by cell(value of hand - 12, dealer card value).
+            self.pairs = None       # Pairs, indexed by cell(card value of the pair - 2, dealer card value).
+        else:
+            self.hard = list(based_on.hard)
+            self.soft = None if based_on.soft is None else list(based_on.soft)
+            self.pairs = None if based_on.pairs is None else list(based_on.pairs)
+
+    # Set the action for a hard hand of the parm value.
+    def set_hard(self, value, dealer_card_value, action):
+        self.hard[cell(value, dealer_card_value)] = action
+
+    # Set the action for a soft hand, made of an ace plus a card of the parm card value.
+    def set_soft(self, other_card_value, dealer_card_value, action):
+        if self.soft is None:
+            self.soft = [None] * (10 * COLUMNS)
+        self.soft[cell(other_card_value - 1, dealer_card_value)] = action      # Value of hand is other card + 11.
+
+    # Set the action for a pair of cards of the parm card value.
+    def set_pair(self, card_value, dealer_card_value, action):
+        if self.pairs is None:
+            self.pairs = [None] * (10 * COLUMNS)
+        self.pairs[cell(card_value - 2, dealer_card_value)] = action
+
+
+# Return the list of card values described by a chart label, such as "10", "A", "17+" or "5-8".
+def label_values(label):
+    if label.endswith("+"):
+        return list(range(int(label[:-1]), 22))
+    if "-" in label:
+        (low, high) = label.split("-")
+        return list(range(CARD_VALUE_NAMES[low], CARD_VALUE_NAMES[high] + 1))
+    if label == "A":
+        return [11]
+    return [int(label)]
+
+
+# Add one row of a markdown table to the parm chart. Row labels look like "16" or "5-8" for hard hands,
+# "A, 7" or "A, 8-10" for soft hands, and "9, 9" or "A, A or 8, 8" for pairs.
+def add_row(chart, label, dealer_card_values, actions):
+    for alternative in label.split(" or "):
+        cards = [c.strip() for c in alternative.split(",")]
+
+        for (dealer_card_value, action) in zip(dealer_card_values, actions):
+            if len(cards) == 1:
+                for value in label_values(cards[0]):
+                    chart.set_hard(value, dealer_card_value, action)
+            elif cards[0] == cards[1]:
+                chart.set_pair(CARD_VALUE_NAMES[cards[0]], dealer_card_value, action)
+            else:
+                for value in label_values(cards[1]):
+                    chart.set_soft(value, dealer_card_value, action)
+
+
+# Parse strategy charts from text in the format of basic_strategy.md. Each "####" heading that is followed by a
+# table starts a new chart, which builds on the chart before it. Returns a dictionary of charts keyed by heading.
+def parse_charts(text):
+    charts = {}
+    chart = None
+    previous = None
+    name = ""
+    dealer_card_values = []
+
+    for line in text.splitlines():
+        line = line.strip()
+
+        if line.startswith("####"):
+            name = line.strip("# ")
+            if chart is not None:
+                previous = chart
+            chart = None
+
+        elif line.startswith("|"):
+            cells = [c.strip().strip("*").strip() for c in line.strip("|").split("|")]
+
+            if cells[0] == "" and cells[1] != "":                  # Header row of dealer's up cards.
+                dealer_card_values = [CARD_VALUE_NAMES[c] for c in cells[1:]]
+                chart = Strategy_Chart(name, previous)
+                charts[name] = chart
+
+            elif not cells[0].startswith("-"):                     # Skip the "|-----|---|" separator row.
+                add_row(chart, cells[0], dealer_card_values, [ACTION_CODES[c] for c in cells[1:]])
+
+    return charts
+
+
+# Load strategy charts from a file in the format of basic_strategy.md.
+def load_charts(filename):
+    with open(filename, encoding="utf-8") as chart_file:
+        return parse_charts(chart_file.read())
+
+
+# The Basic Strategy charts, in the same format as basic_strategy.md.
+BASIC_STRATEGY = """
+#### Basic Strategy Section 1
+
+|     | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9 | 10 | A |
+|-----|---|---|---|---|---|---|---|---|----|---|
+| **17+** | S | S | S | S | S | S | S | S | S | S |
+| **16**  | S | S | S | S | S | H | H | H | H | H |
+| **15**  | S | S | S | S | S | H | H | H | H | H |
+| **14**  | S | S | S | S | S | H | H | H | H | H |
+| **13**  | S | S | S | S | S | H | H | H | H | H |
+| **12**  | H | H | S | S | S | H | H | H | H | H |
+
+#### Basic Strategy Section 2
+
+|     | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9 | 10 | A |
+|-----|---|---|---|---|---|---|---|---|----|---|
+| **11** | D | D | D | D | D | D | D | D | D | H |
+| **10**  | D | D | D | D | D | D | D | D | H | H |
+| **9**  | H | D | D | D | D | H | H | H | H | H |
+| **5-8**  | H | H | H | H | H | H | H | H | H | H |
+
+#### Basic Strategy Section 3
+
+|     | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9 | 10 | A |
+|-----|---|---|---|---|---|---|---|---|----|---|
+| **A, 8-10** | S | S | S | S | S | S | S | S | S | S |
+| **A, 7**  | S | D | D | D | D | S | S | H | H | H |
+| **A, 6**  | H | D | D | D | D | H | H | H | H | H |
+| **A, 5**  | H | H | D | D | D | H | H | H | H | H |
+| **A, 4**  | H | H | D | D | D | H | H | H | H | H |
+| **A, 3**  | H | H | H | D | D | H | H | H | H | H |
+| **A, 2**  | H | H | H | D | D | H | H | H | H | H |
+
+#### Basic Strategy Section 4
+
+|     | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9 | 10 | A |
+|-----|---|---|---|---|---|---|---|---|----|---|
+| **A, A or 8, 8** | SP | SP | SP | SP | SP | SP | SP | SP | SP  | SP |
+| **10, 10**  | S | S | S | S | S | S | S | S | S  | S |
+| **9, 9**  | SP | SP | SP | SP | SP | S | SP | SP | S | S |
+| **7, 7**  | SP | SP | SP | SP | SP | SP | H | H | H | H |
+| **6, 6**  | SP | SP | SP | SP | SP | H | H | H | H  | H |
+| **5, 5**  | D | D | D | D | D | D | D | D | H | H |
+| **4, 4**  | H | H | H | SP | SP | H | H | H | H | H |
+| **3, 3**  | SP | SP | SP | SP | SP | SP | H | H | H | H |
+| **2, 2**  | SP | SP | SP | SP | SP | SP | H | H | H | H |
+"""
+
+
+# Make the dictionary of charts for the strategies that can be played at a table, keyed by strategy name.
+# Note that card counting is based on Basic Strategy Section 4.
+def standard_charts():
+    charts = {"Dealer": Strategy_Chart("Dealer")}
+    charts.update(parse_charts(BASIC_STRATEGY))
+    for strategy_name in counting.SYSTEMS:
+        charts[strategy_name] = charts["Basic Strategy Section 4"]
+    return charts
+
+
+CHARTS = standard_charts()              # Compiled once, at import.
@@ -1,53 +1,205 @@
 # Do a study of several different strategies.
 
+import bankroll
 import blackjack
-import csv
-from statistics import mean
-from statistics import stdev
+import checkpoint
+import counting
+import math
+import os
+import parallel
+import profiling
+import progress
+import running_stats
+import shared_results
 
 class Experiment:
 
-    def __init__(self, strategy_name, sessions, rounds_per_session):
+    def __init__(self, strategy_name, sessions, rounds_per_session, seed=None, workers=1, run=True, engine="table",
+                 record=None, precision=None, common_random_numbers=False, profile=False, cache=None,
+                 infinite_shoe=False, decks=4, penetration=0.75, progress=False, shared=False):
         self.strategy_name = strategy_name          # Name of the player strategy to be tested.
-        self.win_loss = []                          # List of percentage win(+ve) or loss(-ve) per session.
-        self.sessions = sessions                    # Number of sessions (visits to table) to do in this study.
+        self.win_loss = running_stats.Running_Stats()   # Stats of percentage win(+ve) or loss(-ve) per session.
+        self.round_stats = running_stats.Running_Stats()    # Stats of net result of each round.
+        self.sessions = sessions                    # Max number of sessions (visits to table) to do in this study.
         self.rounds_per_session = rounds_per_session  # Number of rounds to be played in each session.
+        self.decks = decks                          # Number of decks in the shoe.
+        self.penetration = penetration              # Shoe replenished when this penetration is reached.
         self.player_hands = 0                       # Number of hands that the player has played in the study.
         self.grand_total_staked = 0                 # Grand total of money staked in all games in all sessions.
         self.min_player_edge = 0
         self.max_player_edge = 0
         self.average_player_edge = 0
         self.standard_deviation_edge = 0
-        self.run()
-        self.analyse()
 
-    # Run the study.
+        if seed is None:
+            seed = parallel.new_seed()
+        self.seed = seed                            # Each session's seed is derived from this one.
+        self.engine = engine                        # "table", or "batch" for the NumPy batch engine.
+        self.workers = workers                      # Number of worker processes to play the sessions.
+        self.record = record                        # Optional directory, to log the outcome of every round.
+
+        # If precision is set, then the experiment stops as soon as the 95% confidence interval of the player edge
+        # is narrower than +/- precision percent.
+        self.precision = precision
+
+        # With common random numbers, session seeds don't depend on the strategy, so every strategy plays the same
+        # sequence of shuffled shoes.
+        self.common_random_numbers = common_random_numbers
+
+        # If profile_sessions is True, then each session is profiled, and the profiles are merged into profile.
+        self.profile_sessions = profile
+        self.profile = None
+
+        # Optional result_cache.Result_Cache. Sessions that have been played before, with the same seed and settings,
+        # come back from the cache instead of being played again.
+        self.cache = cache
+
+        # If progress is True, then run() prints the rounds per second, time left and player edge so far.
+        self.progress = progress
+
+        # If shared is True, then the workers write the net result, money staked and true count of every round into
+        # shared_results, a shared_results.Shared_Results, which the experiment analyses in place. It is freed by close,
+        # or at the end of a with block, for example "with Experiment(..., shared=True) as this_experiment:".
+        self.shared_results = None
+        if shared:
+            if engine == "batch":
+                raise ValueError("The batch engine doesn't collect the results of each round.")
+            self.shared_results = shared_results.Shared_Results(sessions, rounds_per_session)
+
+        # If infinite_shoe is True, then cards are drawn with replacement from an infinite shoe, which is much faster
+        # than shuffling a real shoe. Cards can't be counted in it, so card counting strategies need a real shoe.
+        if infinite_shoe and strategy_name in counting.SYSTEMS:
+            raise ValueError("%s needs a real shoe, to count its cards." % strategy_name)
+        self.infinite_shoe = infinite_shoe
+
+        # A Study may choose to run the sessions of several experiments together, and analyse them afterwards.
+        if run:
+            try:
+                self.run()
+                self.analyse()
+            except BaseException:
+                self.close()
+                raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    # Free the shared memory of the experiment's shared results, if it has any.
+    def close(self):
+        if self.shared_results is not None:
+            self.shared_results.close()
+
+    # Make a list of jobs, one per session. Each session gets its own seed, so results are reproducible.
+    def jobs(self):
+        return [{"strategy_name": self.strategy_name,
+                 "decks": self.decks,
+                 "penetration": self.penetration,
+                 "rounds": self.rounds_per_session,
+                 "seed": self.session_seed(s),
+                 "engine": self.engine,
+                 "profile": self.profile_sessions,
+                 "record": self.session_log(s),
+                 "cache": self.cache,
+                 "infinite_shoe": self.infinite_shoe,
+                 "shared": None if self.shared_results is None else self.shared_results.job_slice(s)}
+                for s in range(self.sessions)]
+
+    # Return the seed of the parm session.
+    def session_seed(self, session):
+        if self.common_random_numbers:
+            return parallel.derive_seed(self.seed, session)
+        return parallel.derive_seed(self.seed, self.strategy_name, session)
+
+    # Return the directory of the outcome log of the parm session, or None if the experiment isn't recording.
+    def session_log(self, session):
+        if self.record is None:
+            return None
+        return os.path.join(self.record, "%s_%d" % (self.strategy_name.replace(" ", "_"), session))
+
+    # Add the results of one session to the experiment's totals. Returns the player edge of the session.
+    def record_session(self, result):
+        (amount_won_or_lost, total_staked, hands_played_by_player, round_stats, profile) = result
+
+        # Multiply by 100 to make it a percentage.
+        edge = 100 * amount_won_or_lost / total_staked
+        self.win_loss.add(edge)
+        self.round_stats.merge(round_stats)
+
+        self.player_hands += hands_played_by_player
+        self.grand_total_staked += total_staked
+
+        if profile is not None:
+            if self.profile is None:
+                self.profile = profiling.Profile()
+            self.profile.merge(profile)
+        return edge
+
+    # Return the half-width of the 95% confidence interval of the player edge, as a percentage. It is calculated from
+    # the net result of every round played so far.
+    def confidence_interval(self):
+        if self.grand_total_staked == 0:
+            return math.inf
+        average_stake = self.grand_total_staked / self.round_stats.count
+        return 1.96 * 100 * self.round_stats.standard_error() / average_stake
+
+    # Has the experiment played enough sessions to reach the requested precision?
+    def converged(self):
+        return self.precision is not None and self.win_loss.count >= 2 \
+            and self.confidence_interval() <= self.precision
+
+    # Run the study. If progress is set, then a line of progress is printed as the sessions finish.
     def run(self):
-        for experiments in range(self.sessions):
-            this_table = blackjack.Table(4,             # 4 Decks in the shoe.
-                                         0.75)          # Shoe replenished when 75% penetration reached.
+        reporter = None
+        if self.progress:
+            reporter = progress.Progress_Reporter(self)
+        for session_result in self.session_results():
+            if reporter is not None:
+                reporter.report(session_result)
 
-            for games in range(self.rounds_per_session):
-                this_table.play_one_round(self.strategy_name)
+    # Play the sessions, and yield a progress.Session_Result as each one is added to the experiment's totals, in
+    # session order. The caller can stop early by breaking out of the loop, and the sessions added so far can still be
+    # analysed.
+    def session_results(self):
+        try:
+            for (_, result) in parallel.experiment_results([self.jobs()], self.workers, lambda e: self.converged()):
+                edge = self.record_session(result)
+                yield progress.Session_Result(self, self.win_loss.count - 1, edge, result[3].count)
+        finally:
+            if self.cache is not None:
+                self.cache.evict()
 
-            # Multiply by 100 to make it a percentage.
-            self.win_loss.append(100 * this_table.amount_won_or_lost / this_table.total_staked)
+    # Print out the risk of ruin and drawdowns of the parm starting bankroll, from the net result of every round
+    # recorded in the outcome logs of the sessions. logs is a list of the log directories, by default the experiment's
+    # own. Returns the bankroll.Bankroll_Analysis.
+    def analyse_bankroll(self, starting_bankroll, logs=None, rounds=None, paths=10000, block_rounds=1):
+        if logs is None:
+            if self.record is None:
+                raise ValueError("Bankroll analysis needs the outcome log of each session, so set record.")
+            logs = [self.session_log(s) for s in range(self.win_loss.count)]
 
-            self.player_hands += this_table.hands_played_by_player
-            self.grand_total_staked += this_table.total_staked
+        net = bankroll.load_net(logs, self.strategy_name)
+        analysis = bankroll.Bankroll_Analysis(net, starting_bankroll, rounds, paths, block_rounds,
+                                              parallel.derive_seed(self.seed, self.strategy_name, "bankroll"))
 
-            del this_table
+        print("Player strategy:", self.strategy_name)
+        analysis.print()
+        print()
+        return analysis
 
     # Print out analysis of the results of the study.
     def analyse(self):
 
-        self.min_player_edge = min(self.win_loss)
-        self.max_player_edge = max(self.win_loss)
-        self.average_player_edge = mean(self.win_loss)
-        self.standard_deviation_edge = stdev(self.win_loss)
+        self.min_player_edge = self.win_loss.min
+        self.max_player_edge = self.win_loss.max
+        self.average_player_edge = self.win_loss.mean
+        self.standard_deviation_edge = self.win_loss.stdev()
 
         print("Player strategy:", self.strategy_name)
-        print("Number of sessions:", self.sessions)
+        print("Seed:", self.seed)
+        print("Number of sessions:", self.win_loss.count)
         print("Games per session:", self.rounds_per_session)
         print("Total number of player hands:", self.player_hands)
         print("Total money staked=£%d" % self.grand_total_staked)
@@ -56,22 +208,153 @@ class Experiment:
         print("Average player edge: %.2f%%" % self.average_player_edge)
         print("(-ve means house is ahead, +ve means player is ahead)")
         print("Standard deviation: %.2f" % self.standard_deviation_edge)
+        print("95%% confidence interval: +/-%.2f%%" % self.confidence_interval())
+        if self.shared_results is not None:
+            summary = self.shared_results.summary(self.win_loss.count)
+            print("Player edge of every round: %.2f%% +/-%.2f%%, Standard deviation per round: %.2f"
+                  % (summary.edge, summary.confidence_interval, summary.stdev))
+        if self.profile is not None:
+            self.profile.print()
         print()
 
         return self
 
 class Study:
 
-    def __init__(self, sessions, rounds_per_session):
+    def __init__(self, sessions, rounds_per_session, seed=None, workers=1, engine="table", record=None,
+                 precision=None, common_random_numbers=False, checkpoint_file=None, profile=False, cache=None,
+                 seats=1, infinite_shoe=False, starting_bankroll=None, decks=4, penetration=0.75):
         self.experiments = []
 
+        # If starting_bankroll is set, then the risk of ruin and drawdowns of each strategy are analysed, from the
+        # outcome logs of its sessions.
+        if starting_bankroll is not None and record is None:
+            raise ValueError("Bankroll analysis needs the outcome log of each session, so set record.")
+
+        if not 1 <= seats <= blackjack.MAX_SEATS:
+            raise ValueError("A table has 1 to %d seats, not %d." % (blackjack.MAX_SEATS, seats))
+
+        # If there is a checkpoint file, then the study continues from where it was stopped.
+        self.checkpoint = None
+        if checkpoint_file is not None:
+            self.checkpoint = checkpoint.Checkpoint(checkpoint_file)
+            seed = self.checkpoint.seed(seed)
+
+        if seed is None:
+            seed = parallel.new_seed()
+
         # (Strategy Name, Number of Sessions, Rounds per Session)
         for ex in ["Dealer", "Basic Strategy Section 1", "Basic Strategy Section 2", "Basic Strategy Section 3",
                    "Basic Strategy Section 4", "Hi-Lo Card Count"]:
 
-            self.experiments.append(Experiment(ex, sessions, rounds_per_session))
+            self.experiments.append(Experiment(ex, sessions, rounds_per_session, seed, workers, run=False,
+                                               engine=engine, record=record, precision=precision,
+                                               common_random_numbers=common_random_numbers, profile=profile,
+                                               cache=cache,
+                                               infinite_shoe=infinite_shoe and ex not in counting.SYSTEMS,
+                                               decks=decks, penetration=penetration))
+
+        # Paired differences in edge between each strategy and the next one in the list. With common random numbers,
+        # the 2 strategies in a pair played the same shoes in each session, so most of the shoe-to-shoe noise cancels.
+        self.pairs = []
+        for i in range(len(self.experiments) - 1):
+            self.pairs.append((self.experiments[i], self.experiments[i + 1], running_stats.Paired_Stats()))
+
+        # The strategies sit together at tables of up to seats players. The seats of a table share one shoe and one
+        # dealer's hand each round, so one session plays all of their experiments. Each table is a list of experiment
+        # numbers.
+        self.tables = [list(range(i, min(i + seats, len(self.experiments))))
+                       for i in range(0, len(self.experiments), seats)]
+        table_of = [t for (t, table) in enumerate(self.tables) for e in table]
+
+        # Put the sessions of all of the tables into one pool of workers, so that none of them sit idle while the last
+        # few sessions of a table finish. Tables whose experiments all reach the requested precision stop early, and
+        # the workers move on to the others.
+        job_lists = [self.table_jobs(table) for table in self.tables]
+        finished = lambda t: all(self.experiments[e].converged() for e in self.tables[t])
+        record_results = self.record_results
+
+        if self.checkpoint is not None:
+            settings = {"strategies": [ex.strategy_name for ex in self.experiments],
+                        "sessions": sessions, "rounds_per_session": rounds_per_session, "engine": engine,
+                        "precision": precision, "common_random_numbers": common_random_numbers}
+            if seats > 1:
+                settings["seats"] = seats
+            if infinite_shoe:
+                settings["infinite_shoe"] = True
+            if (decks, penetration) != (4, 0.75):
+                settings["decks"] = decks
+                settings["penetration"] = penetration
+            remaining = self.checkpoint.resume(seed, settings, [job_lists[t] for t in table_of], self.record_session,
+                                               lambda e: finished(table_of[e]))
+            job_lists = [remaining[table[0]] for table in self.tables]
+            record_results = self.checkpoint.record_results
+
+        parallel.run_experiments(job_lists, workers,
+                                 lambda t, results: record_results(self.table_results(t, results)), finished)
+        if self.checkpoint is not None:
+            self.checkpoint.finish()
+        if cache is not None:
+            cache.evict()
+
+        for ex in self.experiments:
+            ex.analyse()
+        self.analyse_pairs()
+
+        # The seats of a table share the outcome logs of its first experiment.
+        if starting_bankroll is not None:
+            for table in self.tables:
+                first = self.experiments[table[0]]
+                logs = [first.session_log(s) for s in range(first.win_loss.count)]
+                for e in table:
+                    self.experiments[e].analyse_bankroll(starting_bankroll, logs)
+
+    # Make the list of jobs of the parm table, one per session. The first seat is the table's own, and its
+    # experiment's jobs are used, with the strategies of the other seats added. So a table with one seat plays just
+    # as an experiment on its own would. The seats share an infinite shoe only if none of them count cards.
+    def table_jobs(self, table):
+        jobs = self.experiments[table[0]].jobs()
+        if len(table) > 1:
+            for job in jobs:
+                job["seats"] = [self.experiments[e].strategy_name for e in table[1:]]
+                job["infinite_shoe"] = all(self.experiments[e].infinite_shoe for e in table)
+        return jobs
+
+    # Return a list of (experiment number, result) of each seat of the parm table number, from the result of one of
+    # its sessions.
+    def table_results(self, t, results):
+        if len(self.tables[t]) == 1:
+            results = [results]
+        return list(zip(self.tables[t], results))
+
+    # Add the results of one session of several experiments. results is a list of (experiment number, result).
+    def record_results(self, results):
+        for (e, result) in results:
+            self.record_session(e, result)
+
+    # Add the results of one session of the parm experiment number to its experiment, and to its pairs.
+    def record_session(self, e, result):
+        ex = self.experiments[e]
+        edge = ex.record_session(result)
+        session = ex.win_loss.count - 1
+
+        for (first, second, paired) in self.pairs:
+            if ex is first:
+                paired.add(0, session, edge)
+            elif ex is second:
+                paired.add(1, session, edge)
+
+    # Print out the paired differences in player edge.
+    def analyse_pairs(self):
+        for (first, second, paired) in self.pairs:
+            print("%s minus %s:" % (second.strategy_name, first.strategy_name))
+            print("Paired difference in player edge: %+.2f%%, Standard error: %.2f, Sessions: %d"
+                  % (paired.difference.mean, paired.difference.standard_error(), paired.difference.count))
+        print()
 
     def write_to_file(self):
+        import csv
+
         with open('study_results.csv', newline='', mode='w') as results:
             experiment_writer = csv.writer(results, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
 
@@ -82,7 +365,19 @@ class Study:
                 experiment_writer.writerow([ex.strategy_name, ex.min_player_edge, ex.max_player_edge,
                                             ex.average_player_edge])
 
-blackjack.verbose = False
+    def write_pairs_to_file(self):
+        import csv
+
+        with open('study_paired_results.csv', newline='', mode='w') as results:
+            experiment_writer = csv.writer(results, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+            experiment_writer.writerow(["first_strategy_name", "second_strategy_name", "sessions",
+                                        "paired_difference", "standard_error"])
+
+            for (first, second, paired) in self.pairs:
+                experiment_writer.writerow([first.strategy_name, second.strategy_name, paired.difference.count,
+                                            paired.difference.mean, paired.difference.standard_error()])
 
-this_study = Study(10, 100000)
-this_study.write_to_file()
+if __name__ == "__main__":
+    this_study = Study(10, 100000, workers=os.cpu_count())
+    this_study.write_to_file()
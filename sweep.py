@@ -0,0 +1,208 @@
+# Sweep a grid of table parameters. Each combination of parameter values is a cell of the grid, and each cell is
+# played for a number of sessions, like an experiment. All of the sessions of the grid share one pool of workers, and
+# the most expensive ones are started first, so that the pool isn't left waiting for a slow cell at the end. Each cell
+# is written to the results CSV file as soon as its last session finishes, so a long sweep can be watched as it goes.
+#
+# this_sweep = Sweep({"strategy_name": ["Hi-Lo Card Count", "Zen Card Count"], "decks": [1, 2, 4, 6, 8],
+#                     "penetration": [0.50, 0.75, 0.85]}, 10, 100000, workers=os.cpu_count())
+
+import bench
+import counting
+import csv
+import itertools
+import json
+import math
+import os
+import parallel
+import running_stats
+
+# Table parameters that can be swept, with the values used for those that aren't.
+PARAMETERS = ["strategy_name", "decks", "penetration", "betting_unit", "blackjack_value", "bet_ramp"]
+DEFAULTS = {"strategy_name": "Hi-Lo Card Count",
+            "decks": 4,
+            "penetration": 0.75,
+            "betting_unit": 4,
+            "blackjack_value": 3 / 2,
+            "bet_ramp": None}                   # None, or (pivot, units_per_count, min_units, max_units).
+
+# Rough costs of playing a round, for cells that aren't in the benchmark baseline. See bench.py.
+ROUND_SECONDS = 15e-6                   # Dealing, playing and settling a round.
+COUNTING_SECONDS = 2e-6                 # Counting the cards of a round.
+SHUFFLE_SECONDS_PER_CARD = 0.35e-6      # Shuffling one card, when the shoe is replenished.
+CARDS_PER_ROUND = 5.4                   # Average number of cards dealt in a round.
+
+RESULTS_COLUMNS = ["sessions", "rounds_per_session", "average_player_edge", "standard_deviation",
+                   "confidence_interval", "total_staked", "player_hands", "seed"]
+
+
+# Return True if the parm cell matches the parm filter, a dictionary of {parameter name: list of values}. Cells match
+# an empty filter.
+def matches(cell, only):
+    for (name, values) in only.items():
+        if cell[name] not in values:
+            return False
+    return True
+
+
+# Return the estimated time, in seconds, to play one round in the parm cell. If there is a benchmark baseline, then
+# its rounds per second are used, otherwise the rough costs above.
+def round_seconds(cell, baseline):
+    if baseline is not None:
+        rate = baseline["rounds_per_second"].get(bench.config_name(cell["strategy_name"], cell["decks"],
+                                                                   cell["penetration"]))
+        if rate is not None:
+            return 1 / rate
+
+    seconds = ROUND_SECONDS + SHUFFLE_SECONDS_PER_CARD * CARDS_PER_ROUND / cell["penetration"]
+    if cell["strategy_name"] in counting.SYSTEMS:
+        seconds += COUNTING_SECONDS
+    return seconds
+
+
+class Sweep_Cell:
+
+    def __init__(self, parameters, sessions):
+        self.parameters = parameters                    # Value of each of the PARAMETERS.
+        self.results = [None] * sessions                # Result of each session, until the cell is finished.
+        self.sessions_left = sessions
+        self.win_loss = running_stats.Running_Stats()   # Stats of percentage win(+ve) or loss(-ve) per session.
+        self.round_stats = running_stats.Running_Stats()    # Stats of net result of each round.
+        self.grand_total_staked = 0
+        self.player_hands = 0
+
+    # Add up the results of the sessions, in session order, so that the stats don't depend on the order in which the
+    # sessions finished.
+    def add_up(self):
+        for (amount_won_or_lost, total_staked, hands_played_by_player, round_stats, profile) in self.results:
+            self.win_loss.add(100 * amount_won_or_lost / total_staked)
+            self.round_stats.merge(round_stats)
+            self.grand_total_staked += total_staked
+            self.player_hands += hands_played_by_player
+        self.results = None
+
+    # Return the half-width of the 95% confidence interval of the player edge, as a percentage.
+    def confidence_interval(self):
+        if self.grand_total_staked == 0:
+            return math.inf
+        average_stake = self.grand_total_staked / self.round_stats.count
+        return 1.96 * 100 * self.round_stats.standard_error() / average_stake
+
+
+class Sweep:
+
+    # grid is a dictionary of {parameter name: list of values}. Parameters that aren't in the grid take their DEFAULTS.
+    # If only is set, then it is a filter like {"decks": [1, 2]}, and only the cells that match it are played. Their
+    # rows in an existing results file are replaced, and the other rows are kept. If cache is a
+    # result_cache.Result_Cache, then sessions that have been played before come back from it.
+    def __init__(self, grid, sessions, rounds_per_session, seed=None, workers=1, engine="table",
+                 results_file="sweep_results.csv", only=None, cache=None):
+        for name in grid:
+            if name not in PARAMETERS:
+                raise ValueError("Can't sweep %s. Parameters are %s." % (name, ", ".join(PARAMETERS)))
+
+        if seed is None:
+            seed = parallel.new_seed()
+
+        self.grid = grid
+        self.sessions = sessions
+        self.rounds_per_session = rounds_per_session
+        self.seed = seed
+        self.workers = workers
+        self.engine = engine
+        self.results_file = results_file
+        self.only = {} if only is None else only
+        self.cache = cache
+
+        self.cells = [self.make_cell(parameters) for parameters in self.expand() if matches(parameters, self.only)]
+
+        self.run()
+
+    # Return a new cell of the grid, with the parm parameters. A subclass can make its own kind of cell, so long as it
+    # has the attributes that write_cell uses.
+    def make_cell(self, parameters):
+        return Sweep_Cell(parameters, self.sessions)
+
+    # Return a list of the parameters of every cell of the grid.
+    def expand(self):
+        values = [self.grid.get(name, [DEFAULTS[name]]) for name in PARAMETERS]
+        return [dict(zip(PARAMETERS, combination)) for combination in itertools.product(*values)]
+
+    # Return the job of one session of the parm cell. Session seeds only depend on the shoe, so all of the cells with
+    # the same decks and penetration play the same shoes, and can be compared directly. They are the same seeds as
+    # those of a Shoe_Study.
+    def job(self, cell, session):
+        parameters = cell.parameters
+        return {"strategy_name": parameters["strategy_name"],
+                "decks": parameters["decks"],
+                "penetration": parameters["penetration"],
+                "betting_unit": parameters["betting_unit"],
+                "blackjack_value": parameters["blackjack_value"],
+                "bet_ramp": parameters["bet_ramp"],
+                "rounds": self.rounds_per_session,
+                "seed": parallel.derive_seed(self.seed, parameters["decks"], parameters["penetration"], session),
+                "engine": self.engine,
+                "cache": self.cache}
+
+    # Start a results file holding only the rows of the cells that aren't being played now.
+    def start_results_file(self):
+        kept = []
+        if len(self.only) > 0 and os.path.exists(self.results_file):
+            playing = {tuple("" if cell.parameters[name] is None else str(cell.parameters[name])
+                             for name in PARAMETERS)
+                       for cell in self.cells}
+            with open(self.results_file, newline='') as results:
+                for row in csv.DictReader(results):
+                    if tuple(row[name] for name in PARAMETERS) not in playing:
+                        kept.append(row)
+
+        with open(self.results_file, newline='', mode='w') as results:
+            writer = csv.DictWriter(results, PARAMETERS + RESULTS_COLUMNS)
+            writer.writeheader()
+            writer.writerows(kept)
+
+    # Append the row of a finished cell to the results file.
+    def write_cell(self, cell):
+        row = dict(cell.parameters)
+        row.update({"sessions": cell.win_loss.count,
+                    "rounds_per_session": self.rounds_per_session,
+                    "average_player_edge": cell.win_loss.mean,
+                    "standard_deviation": cell.win_loss.stdev(),
+                    "confidence_interval": cell.confidence_interval(),
+                    "total_staked": cell.grand_total_staked,
+                    "player_hands": cell.player_hands,
+                    "seed": self.seed})
+
+        with open(self.results_file, newline='', mode='a') as results:
+            csv.DictWriter(results, PARAMETERS + RESULTS_COLUMNS).writerow(row)
+
+    # Play all of the cells, most expensive sessions first, and write each cell as soon as it finishes.
+    def run(self):
+        baseline = None
+        if os.path.exists(bench.BASELINE_FILE):
+            with open(bench.BASELINE_FILE, encoding="utf-8") as baseline_file:
+                baseline = json.load(baseline_file)
+
+        sessions = [(cell, s) for cell in self.cells for s in range(self.sessions)]
+        sessions.sort(key=lambda session: round_seconds(session[0].parameters, baseline), reverse=True)
+
+        self.start_results_file()
+        print("Seed:", self.seed)
+
+        for (j, result) in parallel.run_jobs([self.job(cell, s) for (cell, s) in sessions], self.workers):
+            (cell, s) = sessions[j]
+            cell.results[s] = result
+            cell.sessions_left -= 1
+
+            if cell.sessions_left == 0:
+                cell.add_up()
+                self.write_cell(cell)
+                print(", ".join("%s=%s" % (name, cell.parameters[name]) for name in self.grid),
+                      "- Average player edge: %.2f%% +/-%.2f%%" % (cell.win_loss.mean, cell.confidence_interval()))
+
+        if self.cache is not None:
+            self.cache.evict()
+
+
+if __name__ == "__main__":
+    Sweep({"decks": [1, 2, 4, 6, 8], "penetration": [0.50, 0.75, 0.85]}, 10, 100000, workers=os.cpu_count(),
+          results_file="sweep_results.csv")
@@ -1,6 +1,31 @@
 # Do some tests.
 
+import batch
 import blackjack
+import checkpoint
+import contextlib
+import counting
+import csv
+import events
+import io
+import math
+import os
+import outcome_log
+import parallel
+import random
+import result_cache
+import running_stats
+import shared_results
+import shoe_study
+import strategy
+import study
+import sweep
+import tempfile
+
+# The small study that the tests of studies play, unless they need something else.
+STUDY_SESSIONS = 3                                  # Sessions played by each experiment.
+STUDY_ROUNDS = 2000                                 # Rounds played in each session.
+STUDY_SEED = 5                                      # Seed that every session's seed is derived from.
 
 class Test:
     def __init__(self, strategy_name):
@@ -11,27 +36,430 @@ class Test:
         this_table = blackjack.Table(4,  # 4 Decks in the shoe.
                                      0.75)  # Shoe replenished when 75% penetration reached.
 
-        # Force some test cards on to the front of the shoe.
-        this_table.shoe.cards =     [("6♥", [6], "6")]
-        this_table.shoe.cards.append(("3♥", [3], "3"))
-        this_table.shoe.cards.append(("6♥", [6], "6"))
-        this_table.shoe.cards.append(("9♥", [9], "9"))
+        # Print the details of each round.
+        this_table.add_listener(events.Verbose_Printer().notify)
 
-        # Because more cards may be needed to play a game, add some normal cards to the end of the shoe.
-        new_deck = blackjack.Deck()
-        new_deck.shuffle()
-        this_table.shoe.cards = this_table.shoe.cards + new_deck.cards
+        # Force some test cards on to the front of the shoe.
+        this_table.shoe.stack([blackjack.parse_card(c) for c in ["6♥", "3♥", "6♥", "9♥"]])
 
-        if blackjack.verbose:
-            this_table.shoe.print()
+        this_table.shoe.print()
 
         this_table.play_one_round(self.strategy_name)    # Play a game.
 
+        # Printing the round mustn't start counting cards that the player doesn't count.
+        counted = [counting.SYSTEMS[self.strategy_name].name] if self.strategy_name in counting.SYSTEMS else []
+        assert list(this_table.shoe.counters) == counted, "Printing the round made a card counter."
+
+
+# Check that the charts in basic_strategy.md are the same as the ones built into strategy.py, that each chart builds on
+# the one before it, and some well known cells of the chart that the card counters use.
+class Strategy_Chart_Test:
+    def __init__(self):
+        print("Basic strategy charts")
+
+        built_in = strategy.parse_charts(strategy.BASIC_STRATEGY)
+        loaded = strategy.load_charts("basic_strategy.md")
+        assert list(loaded) == list(built_in) == ["Basic Strategy Section %d" % s for s in range(1, 5)]
+        for (name, chart) in built_in.items():
+            same = (loaded[name].hard, loaded[name].soft, loaded[name].pairs) == (chart.hard, chart.soft, chart.pairs)
+            assert same, name + " in basic_strategy.md is different from the built in chart."
+            assert strategy.CHARTS[name].hard == chart.hard
+
+        # Section 1 only has hard hands, and each section after it adds to the one before.
+        assert built_in["Basic Strategy Section 1"].soft is None and built_in["Basic Strategy Section 1"].pairs is None
+        assert built_in["Basic Strategy Section 4"].soft == built_in["Basic Strategy Section 3"].soft
+
+        chart = strategy.CHARTS["Hi-Lo Card Count"]
+        assert chart is strategy.CHARTS["Basic Strategy Section 4"]
+        for (cells, value, dealer_card_value, action) in [(chart.hard, 16, 10, strategy.HIT),
+                                                          (chart.hard, 12, 4, strategy.STAND),
+                                                          (chart.hard, 11, 6, strategy.DOUBLE),
+                                                          (chart.soft, 7 - 1, 3, strategy.DOUBLE),
+                                                          (chart.pairs, 8 - 2, 10, strategy.SPLIT),
+                                                          (chart.pairs, 11 - 2, 11, strategy.SPLIT)]:
+            assert cells[strategy.cell(value, dealer_card_value)] == action
+
+
+# Return the value of the parm cards, and whether it is soft, by trying every way of counting each ace as 1 or 11.
+def enumerated_value(cards):
+    points = [blackjack.CARD_POINTS[c] for c in cards]
+    values = [sum(points) + 10 * elevens for elevens in range(points.count(1) + 1)]
+    best = max([v for v in values if v <= 21], default=min(values))
+    return (best, best != sum(points))
+
+
+# Check that the value of a hand, which is updated as each card is received, is the same as the best value found by
+# trying every way of counting its aces, and that a reused hand forgets its old cards.
+class Hand_Test:
+    def __init__(self, hands=2000, seed=1):
+        print("Values of %d hands, updated card by card" % hands)
+        this_random = random.Random(seed)
+
+        this_hand = blackjack.Hand("Test", 1, 0)
+        for h in range(hands):
+            this_hand.reset("Test", 1, 0)
+            assert (this_hand.value, this_hand.is_soft, this_hand.has_ace) == (0, False, False), \
+                "A reset hand remembers its old cards."
+
+            while not this_hand.busted:
+                this_hand.receive_card(this_random.randrange(52))
+                (value, soft) = enumerated_value(this_hand.cards)
+                assert (this_hand.value, this_hand.is_soft) == (value, soft), \
+                    "Wrong value of hand " + " ".join(blackjack.card_name(c) for c in this_hand.cards)
+                assert this_hand.busted == (value > 21)
+
+            # The value calculated from scratch is the same.
+            this_hand.calculate_value()
+            assert (this_hand.value, this_hand.is_soft) == enumerated_value(this_hand.cards)
+
+        # Some hands with more than 1 ace, and a pair of aces split into 2 hands.
+        for (names, value, soft) in [(["A♠", "A♥"], 12, True), (["A♠", "6♥", "10♣"], 17, False),
+                                     (["A♠", "A♥", "9♣"], 21, True), (["A♠", "A♥", "A♣", "A♦", "7♠"], 21, True),
+                                     (["A♠", "5♥", "A♣", "K♦"], 17, False)]:
+            this_hand.reset("Test", 1, 0)
+            for name in names:
+                this_hand.receive_card(blackjack.parse_card(name))
+            assert (this_hand.value, this_hand.is_soft) == (value, soft), " ".join(names)
+
+        this_hand.reset("Test", 1, 0)
+        for name in ["A♠", "A♥"]:
+            this_hand.receive_card(blackjack.parse_card(name))
+        this_hand.remove_second_card()
+        assert (this_hand.value, this_hand.is_soft, this_hand.is_pair) == (11, True, False)
+
+
+# Check that an infinite shoe deals every card equally often, within tolerance standard errors, so that a ten is dealt
+# 4 times as often as any other card value, and that a seeded shoe deals the same cards each time.
+class Infinite_Shoe_Test:
+    def __init__(self, cards=520000, seed=1, tolerance=5):
+        print("Frequencies of %d cards from an infinite shoe" % cards)
+
+        this_shoe = blackjack.Infinite_Shoe(seed)
+        dealt = [this_shoe.draw_one_card() for c in range(cards)]
+        same_seed = blackjack.Infinite_Shoe(seed)
+        assert dealt[:100] == [same_seed.draw_one_card() for c in range(100)], "A seeded shoe dealt different cards."
+
+        counts = [0] * 52
+        for card in dealt:
+            counts[card] += 1
+        expected = cards / 52
+        standard_error = math.sqrt(cards * (1 / 52) * (51 / 52))
+        for card in range(52):
+            assert abs(counts[card] - expected) < tolerance * standard_error, \
+                "%s was dealt %d times, expected %.0f." % (blackjack.card_name(card), counts[card], expected)
+
+        tens = sum(counts[card] for card in range(52) if blackjack.CARD_VALUES[card] == 10)
+        print("Share of tens: %.4f, expected: %.4f" % (tens / cards, 4 / 13))
+        assert abs(tens / cards - 4 / 13) < tolerance * math.sqrt((4 / 13) * (9 / 13) / cards)
+
+
+# Check each card counting system. The tags of a balanced system add up to 0 over a deck. An unbalanced system's tags
+# add up to -initial_per_deck, a fresh shoe of any size has a true count of 0, and a running count at the pivot has the
+# same true count whatever the number of decks left. Then check that bets are limited by the bet ramp.
+class Counting_Test:
+    def __init__(self):
+        print("Card counting systems")
+
+        for system in counting.SYSTEMS.values():
+            counter = counting.Card_Counting(system)
+            if system.balanced:
+                assert sum(system.tags) == 0, system.name + " isn't balanced."
+            else:
+                assert sum(system.tags) == -system.initial_per_deck, system.name + " has the wrong initial count."
+                for decks in [1, 2, 4, 6, 8]:
+                    counter.reset(decks)
+                    assert counter.true_count(decks * 52) == 0, system.name + " doesn't start a shoe at 0."
+                    counter.running_count = system.pivot
+                    assert counter.true_count(decks * 52) == -system.initial_per_deck, \
+                        system.name + " has the wrong true count at its pivot."
+
+            # Every system bets 1 unit at about the same advantage as Hi-Lo at a true count of 2. With 1 deck left, the
+            # true count goes up by 1 for each 1 that the running count goes up.
+            level = max(abs(tag) for tag in system.tags)
+            counter.reset(1)
+            counter.running_count = counter.running_count - counter.true_count(52) + 2 * level
+            print("%s: Level %d, Bet at a true count of %d: %d" % (system.name, level, 2 * level,
+                                                                     counter.bet_size(52, 4)))
+            assert counter.bet_size(52, 4) == 4
+
+        counter = counting.Card_Counting(counting.HI_LO)
+        ramp = counting.Bet_Ramp(pivot=1, units_per_count=2, min_units=1, max_units=12)
+        for (running_count, units) in [(-20, 1), (0, 1), (2, 2), (4, 6), (20, 12)]:
+            counter.running_count = running_count
+            assert counter.bet_size(52, 4, ramp) == 4 * units, "A bet isn't limited by the bet ramp."
+        counter.running_count = -20
+        assert counter.bet_size(52, 4) == 0, "A bet is -ve."
+
+
+# Check that the batch engine plays exactly as the Table engine does. Each of the batch's tables is dealt the same shoe
+# as one Table, so their totals must be the same after every round, until the shoe is replenished.
+class Batch_Test:
+    def __init__(self, strategy_name, tables=200, seed=1):
+        print("Batch engine against Table engine:", strategy_name)
+
+        system = counting.SYSTEMS.get(strategy_name, counting.HI_LO)
+        this_batch = batch.Batch_Table(tables, 4, 0.75, seed, system=system)
+        these_tables = []
+        for t in range(tables):
+            this_table = blackjack.Table(4, 0.75, parallel.derive_seed(seed, "table", t))
+            this_batch.shoes[t] = [blackjack.CARD_VALUES[c] for c in this_table.shoe.cards]
+            these_tables.append(this_table)
+
+        compared = 0
+        while (this_batch.shoes_started == 1).any():
+            playing = [t for t in range(tables) if this_batch.shoes_started[t] == 1]
+            this_batch.play_one_round(strategy_name)
+            for t in playing:
+                this_table = these_tables[t]
+                this_table.play_one_round(strategy_name)
+                assert (this_table.total_staked, this_table.amount_won_or_lost, this_table.hands_played_by_player) \
+                       == (this_batch.total_staked[t], this_batch.amount_won_or_lost[t],
+                           this_batch.hands_played_by_player[t]), "Table %d played differently." % t
+                compared += 1
+        print("Rounds played the same: %d" % compared)
+
+
+# Check that batch sessions bet as much per round as Table sessions, within tolerance standard errors. Batch sessions
+# are shared between so many tables that each table only plays a few rounds, so their bets depend on the warm start.
+class Batch_Warm_Start_Test:
+    def __init__(self, strategy_name, seed=1, sessions=10, rounds=100000, tolerance=3):
+        print("Stakes of warm started batch sessions:", strategy_name)
+
+        table = self.stakes(strategy_name, seed, "table", sessions, rounds)
+        batch_stakes = self.stakes(strategy_name, seed, "batch", sessions, rounds, batch.TABLES)
+        error = (table.standard_error() ** 2 + batch_stakes.standard_error() ** 2) ** 0.5
+        print("Stake per round: Table %.3f, Batch %.3f, Standard error of difference %.3f"
+              % (table.mean, batch_stakes.mean, error))
+        assert abs(table.mean - batch_stakes.mean) <= tolerance * error, "The batch engine's stakes don't agree."
+
+    # Play the parm sessions with the parm engine, at the parm number of batch tables. Returns the stats of the stake
+    # per round of each session.
+    def stakes(self, strategy_name, seed, engine, sessions, rounds, tables=None):
+        jobs = [{"strategy_name": strategy_name, "decks": 4, "penetration": 0.75, "rounds": rounds,
+                 "seed": parallel.derive_seed(seed, engine, s), "engine": engine, "tables": tables}
+                for s in range(sessions)]
+
+        stakes = running_stats.Running_Stats()
+        for (_, (_, total_staked, _, round_stats, _)) in parallel.run_jobs(jobs, 1):
+            assert round_stats.count == rounds, "Session played %d rounds, not %d." % (round_stats.count, rounds)
+            stakes.add(total_staked / rounds)
+        return stakes
+
+
+# Check that logging a session twice to the same directory replaces the first log, and that a table that isn't
+# counting cards logs a true count of 0.
+class Outcome_Log_Test:
+    def __init__(self, rounds=500):
+        print("Outcome log of a session played twice")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "Dealer_0")
+            for played in range(2):
+                parallel.play_session({"strategy_name": "Dealer", "decks": 4, "penetration": 0.75, "rounds": rounds,
+                                       "seed": 1, "record": path})
+
+            log = outcome_log.Outcome_Log(path)
+            print("Rounds logged: %d" % len(log))
+            assert len(log) == rounds, "The second session was added to the first one's log."
+            assert (log["true_count"] == 0).all(), "A true count was logged for a table that isn't counting."
+            del log
+
+
+def study_numbers(this_study):
+    return [(ex.strategy_name, ex.win_loss.mean, ex.player_hands, ex.grand_total_staked)
+            for ex in this_study.experiments]
+
+
+# Return the parm study's numbers, made without printing its analysis.
+def quiet_study(sessions=STUDY_SESSIONS, rounds=STUDY_ROUNDS, seed=STUDY_SEED, **settings):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return study_numbers(study.Study(sessions, rounds, seed=seed, **settings))
+
+
+# While the block runs, make session number fail_at (counting from 1) raise the parm error, instead of being played.
+# The block is given the list of the jobs of the sessions that were started, and the error is caught when it leaves it.
+@contextlib.contextmanager
+def failing_session(fail_at, error):
+    play_session = parallel.play_session
+    started = []
+
+    def fail(job):
+        started.append(job)
+        if len(started) == fail_at:
+            raise error
+        return play_session(job)
+
+    parallel.play_session = fail
+    try:
+        yield started
+    except type(error):
+        pass
+    finally:
+        parallel.play_session = play_session
+    assert len(started) >= fail_at, "The session didn't fail."
+
+
+# Check that a study that is interrupted, then resumed from its checkpoint, gets the same numbers as one that wasn't
+# interrupted, and that the checkpoint file is deleted when the study finishes. With several seats and a precision, a
+# table whose seats had all reached the precision before the study was interrupted mustn't play any more sessions.
+class Checkpoint_Test:
+    def __init__(self, interrupt_after=7, sessions=STUDY_SESSIONS, seats=1, precision=None):
+        print("Study of %d seat tables interrupted after %d sessions, then resumed" % (seats, interrupt_after))
+        expected = quiet_study(sessions, seats=seats, precision=precision)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "checkpoint.json")
+
+            with failing_session(interrupt_after + 1, KeyboardInterrupt()):
+                quiet_study(sessions, checkpoint_file=filename, seats=seats, precision=precision)
+
+            saved = checkpoint.Checkpoint(filename).state["results"]
+            print("Sessions in the checkpoint: %d" % (sum(len(results) for results in saved) // seats))
+            assert sum(len(results) for results in saved) == interrupt_after * seats
+
+            # The seed is the one in the checkpoint.
+            resumed = quiet_study(sessions, seed=None, checkpoint_file=filename, seats=seats, precision=precision)
+            assert resumed == expected, "The resumed study's numbers are different."
+            assert not os.path.exists(filename), "The checkpoint file wasn't deleted when the study finished."
+
+
+# Check that with common random numbers, every strategy plays the same shoes, and that a study's numbers don't depend
+# on the order in which its sessions are played by the workers. Hi-Lo plays the same hands as the basic strategy chart
+# that it uses, and only stakes differently, so it plays exactly the same hands as that chart from the same shoes.
+class Common_Random_Numbers_Test:
+    def __init__(self):
+        print("Common random numbers, with 1 and 2 workers")
+
+        dealer = study.Experiment("Dealer", STUDY_SESSIONS, STUDY_ROUNDS, seed=STUDY_SEED, run=False,
+                                  common_random_numbers=True)
+        counter = study.Experiment("Hi-Lo Card Count", STUDY_SESSIONS, STUDY_ROUNDS, seed=STUDY_SEED, run=False,
+                                   common_random_numbers=True)
+        assert [dealer.session_seed(s) for s in range(STUDY_SESSIONS)] \
+            == [counter.session_seed(s) for s in range(STUDY_SESSIONS)]
+
+        one_worker = quiet_study(common_random_numbers=True)
+        two_workers = quiet_study(common_random_numbers=True, workers=2)
+        for (strategy_name, edge, hands, _) in one_worker:
+            print("%s: %.2f%%, Hands: %d" % (strategy_name, edge, hands))
+        assert one_worker == two_workers, "The study's numbers depend on the number of workers."
+
+        hands = {strategy_name: hands for (strategy_name, _, hands, _) in one_worker}
+        assert hands["Hi-Lo Card Count"] == hands["Basic Strategy Section 4"], "The strategies played different shoes."
+        hands = {strategy_name: hands for (strategy_name, _, hands, _) in quiet_study()}
+        assert hands["Hi-Lo Card Count"] != hands["Basic Strategy Section 4"], \
+            "The strategies played the same shoes without common random numbers."
+
+
+# Check that sessions come back from the result cache when they are played again, and that changing the engine's
+# source code means nothing old is used.
+class Result_Cache_Test:
+    def __init__(self):
+        print("Result cache, before and after the engine changes")
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = result_cache.Result_Cache(directory)
+            played = quiet_study(cache=cache)
+            entries = len(cache.entries())
+
+            cached = quiet_study(cache=cache)
+            assert cached == played, "Cached results are different from the results that were played."
+            assert len(cache.entries()) == entries, "Sessions were played again, instead of coming from the cache."
+
+            # Every module that the engine is made of is part of its fingerprint.
+            assert {"batch", "blackjack", "strategy"} <= set(result_cache.ENGINE_MODULES)
+
+            # Pretend that the engine's source code has changed.
+            engine_fingerprint = result_cache.engine_fingerprint
+            result_cache.engine_fingerprint = lambda: engine_fingerprint() + " changed"
+            try:
+                changed = quiet_study(cache=cache)
+            finally:
+                result_cache.engine_fingerprint = engine_fingerprint
+
+            print("Cached sessions: %d, after the engine changed: %d" % (entries, len(cache.entries())))
+            assert changed == played
+            assert len(cache.entries()) == 2 * entries, "Results of the old engine were used."
+
+
+# Check that a shoe study writes the same rows as a sweep of the same grid, with the same header as the
+# shoe_study_results.csv in the repository.
+class Shoe_Study_Test:
+    def __init__(self, decks=(1, 2), penetrations=(0.5, 0.75)):
+        print("Shoe study, and a sweep of the same grid")
+
+        with tempfile.TemporaryDirectory() as directory:
+            shoe_file = os.path.join(directory, "shoe_study_results.csv")
+            sweep_file = os.path.join(directory, "sweep_results.csv")
+            with contextlib.redirect_stdout(io.StringIO()):
+                shoe_study.Shoe_Study(STUDY_SESSIONS, STUDY_ROUNDS, seed=STUDY_SEED, decks=decks,
+                                      penetrations=penetrations, results_file=shoe_file).write_to_file()
+                sweep.Sweep({"decks": decks, "penetration": penetrations}, STUDY_SESSIONS, STUDY_ROUNDS,
+                            seed=STUDY_SEED, results_file=sweep_file)
+
+            rows = {}
+            for filename in [shoe_file, sweep_file, "shoe_study_results.csv"]:
+                with open(filename, newline='') as results:
+                    rows[filename] = list(csv.reader(results))
+        print("Cells: %d" % (len(rows[shoe_file]) - 1))
+        assert rows[shoe_file][0] == rows["shoe_study_results.csv"][0], "shoe_study_results.csv has an old header."
+        assert rows[shoe_file][0] == rows[sweep_file][0]
+        assert sorted(rows[shoe_file][1:]) == sorted(rows[sweep_file][1:]), "The shoe study and sweep are different."
+
+
+# Return True if there is a block of shared memory with the parm name.
+def shared_memory_exists(name):
+    try:
+        shared_results.shared_memory.SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+# Check that an experiment's shared results agree with its totals, and that its shared memory is freed when it is
+# closed, or when a session fails.
+class Shared_Results_Test:
+    def __init__(self):
+        print("Shared results of an experiment")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            with study.Experiment("Hi-Lo Card Count", STUDY_SESSIONS, STUDY_ROUNDS, seed=STUDY_SEED,
+                                  shared=True) as this_experiment:
+                name = this_experiment.shared_results.memory.name
+                summary = this_experiment.shared_results.summary()
+                assert summary.rounds == this_experiment.round_stats.count
+                assert abs(summary.staked - this_experiment.grand_total_staked) < 1e-6
+        print("Rounds collected: %d, Player edge: %.2f%%" % (summary.rounds, summary.edge))
+        assert not shared_memory_exists(name), "Shared memory wasn't freed when the experiment was closed."
+
+        # Make the second session fail, and check the block of shared memory that the sessions were given.
+        with failing_session(2, RuntimeError("Session failed.")) as started:
+            with contextlib.redirect_stdout(io.StringIO()):
+                study.Experiment("Dealer", STUDY_SESSIONS, STUDY_ROUNDS, seed=STUDY_SEED, shared=True)
+        assert not shared_memory_exists(started[0]["shared"]["name"]), \
+            "Shared memory wasn't freed when a session failed."
+
+
+if __name__ == "__main__":
+    t1 = Test("Dealer")
+    t2 = Test("Basic Strategy Section 1")
+    t3 = Test("Basic Strategy Section 2")
+    t4 = Test("Basic Strategy Section 3")
+    t5 = Test("Basic Strategy Section 4")
+    t6 = Test("Hi-Lo Card Count")
+    print()
 
-blackjack.verbose = True
-t1 = Test("Dealer")
-t2 = Test("Basic Strategy Section 1")
-t3 = Test("Basic Strategy Section 2")
-t4 = Test("Basic Strategy Section 3")
-t5 = Test("Basic Strategy Section 4")
-t6 = Test("Hi-Lo Card Count")
+    Hand_Test()
+    Strategy_Chart_Test()
+    Infinite_Shoe_Test()
+    Counting_Test()
+    Batch_Test("Hi-Lo Card Count")
+    Batch_Test("KO Card Count")
+    Batch_Test("Basic Strategy Section 4")
+    Batch_Warm_Start_Test("Hi-Lo Card Count")
+    Outcome_Log_Test()
+    Common_Random_Numbers_Test()
+    Checkpoint_Test()
+    Checkpoint_Test(interrupt_after=12, sessions=12, seats=3, precision=2.0)
+    Result_Cache_Test()
+    Shoe_Study_Test()
+    Shared_Results_Test()